@@ -0,0 +1 @@
+"""Throughput and peak-memory benchmarks for the simulation kernels."""
@@ -0,0 +1,342 @@
+"""Load-test the app pages with many concurrent headless sessions
+
+    python -m benchmarks.loadtest                          # 8 sessions on every page
+    python -m benchmarks.loadtest --sessions 1,8,32        # scale the session count
+    python -m benchmarks.loadtest --pages atm,monte_carlo --iterations 3
+    python -m benchmarks.loadtest --json loadtest.json     # also write the report
+
+Every session is a Streamlit AppTest driving the page script in-process with
+scripted widget inputs, so no browser, server or network is involved. The
+sessions of a page run concurrently in threads of one process, sharing the
+result cache and job pool the way sessions of one server do. Each step of a
+scenario is one script run, timed and counted (messages and bytes the script
+emitted), after one untimed page load. CPU time (including worker processes)
+and peak RSS are measured per page; each page runs in a fresh child process
+unless --in-process is given, so peak RSS is not inherited from the previous
+page.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_TIMEOUT = 600
+
+
+def _widget(at, kind, label):
+    for widget in getattr(at, kind):
+        if widget.label == label:
+            return widget
+    raise LookupError(f"No {kind} labelled {label!r} after the last run")
+
+
+def click(label):
+    def action(at, session, seed):
+        _widget(at, "button", label).click()
+    return action
+
+
+def set_value(kind, label, value):
+    def action(at, session, seed):
+        _widget(at, kind, label).set_value(value)
+    return action
+
+
+def set_seed(label):
+    # Distinct seeds make every session's run a cache miss; --shared-seed makes them all hits but the first
+    def action(at, session, seed):
+        _widget(at, "number_input", label).set_value(seed if seed is not None else session)
+    return action
+
+
+# page -> (script, [(step, [actions applied before the step's script run])])
+SCENARIOS = {
+    "home": ("streamlit_app.py", [
+        ("load", []),
+    ]),
+    "number_guessing": ("pages/1_Number_Guessing.py", [
+        ("load", []),
+        ("start", [set_value("selectbox", "Select the guessing mode:", "Binary Search Mode"),
+                   click("Start Simulation")]),
+        ("compare", [click("Compare All Strategies")]),
+    ]),
+    "atm": ("pages/2_Dynamic_Atm.py", [
+        ("load", []),
+        ("start", [set_value("number_input", "Number of Customers:", 200),
+                   set_seed("Random Seed (optional):"), click("Start Simulation")]),
+        ("next page", [set_value("number_input", "Transaction Page:", 2)]),
+    ]),
+    "biased_dice": ("pages/3_Biased_Dice_Rolls.py", [
+        ("load", []),
+        ("run", [set_seed("Random Seed (optional)"), click("Run Simulation")]),
+        ("streak page", [set_value("number_input", "Streak Page", 2)]),
+    ]),
+    "monte_carlo": ("pages/4_Monte_Carlo_Dice.py", [
+        ("load", []),
+        ("run", [set_seed("Random Seed (optional)"), click("Run Simulation")]),
+        ("rerun", []),
+    ]),
+}
+
+_counts = threading.local()
+_session = threading.local()
+
+
+@contextmanager
+def instrumented_apptest():
+    """Let AppTest sessions run concurrently and record the ForwardMsgs each script run emits
+
+    AppTest gives every script run the same session id, so a run takes the id
+    of the session playing it instead and the job pool's per-session limit
+    applies to each simulated session as it would in production. Each AppTest
+    run installs a mock Runtime as the process-wide instance and clears it
+    when it finishes, which would pull the runtime out from under sessions
+    still running in other threads; while this is active the last runtime
+    seen stays available instead. Each run also compiles the script
+    into a fresh cache, and concurrent compiles can crash CPython 3.11, so
+    script bytecode is compiled once under a lock and shared, as one server's
+    script cache would be. Each run also patches `config.get_option` to switch
+    on app-test mode and restores it when it finishes, which would switch the
+    mode off for runs in other threads (their widgets then miss the data
+    AppTest reads back); the patch is applied once for all runs instead.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+    from streamlit.testing.v1.util import patch_config_options
+
+    original_init = LocalScriptRunner.__init__
+    original_run = LocalScriptRunner.run
+    original_instance = Runtime.__dict__["instance"]
+    original_exists = Runtime.__dict__["exists"]
+    original_bytecode = ScriptCache.get_bytecode
+    original_patch = app_test.patch_config_options
+    last = []
+    bytecode = {}
+    compile_lock = threading.Lock()
+
+    def init(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        session_id = getattr(_session, "id", None)
+        if session_id is not None:
+            self._session_id = session_id
+
+    def run(self, *args, **kwargs):
+        try:
+            return original_run(self, *args, **kwargs)
+        finally:
+            messages = [data["forward_msg"] for event, data in zip(self.events, self.event_data)
+                        if event == ScriptRunnerEvent.ENQUEUE_FORWARD_MSG]
+            _counts.messages = len(messages)
+            _counts.bytes = sum(message.ByteSize() for message in messages)
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+        elif last:
+            return last[0]
+        return original_instance.__func__(cls)
+
+    def exists(cls):
+        return cls._instance is not None or bool(last)
+
+    def get_bytecode(self, script_path):
+        with compile_lock:
+            if script_path not in bytecode:
+                bytecode[script_path] = original_bytecode(self, script_path)
+            return bytecode[script_path]
+
+    LocalScriptRunner.__init__ = init
+    LocalScriptRunner.run = run
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+    ScriptCache.get_bytecode = get_bytecode
+    app_test.patch_config_options = lambda overrides: nullcontext()
+    try:
+        with patch_config_options({"global.appTest": True}):
+            yield
+    finally:
+        app_test.patch_config_options = original_patch
+        LocalScriptRunner.__init__ = original_init
+        LocalScriptRunner.run = original_run
+        Runtime.instance = original_instance
+        Runtime.exists = original_exists
+        ScriptCache.get_bytecode = original_bytecode
+
+
+def run_session(script, steps, session, iterations, seed, components=None):
+    """Play a scenario `iterations` times in one session; returns (records, AppTest)"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, script), default_timeout=RUN_TIMEOUT)
+    # A new AppTest discovers custom components on its first run (~0.4 s), which a server does once;
+    # sessions reuse the warm-up session's registry so that cost is not counted as page latency
+    if components is not None and hasattr(at, "_bidi_component_manager"):
+        at._bidi_component_manager = components
+    _session.id = f"loadtest-session-{session}"
+    records = []
+    for _ in range(iterations):
+        for step, actions in steps:
+            for action in actions:
+                action(at, session, seed)
+            _counts.messages = _counts.bytes = 0
+            start = time.perf_counter()
+            at.run()
+            records.append({
+                "step": step,
+                "seconds": time.perf_counter() - start,
+                "messages": _counts.messages,
+                "bytes": _counts.bytes,
+                "errors": len(at.exception),
+            })
+    return records, at
+
+
+def _cpu_seconds():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _peak_rss():
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(page, sessions, records, wall, cpu, peak_rss):
+    """One row per step plus an "all" row for the page"""
+    rows = []
+    steps = list(dict.fromkeys(record["step"] for record in records))
+    for step in steps + ["all"]:
+        runs = [record for record in records if step in ("all", record["step"])]
+        latencies = [record["seconds"] for record in runs]
+        rows.append({
+            "page": page,
+            "sessions": sessions,
+            "step": step,
+            "runs": len(runs),
+            "errors": sum(record["errors"] for record in runs),
+            "p50_ms": percentile(latencies, 0.5) * 1e3,
+            "p90_ms": percentile(latencies, 0.9) * 1e3,
+            "p99_ms": percentile(latencies, 0.99) * 1e3,
+            "max_ms": max(latencies) * 1e3,
+            "messages_per_run": sum(record["messages"] for record in runs) / len(runs),
+            "kib_per_run": sum(record["bytes"] for record in runs) / len(runs) / 1024,
+        })
+    rows[-1].update({
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+        "cpu_ms_per_run": cpu / len(records) * 1e3,
+        "peak_rss_mib": peak_rss / 2 ** 20 if peak_rss is not None else None,
+    })
+    return rows
+
+
+def load_page(page, sessions, iterations=1, seed=None):
+    """Run `sessions` concurrent sessions of a page's scenario in this process"""
+    script, steps = SCENARIOS[page]
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    with instrumented_apptest():
+        # One untimed page load imports the page's modules, as a running server already has
+        _, warm = run_session(script, steps[:1], sessions, 1, seed)
+        components = getattr(warm, "_bidi_component_manager", None)
+        cpu = _cpu_seconds()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            futures = [pool.submit(run_session, script, steps, session, iterations, seed, components)
+                       for session in range(sessions)]
+            records = [record for future in futures for record in future.result()[0]]
+        wall = time.perf_counter() - start
+        cpu = _cpu_seconds() - cpu
+    return summarize(page, sessions, records, wall, cpu, _peak_rss())
+
+
+def _load_page_in_child(page, sessions, iterations, seed):
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        command = [sys.executable, "-m", "benchmarks.loadtest", "--pages", page, "--sessions", str(sessions),
+                   "--iterations", str(iterations), "--in-process", "--quiet", "--json", path]
+        if seed is not None:
+            command += ["--shared-seed", str(seed)]
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+        # The child exits non-zero when a script run raised; its report still says which
+        subprocess.run(command, cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+        if not os.path.getsize(path):
+            raise RuntimeError(f"Load test of page {page!r} with {sessions} sessions crashed")
+        with open(path) as f:
+            return json.load(f)
+    finally:
+        os.remove(path)
+
+
+def print_rows(rows):
+    print(f"{'page':16s} {'n':>3s} {'step':12s} {'runs':>5s} {'err':>4s} {'p50 ms':>9s} {'p90 ms':>9s} "
+          f"{'p99 ms':>9s} {'max ms':>9s} {'msgs':>6s} {'KiB':>7s}")
+    for row in rows:
+        print(f"{row['page']:16s} {row['sessions']:>3d} {row['step']:12s} {row['runs']:>5d} {row['errors']:>4d} "
+              f"{row['p50_ms']:>9.1f} {row['p90_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f} "
+              f"{row['messages_per_run']:>6.1f} {row['kib_per_run']:>7.1f}")
+        if row["step"] == "all":
+            rss = f"{row['peak_rss_mib']:.1f} MiB" if row["peak_rss_mib"] is not None else "n/a"
+            print(f"{'':16s} wall {row['wall_seconds']:.2f}s, CPU {row['cpu_seconds']:.2f}s "
+                  f"({row['cpu_ms_per_run']:.1f} ms/run), peak RSS {rss}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description=__doc__.split("\n")[0])
+    parser.add_argument("--pages", default=",".join(SCENARIOS), help=f"comma-separated, from {', '.join(SCENARIOS)}")
+    parser.add_argument("--sessions", default="8", help="comma-separated concurrent session counts")
+    parser.add_argument("--iterations", type=int, default=1, help="times each session plays its scenario")
+    parser.add_argument("--shared-seed", type=int, default=None,
+                        help="give every session this seed (default: one seed per session)")
+    parser.add_argument("--in-process", action="store_true", help="run every page in this process")
+    parser.add_argument("--json", default=None, help="also write the rows to this JSON file")
+    parser.add_argument("--quiet", action="store_true", help="do not print the table")
+    args = parser.parse_args(argv)
+
+    pages = args.pages.split(",")
+    unknown = set(pages) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown pages: {', '.join(sorted(unknown))}")
+
+    rows = []
+    for sessions in (int(count) for count in args.sessions.split(",")):
+        for page in pages:
+            if args.in_process:
+                rows += load_page(page, sessions, args.iterations, args.shared_seed)
+            else:
+                rows += _load_page_in_child(page, sessions, args.iterations, args.shared_seed)
+    if not args.quiet:
+        print_rows(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=1)
+    return 1 if any(row["errors"] for row in rows if row["step"] == "all") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
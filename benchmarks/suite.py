@@ -0,0 +1,236 @@
+"""Benchmark every simulation kernel across size tiers and track regressions
+
+    python -m benchmarks                     # tiers up to 10^6, compare to baseline
+    python -m benchmarks --max-size 1e8      # full tiers
+    python -m benchmarks --update-baseline   # store this run as the new baseline
+    python -m benchmarks --filter atm        # only cases whose name contains "atm"
+
+Each case is timed (best of --repeats) without tracing, then run once more
+under tracemalloc for its peak allocation. Every run is appended to the JSON
+history; a case regresses when its throughput drops, or its peak memory grows,
+by more than --tolerance relative to the baseline. Runs fully offline.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+HISTORY_PATH = os.path.join(RESULTS_DIR, "history.json")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+
+ROLL_TIERS = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7, 10 ** 8]
+CUSTOMER_TIERS = [10, 10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5]
+SECRET_TIERS = [10 ** 3, 10 ** 5]
+EXACT_TIERS = [10 ** 6, 10 ** 9]
+
+# A benchmark case: `setup()` builds inputs untimed, `run(state)` does the timed work
+Case = namedtuple("Case", "name size unit setup run")
+
+
+def _statistics(codes):
+    import numpy as np
+
+    from simulation.stats import statistics_from_counts, streak_summary
+
+    statistics_from_counts(np.bincount(codes, minlength=6), list("123456"))
+    streak_summary(codes, 6)
+    return len(codes)
+
+
+def _roll_cases(sizes):
+    from simulation.dice import count_colored_rolls, sample_biased_faces
+    from simulation.parallel import run_sharded, concat_samples
+
+    weights = [0.4, 0.2, 0.1, 0.1, 0.1, 0.1]
+    for size in sizes:
+        yield Case("roll_multiple_dice", size, "dice/s", lambda: None,
+                   lambda _, n=size: run_sharded(count_colored_rolls, n // 3, 3, True, seed=1, workers=1).sum())
+        yield Case("simulate_biased_dice_rolls", size, "rolls/s", lambda: None,
+                   lambda _, n=size: len(run_sharded(sample_biased_faces, n, weights, seed=1, workers=1, merge=concat_samples)))
+        yield Case("calculate_statistics", size, "rolls/s",
+                   lambda n=size: sample_biased_faces(n, weights, rng=1),
+                   lambda codes: _statistics(codes))
+
+
+def _longest_runs(num_rolls):
+    from simulation.exact import _expected_longest_runs, expected_longest_runs
+
+    # Time the computation, not the memoized answer
+    _expected_longest_runs.cache_clear()
+    expected_longest_runs([1.0, 0.1, 0, 0, 0, 0], num_rolls)
+    return num_rolls
+
+
+def _exact_cases(sizes):
+    for size in sizes:
+        yield Case("expected_longest_runs", size, "rolls/s", lambda: None, lambda _, n=size: _longest_runs(n))
+
+
+def _guess_cases(sizes):
+    import numpy as np
+
+    from simulation.guessing import batch_attempts, mode_titles
+
+    for size in sizes:
+        for mode in mode_titles:
+            yield Case(f"guess[mode={mode}]", size, "games/s",
+                       lambda n=size: np.random.default_rng(2).integers(1, 100001, n),
+                       lambda secrets, m=mode: len(batch_attempts(m, secrets, rng=1)))
+
+
+def _atm_cases(sizes):
+    from simulation.atm import run_atm_simulation, simulate_atm
+    from simulation.fleet import AtmTable, CustomerTable
+    from simulation.ledger import Ledger
+
+    def setup(num_customers):
+        ledger = Ledger()
+        customers = CustomerTable([10 ** 9] * num_customers, ledger)
+        atms = AtmTable([2 * 10 ** 9] * max(3, num_customers // 100), ledger)
+        return customers, atms
+
+    def run(state):
+        customers, atms = state
+        # Ample cash and no outages keep every tier running for its full length
+        return simulate_atm(customers, atms, max_iterations=10, seed=1, outage_prob=0.0)["num_events"]
+
+    def run_page(num_customers):
+        # The page's configuration: random cash, outages and a bounded event log
+        _, _, result = run_atm_simulation(num_customers, max(3, num_customers // 100), max_iterations=20, seed=1,
+                                          record_events=True, max_recorded_events=5000)
+        return result["num_events"]
+
+    for size in sizes:
+        yield Case("simulate_atm", size, "events/s", lambda n=size: setup(n), run)
+        yield Case("run_atm_simulation", size, "events/s", lambda n=size: n, run_page)
+
+
+def build_cases(max_size, name_filter=None):
+    cases = []
+    cases += _roll_cases([n for n in ROLL_TIERS if n <= max_size])
+    cases += _exact_cases([n for n in EXACT_TIERS if n <= max_size])
+    cases += _guess_cases([n for n in SECRET_TIERS if n <= max_size])
+    cases += _atm_cases([n for n in CUSTOMER_TIERS if n <= max_size])
+    if name_filter:
+        cases = [case for case in cases if name_filter in case.name]
+    return cases
+
+
+def measure(case, repeats):
+    """Traced peak memory plus best-of-`repeats` wall time for one case"""
+    # The traced run goes first and doubles as the warm-up for the timed runs
+    state = case.setup()
+    tracemalloc.start()
+    case.run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = float("inf")
+    units = 0
+    for _ in range(repeats):
+        state = case.setup()
+        start = time.perf_counter()
+        units = case.run(state)
+        best = min(best, time.perf_counter() - start)
+    return {
+        "name": case.name,
+        "size": case.size,
+        "unit": case.unit,
+        "seconds": best,
+        "throughput": units / best if best > 0 else float("inf"),
+        "peak_bytes": peak,
+    }
+
+
+def case_key(result):
+    return f"{result['name']}@{result['size']}"
+
+
+def compare(results, baseline, tolerance):
+    """Return (key, metric, baseline value, current value) for every regression"""
+    previous = {case_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = previous.get(case_key(result))
+        if old is None:
+            continue
+        if result["throughput"] < old["throughput"] * (1 - tolerance):
+            regressions.append((case_key(result), "throughput", old["throughput"], result["throughput"]))
+        if result["peak_bytes"] > old["peak_bytes"] * (1 + tolerance) + 64 * 1024:
+            regressions.append((case_key(result), "peak_bytes", old["peak_bytes"], result["peak_bytes"]))
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5, check=True).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n")[0])
+    parser.add_argument("--max-size", type=float, default=1e6, help="largest tier to run (default 1e6)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--filter", default=None, help="only run cases whose name contains this")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown or growth")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = []
+    for case in build_cases(args.max_size, args.filter):
+        result = measure(case, args.repeats)
+        results.append(result)
+        print(f"{case_key(result):40s} {result['throughput']:>14,.0f} {result['unit']:9s} "
+              f"{result['seconds'] * 1e3:>10.2f} ms  peak {result['peak_bytes'] / 2 ** 20:>8.2f} MiB")
+
+    import numpy as np
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "results": results,
+    }
+    history = _load_json(args.history, [])
+    history.append(record)
+    _save_json(args.history, history)
+
+    baseline = _load_json(args.baseline, None)
+    if args.update_baseline or baseline is None:
+        _save_json(args.baseline, record)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for key, metric, old, new in regressions:
+        print(f"REGRESSION {key} {metric}: {old:,.0f} -> {new:,.0f}", file=sys.stderr)
+    if not regressions:
+        print(f"No regressions against baseline from {baseline.get('timestamp')} ({baseline.get('commit')})")
+    return 1 if regressions else 0
@@ -1,10 +1,28 @@
 import random
-import matplotlib.pyplot as plt
+import time
+from collections import deque
+from functools import partial
+from itertools import islice
+import pandas as pd
 import streamlit as st
-
-# Initialize global variables
-attempts = []
-guesses = []
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from simulation.guessing import evaluate_strategies, mode_titles, next_guess
+from ui.jobs import run_job
+from ui.profiling import profiling_controls, show_profiling_panel
+
+# Rendering limits: redraws per second, plotted points and log lines kept
+MAX_FPS = 5
+MAX_PLOT_POINTS = 500
+MAX_LOG_LINES = 50
+# Guesses kept in each session's history
+MAX_HISTORY = 10_000
+
+# Function to get this session's guess history; every browser session keeps its own
+def guess_history(reset=False):
+    if reset or "guess_history" not in st.session_state:
+        st.session_state.guess_history = (deque(maxlen=MAX_HISTORY), deque(maxlen=MAX_HISTORY))
+    return st.session_state.guess_history
 
 # Function to perform guessing simulation
 def guess(mode):
@@ -13,83 +31,92 @@ def guess(mode):
     high = 100000
     attempt = 0
     found = False
+    attempts, guesses = guess_history(reset=True)
 
     st.info(f"[INFO] Secret number is randomly selected between 1 and 100,000.")
     progress_bar = st.progress(0)
+    chart = ProgressChart(mode, attempts, guesses)
+    log = deque(maxlen=MAX_LOG_LINES)
+    log_placeholder = st.empty()
 
     while not found:
-        # Guess logic for each mode
-        if mode == 1:  # Random Guess Mode
-            current_guess = random.randint(low, high)
-        elif mode == 2:  # Binary Search Mode
-            current_guess = (low + high) // 2
-        elif mode == 3:  # Ternary Search Mode
-            mid1 = low + (high - low) // 3
-            mid2 = high - (high - low) // 3
-            if secret_number < mid1:
-                current_guess = low + (mid1 - low) // 2
-            elif secret_number > mid2:
-                current_guess = high - (high - mid2) // 2
-            else:
-                current_guess = (mid1 + mid2) // 2
-        elif mode == 4:  # Golden Ratio Search Mode
-            golden_ratio = 0.618
-            mid = int(low + golden_ratio * (high - low))
-            current_guess = mid
-        elif mode == 5:  # Logarithmic Search Mode
-            current_guess = low + int((high - low) / (2 ** (attempt / 10 + 1)))
+        current_guess = next_guess(mode, low, high, attempt, secret_number)
 
         # Record data
         attempt += 1
         attempts.append(attempt)
         guesses.append(current_guess)
 
-        # Update progress
-        progress = 1 - abs(current_guess - secret_number) / 100000
-        progress_bar.progress(progress)
-
-        # Display plot
-        plot_progress(mode, attempt, current_guess, low, high)
-
         # Evaluate guess
+        bounds = (low, high)
         if current_guess == secret_number:
-            st.success(f"🎉 Success! Guessed the number {secret_number} in {attempt} attempts!")
             found = True
         elif current_guess < secret_number:
-            st.warning(f"Guess {current_guess} is too low.")
+            log.append(f"Guess {current_guess} is too low.")
             low = current_guess + 1
         else:
-            st.warning(f"Guess {current_guess} is too high.")
+            log.append(f"Guess {current_guess} is too high.")
             high = current_guess - 1
 
+        # Update progress, plot and log at most MAX_FPS times per second
+        if chart.update(attempt, current_guess, *bounds, force=found):
+            progress_bar.progress(1 - abs(current_guess - secret_number) / 100000)
+            log_placeholder.code("\n".join(log) or " ", language=None)
+
+    st.success(f"🎉 Success! Guessed the number {secret_number} in {attempt} attempts!")
+
     # Print summary
-    print_summary(secret_number, attempt, mode)
-
-# Plot progress function
-def plot_progress(mode, attempt, current_guess, low, high):
-    mode_titles = {
-        1: 'Random Guess Mode',
-        2: 'Binary Search Mode',
-        3: 'Ternary Search Mode',
-        4: 'Golden Ratio Search Mode',
-        5: 'Logarithmic Search Mode'
-    }
-    title = mode_titles.get(mode, 'Unknown Mode')
-
-    plt.figure(figsize=(10, 5))
-    plt.plot(attempts, guesses, 'b-o', label="Guesses")
-    plt.axhline(low, color='g', linestyle='--', label="Lower Bound")
-    plt.axhline(high, color='r', linestyle='--', label="Upper Bound")
-    plt.scatter(attempt, current_guess, color='orange', zorder=5, label=f"Current Guess: {current_guess}")
-    plt.xlabel('Attempts')  
-    plt.ylabel('Guesses')  
-    plt.title(f"{title}\nTotal Attempts: {attempt}")  
-    plt.legend()
-    plt.grid(True)
-    st.pyplot(plt)
+    print_summary(secret_number, attempt, mode, guesses)
+
+# Progress chart drawn into one placeholder and reused for every frame; the figure is
+# never registered with pyplot, so a run stopped mid-game leaves nothing open
+class ProgressChart:
+    def __init__(self, mode, attempts, guesses):
+        self.attempts = attempts
+        self.guesses = guesses
+        self.title = mode_titles.get(mode, 'Unknown Mode')
+        self.placeholder = st.empty()
+        self.last_draw = 0.0
+        self.fig = Figure(figsize=(10, 5))
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.line, = self.ax.plot([], [], 'b-o', label="Guesses")
+        self.low_line = self.ax.axhline(1, color='g', linestyle='--', label="Lower Bound")
+        self.high_line = self.ax.axhline(100000, color='r', linestyle='--', label="Upper Bound")
+        self.current, = self.ax.plot([], [], 'o', color='orange', zorder=5, label="Current Guess")
+        self.ax.set_xlabel('Attempts')
+        self.ax.set_ylabel('Guesses')
+        self.ax.grid(True)
+
+    def update(self, attempt, current_guess, low, high, force=False):
+        """Redraw if the frame budget allows; returns whether a frame was drawn"""
+        now = time.monotonic()
+        if not force and now - self.last_draw < 1 / MAX_FPS:
+            return False
+
+        # Downsample long histories with a fixed stride, always keeping the last point
+        stride = max(1, len(self.attempts) // MAX_PLOT_POINTS)
+        xs = list(islice(self.attempts, 0, None, stride))
+        ys = list(islice(self.guesses, 0, None, stride))
+        if xs[-1] != self.attempts[-1]:
+            xs.append(self.attempts[-1])
+            ys.append(self.guesses[-1])
+        self.line.set_data(xs, ys)
+        self.low_line.set_ydata([low, low])
+        self.high_line.set_ydata([high, high])
+        self.current.set_data([attempt], [current_guess])
+        self.current.set_label(f"Current Guess: {current_guess}")
+        self.ax.set_title(f"{self.title}\nTotal Attempts: {attempt}")
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.ax.legend()
+        self.placeholder.pyplot(self.fig)
+        # Measure the budget from the end of the draw so slow renders cannot chain
+        self.last_draw = time.monotonic()
+        return True
 
 # Print summary
-def print_summary(secret_number, attempt, mode):
+def print_summary(secret_number, attempt, mode, guesses):
     average_guess = sum(guesses) // len(guesses) if guesses else 0
     st.markdown(f"""
     ### Simulation Summary
@@ -100,6 +127,22 @@ def print_summary(secret_number, attempt, mode):
     - **Success Rate:** {100 * (1 - abs(secret_number - guesses[-1]) / 100000):.2f}%
     """)
 
+# Compare every strategy over the full range of secrets on the shared process pool
+def compare_strategies(sample_size=None, seed=0):
+    params = {"sample_size": sample_size}
+    results = run_job(
+        "guessing", params, seed, partial(evaluate_strategies, sample_size=sample_size, seed=seed), process=True)
+    summary = pd.DataFrame(
+        [{"Mode": mode_titles[mode], "Mean": r["mean"], "p50": r["p50"], "p99": r["p99"], "Max": r["max"]}
+         for mode, r in results.items()]
+    ).set_index("Mode")
+    st.markdown("### Strategy Comparison")
+    st.table(summary.style.format("{:.2f}"))
+
+    distribution = pd.DataFrame({mode_titles[mode]: pd.Series(r["distribution"]) for mode, r in results.items()})
+    st.markdown("**Attempts distribution (number of secrets solved in N attempts)**")
+    st.line_chart(distribution.fillna(0))
+
 # Streamlit App UI
 st.title("Number Guessing Simulation")
 
@@ -112,7 +155,8 @@ st.sidebar.markdown("""
 1. Select a guessing mode from the dropdown.
 2. Click "Start Simulation" to begin.
 3. The app will guide you through the guessing process.
-4. You can reset the simulation at any time.
+4. Click "Compare All Strategies" to play every mode against every secret.
+5. You can reset the simulation at any time.
 """)
 
 # Simulation Mode Selection
@@ -136,13 +180,19 @@ mode_mapping = {
     "Logarithmic Search Mode": 5
 }
 
+profiler = profiling_controls()
+
 # Start and Reset Simulation Buttons in Sidebar
 if st.sidebar.button("Start Simulation"):
-    attempts.clear()
-    guesses.clear()
-    guess(mode_mapping[mode])
+    with profiler.stage("guess"):
+        guess(mode_mapping[mode])
+
+if st.sidebar.button("Compare All Strategies"):
+    with profiler.stage("compare_strategies"):
+        compare_strategies()
 
 if st.sidebar.button("Reset Simulation"):
-    attempts.clear()
-    guesses.clear()
+    guess_history(reset=True)
     st.write("Simulation reset. Ready to start again!")
+
+show_profiling_panel(profiler)
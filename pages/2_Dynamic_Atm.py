@@ -1,137 +1,74 @@
-import random
-import time
-from datetime import datetime
+from functools import partial
+import pandas as pd
 import streamlit as st
-
-# Utility functions
-def random_divisible_by_100(min_val, max_val):
-    return random.randint(min_val // 100, max_val // 100) * 100
-
-def print_timestamp():
-    return f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]"
-
-# Classes
-class Customer:
-    def __init__(self, name, balance):
-        self.name = name
-        self.balance = balance
-        self.transactions = []
-
-    def withdraw(self, amount):
-        if self.balance >= amount:
-            self.balance -= amount
-            self.transactions.append(f"- Withdrawn ${amount} ({print_timestamp()})")
-            return True
-        else:
-            self.transactions.append(f"- Failed Withdraw ${amount} (Insufficient Balance) ({print_timestamp()})")
-        return False
-
-    def deposit(self, amount):
-        self.balance += amount
-        self.transactions.append(f"+ Deposited ${amount} ({print_timestamp()})")
-
-class ATM:
-    def __init__(self, atm_id, cash_balance):
-        self.atm_id = atm_id
-        self.cash_balance = cash_balance
-        self.enabled = True
-        self.transactions = []
-
-    def dispense_cash(self, amount):
-        if self.cash_balance >= amount:
-            self.cash_balance -= amount
-            self.transactions.append(f"- Dispensed ${amount} ({print_timestamp()})")
-            return True
-        else:
-            self.enabled = False
-            return False
-
-# Simulation function
-def simulate_atm(customers, atms, max_iterations=None):
-    successful_transactions = 0
-    failed_transactions = 0
-    total_attempts = 0
-    total_time = 0
-    iteration = 0
-    maintenance_schedule = random.randint(1, 5)
-
-    while any(atm.enabled for atm in atms) and (max_iterations is None or iteration < max_iterations):
-        iteration += 1
-        for customer in customers:
-            if not any(atm.enabled for atm in atms):
-                st.warning("All ATMs are out of cash or disabled. Simulation ends.")
-                print_summary(customers, atms, successful_transactions, failed_transactions, total_attempts, total_time)
-                return
-
-            atm = random.choice([atm for atm in atms if atm.enabled])
-            action = random.choice(["withdraw", "deposit"])
-            if action == "withdraw":
-                amount_to_process = random_divisible_by_100(1000, 5000)
-                start_time = time.time()
-                st.write(f"{print_timestamp()} {customer.name} approaches ATM-{atm.atm_id} to withdraw ${amount_to_process}")
-
-                if random.random() < 0.05:
-                    st.error(f"{print_timestamp()} ATM-{atm.atm_id} went out of service unexpectedly.")
-                    atm.enabled = False
-                    failed_transactions += 1
-                    continue
-
-                if customer.balance < amount_to_process:
-                    st.warning(f"{print_timestamp()} Insufficient balance for {customer.name} to withdraw ${amount_to_process}")
-                    failed_transactions += 1
-                elif atm.cash_balance < amount_to_process:
-                    st.warning(f"{print_timestamp()} ATM-{atm.atm_id} is out of cash. {customer.name}'s transaction failed.")
-                    atm.enabled = False
-                    failed_transactions += 1
-                else:
-                    customer.withdraw(amount_to_process)
-                    atm.dispense_cash(amount_to_process)
-                    end_time = time.time()
-                    transaction_time = end_time - start_time
-                    total_time += transaction_time
-                    total_attempts += 1
-                    st.success(f"{print_timestamp()} Transaction successful! {customer.name} withdrew ${amount_to_process} in {transaction_time:.2f} seconds")
-            elif action == "deposit":
-                amount_to_deposit = random_divisible_by_100(100, 5000)
-                customer.deposit(amount_to_deposit)
-                st.success(f"{print_timestamp()} {customer.name} deposited ${amount_to_deposit}")
-
-            if iteration % maintenance_schedule == 0:
-                atm.enabled = False
-                st.warning(f"{print_timestamp()} ATM-{atm.atm_id} is undergoing maintenance.")
-                time.sleep(1)
-                atm.enabled = True
-                st.success(f"{print_timestamp()} ATM-{atm.atm_id} is back online.")
-
-            time.sleep(0.5)
-
-    print_summary(customers, atms, successful_transactions, failed_transactions, total_attempts, total_time)
+from simulation.atm import run_atm_simulation
+from simulation.cache import new_seed
+from simulation.streaming import QuantileSketch
+from ui.eventlog import LogSink, level_filter
+from ui.jobs import run_job
+from ui.profiling import profiling_controls, show_profiling_panel
+
+# Most recent simulated events kept for the event log
+MAX_RECORDED_EVENTS = 5000
+# Transactions shown per entity on each summary page
+TRANSACTIONS_PER_PAGE = 20
+# ATMs and customers listed on each summary page
+ACCOUNTS_PER_PAGE = 10
+# Largest fleet the inputs allow; the biggest run finishes in about a second
+MAX_CUSTOMERS = 100_000
+MAX_ATMS = 1_000
+
+# Run on the shared process pool through the result cache
+def cached_atm_simulation(num_customers, num_atms, max_iterations, seed):
+    params = {"num_customers": num_customers, "num_atms": num_atms, "max_iterations": max_iterations}
+    return run_job(
+        "atm", params, seed, partial(run_atm_simulation, num_customers, num_atms, max_iterations, seed, record_events=True,
+                                     max_recorded_events=MAX_RECORDED_EVENTS), process=True)
+
+# Show the recorded simulation events as one log table, filtered by level
+def replay_events(events, customers, levels):
+    LogSink(events, levels=levels, customer_name=lambda c: customers[c].name).close()
 
 # Summary function
-def print_summary(customers, atms, successful_transactions, failed_transactions, total_attempts, total_time):
+def print_summary(customers, atms, successful_transactions, failed_transactions, total_attempts, total_time, sim_time=0.0, page=0, time_sketch=None, account_page=0):
     avg_transaction_time = total_time / total_attempts if total_attempts > 0 else 0
 
-    st.markdown("\n### Simulation Summary")
-    st.markdown(f"- **Total Successful Transactions:** {successful_transactions}")
-    st.markdown(f"- **Total Failed Transactions:** {failed_transactions}")
-    st.markdown(f"- **Total Attempts:** {total_attempts}")
-    st.markdown(f"- **Average Transaction Time:** {avg_transaction_time:.2f} seconds")
-
-    st.markdown("\n### ATM Statistics")
-    for atm in atms:
-        st.markdown(f"**ATM-{atm.atm_id}:**")
-        st.markdown(f"  - Cash Balance: ${atm.cash_balance}")
-        st.markdown(f"  - Transactions:")
-        for transaction in atm.transactions:
-            st.markdown(f"    {transaction}")
-
-    st.markdown("\n### Customer Statistics")
-    for customer in customers:
-        st.markdown(f"**Customer-{customer.name}:**")
-        st.markdown(f"  - Balance: ${customer.balance}")
-        st.markdown(f"  - Transactions:")
-        for transaction in customer.transactions:
-            st.markdown(f"    {transaction}")
+    # The whole summary is one element, the accounts one table per section
+    lines = [
+        f"- **Total Successful Transactions:** {successful_transactions}",
+        f"- **Total Failed Transactions:** {failed_transactions}",
+        f"- **Total Attempts:** {total_attempts}",
+        f"- **Average Transaction Time:** {avg_transaction_time:.2f} simulated seconds",
+        f"- **Simulated Duration:** {sim_time:.2f} seconds",
+    ]
+    if time_sketch is not None and time_sketch.count:
+        lines.append(f"- **Transaction Time p50 / p90 / p99:** {time_sketch.quantile(0.5):.2f} / "
+                     f"{time_sketch.quantile(0.9):.2f} / {time_sketch.quantile(0.99):.2f} seconds")
+    balances = QuantileSketch().update(customers.balance)
+    lines.append(f"- **Customer Balance p10 / p50 / p90:** ${balances.quantile(0.1):,.0f} / "
+                 f"${balances.quantile(0.5):,.0f} / ${balances.quantile(0.9):,.0f}")
+    st.markdown("### Simulation Summary\n" + "\n".join(lines))
+
+    # Only one page of accounts is listed, however large the fleet
+    accounts = slice(account_page * ACCOUNTS_PER_PAGE, (account_page + 1) * ACCOUNTS_PER_PAGE)
+    st.markdown("### ATM Statistics")
+    print_transaction_page([(f"ATM-{atm.atm_id}", atm.cash_balance, atm.transactions) for atm in atms[accounts]],
+                           page, "Cash Balance")
+
+    st.markdown("### Customer Statistics")
+    print_transaction_page([(customer.name, customer.balance, customer.transactions) for customer in customers[accounts]],
+                           page, "Balance")
+
+# Format one page of each account's ledger view into a single table; only the visible rows become strings
+def print_transaction_page(accounts, page, balance_label):
+    rows = []
+    for name, balance, transactions in accounts:
+        total = len(transactions)
+        start = min(page * TRANSACTIONS_PER_PAGE, total)
+        lines = transactions[start:start + TRANSACTIONS_PER_PAGE] or [f"(none of {total} on this page)"]
+        for number, line in enumerate(lines, start + 1):
+            rows.append({"Account": name, balance_label: f"${balance}", "#": f"{number} of {total}", "Transaction": line})
+    st.dataframe(pd.DataFrame(rows), hide_index=True)
 
 # Streamlit App UI
 st.title("ATM Simulation")
@@ -145,19 +82,42 @@ st.sidebar.markdown("""
 1. Select the number of customers and ATMs for the simulation.
 2. Set a maximum number of iterations (leave empty for unlimited).
 3. Click "Start Simulation" to begin.
-4. You can reset the simulation anytime.
+4. Use "Transaction Page" to page through each ATM's and customer's transactions, and "Account Page" to page through the ATMs and customers.
+5. Use "Event Levels" to filter the event log.
+6. You can reset the simulation anytime.
 """)
 
 # Inputs
-num_customers = st.sidebar.number_input("Number of Customers:", min_value=1, max_value=50, value=10)
-num_atms = st.sidebar.number_input("Number of ATMs:", min_value=1, max_value=10, value=3)
+num_customers = st.sidebar.number_input("Number of Customers:", min_value=1, max_value=MAX_CUSTOMERS, value=10)
+num_atms = st.sidebar.number_input("Number of ATMs:", min_value=1, max_value=MAX_ATMS, value=3)
 max_iterations = st.sidebar.number_input("Maximum Iterations (optional):", min_value=1, value=20, step=1, format="%d")
+seed = st.sidebar.number_input("Random Seed (optional):", min_value=0, value=None, step=1)
+transaction_page = st.sidebar.number_input("Transaction Page:", min_value=1, value=1, step=1)
+account_page = st.sidebar.number_input("Account Page:", min_value=1, value=1, step=1)
+event_levels = level_filter()
+profiler = profiling_controls()
 
 # Buttons in Sidebar
 if st.sidebar.button("Start Simulation"):
-    customers = [Customer(f"Customer-{i}", random_divisible_by_100(2000, 10000)) for i in range(num_customers)]
-    atms = [ATM(i, random_divisible_by_100(5000, 10000)) for i in range(num_atms)]
-    simulate_atm(customers, atms, max_iterations=max_iterations)
+    run = (num_customers, num_atms, max_iterations, seed if seed is not None else new_seed())
+    with profiler.stage("event loop"):
+        customers, atms, result = cached_atm_simulation(*run)
+    st.session_state.atm_run = run
 
 if st.sidebar.button("Reset Simulation"):
+    st.session_state.pop("atm_run", None)
     st.sidebar.write("Simulation reset. Ready to start again!")
+
+# Paging and filtering read the last run back from the result cache instead of re-simulating
+if "atm_run" in st.session_state:
+    with profiler.stage("cache lookup"):
+        customers, atms, result = cached_atm_simulation(*st.session_state.atm_run)
+    with profiler.stage("replay_events"):
+        st.markdown("### Event Log")
+        replay_events(result["events"], customers, event_levels)
+    with profiler.stage("print_summary"):
+        print_summary(customers, atms, result["successful_transactions"], result["failed_transactions"],
+                      result["total_attempts"], result["total_time"], result["sim_time"], page=transaction_page - 1,
+                      time_sketch=result["transaction_time_sketch"], account_page=account_page - 1)
+
+show_profiling_panel(profiler)
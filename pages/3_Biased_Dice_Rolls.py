@@ -1,110 +1,215 @@
 import streamlit as st
-import random
 import numpy as np
-from collections import Counter
-import matplotlib.pyplot as plt
-from time import sleep
+import pandas as pd
+from functools import partial
+from simulation.cache import new_seed
+from simulation.dice import dice_faces, face_probabilities, sample_biased_faces
+from simulation.exact import (MAX_SUM_ROLLS, expected_longest_runs, expected_num_runs,
+                              sum_distribution, sum_moments)
+from simulation.parallel import run_sharded, concat_samples
+from simulation.rollstore import default_store_bytes, list_stores, open_or_write_rolls, store_path
+from simulation.stats import run_length_encode, statistics_from_counts, streak_summary
+from ui.charts import bar_chart_spec, show_bar_chart
+from ui.jobs import run_job
+from ui.profiling import profiling_controls, show_profiling_panel
 
-# Define dice faces
-dice_faces = ["⚀", "⚁", "⚂", "⚃", "⚄", "⚅"]
+# Only the first few batches of rolls are listed; the rest is summarized
+SHOWN_BATCHES = 5
+# Streaks listed per page
+STREAKS_PER_PAGE = 50
+# Largest run kept in memory; bigger runs must be streamed to disk
+MAX_IN_MEMORY_ROLLS = 10_000_000
+MAX_STORED_ROLLS = 1_000_000_000
 
-# Function to simulate biased dice rolls with animation
-def simulate_biased_dice_rolls(num_dice, weights):
+# Function to roll the dice on the shared job pool through the result cache
+def roll_biased_dice(num_dice, weights, seed):
+    params = {"num_dice": num_dice, "weights": list(weights)}
+    return run_job(
+        "biased_dice", params, seed,
+        lambda: run_sharded(sample_biased_faces, num_dice, weights, seed=seed, merge=concat_samples))
+
+# Function to load a run's rolls: an in-memory array, or a zero-copy view of its on-disk store
+def load_rolls(num_dice, weights, seed, path=None):
+    if path is None:
+        return roll_biased_dice(num_dice, weights, seed), None
+    # Streams the rolls into a memory-mapped store, or reopens it if this run was stored before;
+    # the store is opened on the job pool but not kept in the result cache. Writing a new store
+    # first deletes the least recently used ones beyond the store directory's byte budget
+    store = run_job("roll_store_open", {"path": path, "num_dice": num_dice, "weights": list(weights)}, seed,
+                    lambda: open_or_write_rolls(path, num_dice, weights, seed=seed, max_bytes=default_store_bytes()),
+                    cached=False)
+    return store.flat, store
+
+# Function to fold a stored run into face counts and streaks once, through the result cache
+def analyze_store(store):
+    return run_job(
+        "roll_store", {"path": store.path}, store.seed, lambda: store.accumulate(workers=None))
+
+# Function to simulate biased dice rolls and list the first few batches
+def simulate_biased_dice_rolls(num_dice, weights, seed, path=None):
     st.write(f"Simulating {num_dice} dice rolls with custom weights...")
-    rolls = []
-    for _ in range(num_dice):
-        roll = random.choices(dice_faces, weights=weights)[0]
-        rolls.append(roll)
-        # Display rolls in batches of 10 to save space
-        if len(rolls) % 10 == 0:
-            st.text(", ".join(rolls[-10:]))  # Show last 10 rolls
-            sleep(0.5)  # Short delay to simulate rolling
-    return rolls
+    codes, _ = load_rolls(num_dice, weights, seed, path)
+    # Display rolls in batches of 10 to save space
+    for start in range(0, min(len(codes), 10 * SHOWN_BATCHES) - 9, 10):
+        st.text(", ".join(dice_faces[code] for code in codes[start:start + 10]))
+    if len(codes) > 10 * SHOWN_BATCHES:
+        st.text(f"... {len(codes) - 10 * SHOWN_BATCHES} more rolls")
+    return codes
 
 # Function to calculate dice statistics
-def calculate_statistics(sorted_dice):
-    dice_values = [dice_faces.index(face) + 1 for face in sorted_dice]
-    frequency = Counter(sorted_dice)
-    dice_sum = sum(dice_values)
-    dice_mean = np.mean(dice_values)
-    dice_median = np.median(dice_values)
-    mode_face, mode_count = frequency.most_common(1)[0]
-    most_common = frequency.most_common(1)[0]
-    least_common = frequency.most_common()[-1]
-    return {
-        "frequency": frequency,
-        "sum": dice_sum,
-        "mean": dice_mean,
-        "median": dice_median,
-        "mode": (mode_face, mode_count),
-        "most_common": most_common,
-        "least_common": least_common
-    }
-
-# Function to visualize dice roll distribution
+def calculate_statistics(codes):
+    counts = np.bincount(codes, minlength=len(dice_faces))
+    return statistics_from_counts(counts, dice_faces)
+
+# Function to visualize dice roll distribution; drawn once per distinct distribution
 def plot_dice_roll_distribution(frequency):
-    fig, ax = plt.subplots()
-    ax.bar(frequency.keys(), frequency.values(), color="skyblue", alpha=0.75)
-    ax.set_xticks(range(1, 7))
-    ax.set_xticklabels(dice_faces)
-    ax.set_xlabel("Dice Face")
-    ax.set_ylabel("Frequency")
-    ax.set_title("Dice Roll Distribution")
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-    st.pyplot(fig)
+    show_bar_chart(bar_chart_spec(
+        dice_faces, [frequency[face] for face in dice_faces], colors="skyblue", alpha=0.75,
+        title="Dice Roll Distribution", xlabel="Dice Face", ylabel="Frequency", grid=True))
 
 # Function to display streaks
-def track_consecutive_streaks(sorted_dice):
-    streaks = []
-    current_streak = [sorted_dice[0]]
-    
-    for i in range(1, len(sorted_dice)):
-        if sorted_dice[i] == sorted_dice[i - 1]:
-            current_streak.append(sorted_dice[i])
-        else:
-            streaks.append(current_streak)
-            current_streak = [sorted_dice[i]]
-    
-    streaks.append(current_streak)
-    return streaks
+def track_consecutive_streaks(codes):
+    return streak_summary(codes, len(dice_faces))
+
+# Function to display one page of streaks in roll order
+def show_streak_page(codes, page, num_runs, store=None):
+    first = min(page * STREAKS_PER_PAGE, num_runs)
+    if store is None:
+        values, lengths, starts = (column[first:first + STREAKS_PER_PAGE] for column in run_length_encode(codes))
+    else:
+        # Stored runs are scanned chunk by chunk only up to the requested page
+        values, lengths, starts = store.runs(first, STREAKS_PER_PAGE)
+    st.dataframe(pd.DataFrame({
+        "Streak": np.arange(first, first + len(lengths)) + 1,
+        "Face": [dice_faces[value] for value in values],
+        "Length": lengths,
+        "Starts at Roll": starts + 1,
+    }), hide_index=True)
+    st.caption(f"Showing streaks {first + 1}-{first + len(lengths)} of {num_runs}")
+
+# Function to compute the exact expected longest streaks on the shared process pool through the result cache
+def exact_longest_streaks(num_dice, weights):
+    params = {"num_dice": num_dice, "weights": list(weights)}
+    return run_job("exact_longest", params, None, partial(expected_longest_runs, list(weights), num_dice), process=True)
+
+# Function to show the exact distribution for these weights, and how far a sampled run deviates from it
+def show_exact_baseline(num_dice, weights, counts=None, streaks=None):
+    probs = face_probabilities(weights)
+    expected_counts = num_dice * probs
+    table = pd.DataFrame({
+        "Face": dice_faces,
+        "Exact Probability": probs,
+        "Expected Count": expected_counts,
+        "Expected Longest Streak": exact_longest_streaks(num_dice, weights),
+    }).set_index("Face")
+    mean, std = sum_moments(weights, num_dice)
+    if counts is None:
+        st.table(table)
+        st.write(f"Exact sum: mean {mean:,.2f}, standard deviation {std:,.2f}")
+        st.write(f"Expected number of streaks: {expected_num_runs(weights, num_dice):,.2f}")
+        return
+
+    # Deviations in standard deviations of each face's binomial count
+    spread = np.sqrt(expected_counts * (1 - probs))
+    table["Sampled Count"] = counts
+    table["Deviation (σ)"] = np.divide(counts - expected_counts, spread, out=np.zeros(len(probs)), where=spread > 0)
+    table["Sampled Longest Streak"] = streaks["longest"]
+    st.table(table)
+    dice_sum = int(counts @ np.arange(1, len(counts) + 1))
+    st.write(f"Sampled sum {dice_sum:,} vs. exact mean {mean:,.2f} "
+             f"({(dice_sum - mean) / std if std else 0.0:+.2f}σ)")
+    if num_dice <= MAX_SUM_ROLLS:
+        sums, sum_probs = sum_distribution(weights, num_dice)
+        st.write(f"Exact P(sum ≤ {dice_sum:,}) = {sum_probs[sums <= dice_sum].sum():.4f}")
+    st.write(f"Sampled streaks {streaks['num_runs']:,} vs. expected {expected_num_runs(weights, num_dice):,.2f}")
 
 # Streamlit app
 def main():
     st.title("Biased Dice Rolls")
     st.sidebar.header("Simulation Settings")
-    num_dice = st.sidebar.number_input("Number of Dice Rolls", min_value=1, max_value=1000, value=200)
+    to_disk = st.sidebar.checkbox("Stream Rolls to Disk", value=False,
+                                  help="Write rolls to a memory-mapped file so runs up to a billion rolls can be reopened without resampling")
+    num_dice = st.sidebar.number_input("Number of Dice Rolls", min_value=1,
+                                       max_value=MAX_STORED_ROLLS if to_disk else MAX_IN_MEMORY_ROLLS, value=200)
     weights = [
         st.sidebar.slider(f"Weight for {face}", 0.0, 1.0, value, 0.1)
         for face, value in zip(dice_faces, [0.4, 0.2, 0.1, 0.1, 0.1, 0.1])
     ]
+    seed = st.sidebar.number_input("Random Seed (optional)", min_value=0, value=None, step=1)
+    streak_page = st.sidebar.number_input("Streak Page", min_value=1, value=1, step=1)
+    saved_runs = dict(list_stores())
+    saved_run = st.sidebar.selectbox(
+        "Saved Runs", list(saved_runs), index=None, placeholder="Reopen a stored run",
+        format_func=lambda path: f"{saved_runs[path]['shape'][0]:,} rolls, seed {saved_runs[path]['seed']}")
+    profiler = profiling_controls()
 
     if st.sidebar.button("Run Simulation"):
-        st.subheader("Rolling the Dice...")
-        rolls = simulate_biased_dice_rolls(num_dice, weights)
-        sorted_rolls = sorted(rolls)
-
-        # Display statistics at the top
-        st.subheader("Statistics")
-        stats = calculate_statistics(sorted_rolls)
-        st.write(f"Sum: {stats['sum']}")
-        st.write(f"Mean: {stats['mean']:.2f}")
-        st.write(f"Median: {stats['median']:.2f}")
-        st.write(f"Mode: {stats['mode'][0]} with {stats['mode'][1]} occurrences")
-        st.write(f"Most Frequent: {stats['most_common'][0]} ({stats['most_common'][1]} occurrences)")
-        st.write(f"Least Frequent: {stats['least_common'][0]} ({stats['least_common'][1]} occurrences)")
-
-        st.subheader("Consecutive Streaks")
-        streaks = track_consecutive_streaks(sorted_rolls)
-        for i, streak in enumerate(streaks, 1):
-            st.write(f"Streak {i}: {' '.join(streak)}")
+        if sum(weights) <= 0:
+            st.error("At least one face weight must be above zero to roll the dice.")
+        else:
+            st.subheader("Rolling the Dice...")
+            run_seed = seed if seed is not None else new_seed()
+            path = store_path({"num_dice": num_dice, "weights": list(weights)}, run_seed) if to_disk else None
+            run = (num_dice, tuple(weights), run_seed, path)
+            with profiler.stage("sampling"):
+                simulate_biased_dice_rolls(*run)
+            st.session_state.dice_run = run
 
-        # Display the distribution graph at the bottom
-        st.subheader("Dice Roll Distribution")
-        plot_dice_roll_distribution(Counter(sorted_rolls))
+    if saved_run is not None and st.sidebar.button("Open Saved Run"):
+        header = saved_runs[saved_run]
+        st.session_state.dice_run = (header["shape"][0], tuple(header["weights"]), header["seed"], saved_run)
 
     if st.sidebar.button("Reset Simulation"):
+        st.session_state.pop("dice_run", None)
         st.write("Simulation reset. Ready to start again!")
         st.stop()  # Stops and clears the app state for a fresh simulation
 
+    # Paging through streaks reads the last run back from the result cache
+    if "dice_run" in st.session_state:
+        run_num_dice, run_weights, run_seed, path = st.session_state.dice_run
+        with profiler.stage("cache lookup"):
+            codes, store = load_rolls(run_num_dice, run_weights, run_seed, path)
+            # Stored runs are analyzed chunk by chunk straight from the memory map
+            accumulator = analyze_store(store) if store is not None else None
+
+        # Display statistics at the top
+        with profiler.stage("statistics"):
+            st.subheader("Statistics")
+            if store is not None:
+                st.caption(f"Reading {run_num_dice:,} rolls from {path}")
+            stats = calculate_statistics(codes) if store is None else accumulator.histogram.summary(dice_faces)
+            st.write(f"Sum: {stats['sum']}")
+            st.write(f"Mean: {stats['mean']:.2f}")
+            st.write(f"Median: {stats['median']:.2f}")
+            st.write(f"Mode: {stats['mode'][0]} with {stats['mode'][1]} occurrences")
+            st.write(f"Most Frequent: {stats['most_common'][0]} ({stats['most_common'][1]} occurrences)")
+            st.write(f"Least Frequent: {stats['least_common'][0]} ({stats['least_common'][1]} occurrences)")
+
+        with profiler.stage("streaks"):
+            st.subheader("Consecutive Streaks")
+            streaks = track_consecutive_streaks(codes) if store is None else accumulator.streaks.summary()
+            st.write(f"Total streaks: {streaks['num_runs']}")
+            st.table(pd.DataFrame({"Face": dice_faces, "Longest Streak": streaks["longest"]}).set_index("Face"))
+            st.markdown("**Streak length distribution**")
+            st.bar_chart(pd.Series(streaks["length_distribution"][1:], index=np.arange(1, len(streaks["length_distribution"])), name="Streaks"))
+            show_streak_page(codes, streak_page - 1, streaks["num_runs"], store)
+
+        with profiler.stage("exact baseline"):
+            st.subheader("Exact vs. Sampled")
+            show_exact_baseline(run_num_dice, run_weights, np.array(list(stats["frequency"].values())), streaks)
+
+        # Display the distribution graph at the bottom
+        with profiler.stage("plot"):
+            st.subheader("Dice Roll Distribution")
+            plot_dice_roll_distribution(stats["frequency"])
+
+    # Exact answers need no sampling, so they are shown for the current settings before any run
+    elif sum(weights) > 0:
+        with profiler.stage("exact baseline"):
+            st.subheader("Exact Distribution")
+            show_exact_baseline(num_dice, weights)
+
+    show_profiling_panel(profiler)
+
 if __name__ == "__main__":
     main()
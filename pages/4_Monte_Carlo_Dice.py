@@ -1,66 +1,110 @@
 import streamlit as st
-import random
-import matplotlib.pyplot as plt
-from collections import Counter
-import time
-
-# Define colors and their biased probabilities
-colors = ['Red', 'Blue', 'Green', 'Yellow', 'Purple', 'Orange']
-biased_probs = {
-    'Red': 0.3,
-    'Blue': 0.2,
-    'Green': 0.15,
-    'Yellow': 0.15,
-    'Purple': 0.1,
-    'Orange': 0.1
-}
+import numpy as np
+import pandas as pd
+from simulation.dice import colors, biased_probs, color_probabilities, count_colored_rolls
+from simulation.exact import at_least_probability, color_combinations
+from simulation.cache import new_seed
+from simulation.convergence import estimate_until_converged, summarize_counts
+from simulation.parallel import run_sharded
+from simulation.variance import MODES, estimate_rare_event
+from ui.charts import bar_chart_spec, show_bar_chart
+from ui.jobs import run_job
+from ui.profiling import profiling_controls, show_profiling_panel
 
 # Function to roll multiple colored dice
-def roll_multiple_dice(num_rolls, num_dice=1, biased=False):
-    """Simulate rolling multiple colored dice"""
-    rolls = []
-    for _ in range(num_rolls):
-        if biased:
-            roll = random.choices(colors, weights=[biased_probs[color] for color in colors], k=num_dice)
-        else:
-            roll = random.choices(colors, k=num_dice)
-        rolls.append(roll)
-    return rolls
-
-# Function to analyze and plot the distribution of dice rolls with animation
-def analyze_and_plot(rolls, num_dice, biased):
-    """Analyze and plot the distribution of dice rolls"""
-    flat_rolls = [color for roll in rolls for color in roll]
-    count = Counter(flat_rolls)
-    probabilities = {color: count[color]/len(flat_rolls) for color in colors}
+def roll_multiple_dice(num_rolls, num_dice=1, biased=False, seed=None):
+    """Simulate rolling multiple colored dice across all cores and return per-color counts"""
+    return run_sharded(count_colored_rolls, num_rolls, num_dice, biased, seed=seed)
+
+# Function to roll dice on the shared job pool through the result cache
+def cached_roll_multiple_dice(num_rolls, num_dice, biased, seed):
+    params = {"num_rolls": num_rolls, "num_dice": num_dice, "biased": biased}
+    return run_job(
+        "monte_carlo", params, seed, lambda: roll_multiple_dice(num_rolls, num_dice, biased, seed))
+
+# Function to roll in batches until the target precision is met, through the result cache
+def cached_estimate_until_converged(num_dice, biased, target_half_width, confidence, seed):
+    params = {"num_dice": num_dice, "biased": biased, "target_half_width": target_half_width, "confidence": confidence}
+    return run_job(
+        "monte_carlo_converged", params, seed,
+        lambda: estimate_until_converged(num_dice, biased, target_half_width, confidence, seed=seed))
+
+# Function to estimate a rare color combination with a variance-reduction mode, through the result cache
+def cached_rare_event(mode, num_rolls, num_dice, biased, target, min_matches, confidence, seed):
+    params = {"mode": mode, "num_rolls": num_rolls, "num_dice": num_dice, "biased": biased,
+              "target": target, "min_matches": min_matches, "confidence": confidence}
+    return run_job(
+        "monte_carlo_rare", params, seed,
+        lambda: estimate_rare_event(mode, num_rolls, num_dice, biased, target, min_matches, confidence, seed=seed))
+
+# Function to load a run's summary; target is None for a fixed number of simulations
+def load_run(run):
+    num_simulations, num_dice, biased, target_half_width, confidence, seed = run[:6]
+    if target_half_width is not None:
+        return cached_estimate_until_converged(num_dice, biased, target_half_width, confidence, seed)
+    counts = cached_roll_multiple_dice(num_simulations, num_dice, biased, seed)
+    return summarize_counts(counts, biased, confidence)
 
-    fig, ax = plt.subplots(figsize=(10, 6))
-    bar_positions = range(len(colors))
-    bar = ax.bar(probabilities.keys(), probabilities.values(), color=colors)
+# Function to load a run's rare-event estimate over the same number of simulations
+def load_rare_event(run):
+    num_simulations, num_dice, biased, _, confidence, seed, mode, target, min_matches = run
+    return cached_rare_event(mode, num_simulations, num_dice, biased, target, min_matches, confidence, seed)
+
+# Function to show per-color estimates with confidence intervals
+def show_estimates(summary):
+    confidence = summary["confidence"]
+    expected = summary["expected"]
+    # Deviation of each estimate from the exact probability, in standard errors
+    deviation = (summary["probabilities"] - expected) / np.sqrt(expected * (1 - expected) / summary["total_dice"])
+    st.table(pd.DataFrame({
+        "Color": colors,
+        "Estimate": summary["probabilities"],
+        f"{confidence:.0%} CI Low": summary["ci_low"],
+        f"{confidence:.0%} CI High": summary["ci_high"],
+        "Theoretical": expected,
+        "Deviation (σ)": deviation,
+    }).set_index("Color").style.format("{:.4f}"))
+    st.write(f"Dice rolled: {summary['total_dice']:,} | Widest CI half-width: {summary['max_half_width']:.5f}")
+    st.write(f"Chi-square vs. theoretical: {summary['chi_square']:.2f} (p = {summary['p_value']:.4f})")
+    if "rolls" in summary:
+        status = "reached" if summary["converged"] else "not reached (roll limit hit)"
+        st.write(f"Target precision {status} after {summary['rolls']:,} simulations in {summary['batches']} batches")
+
+# Function to show the rare-event estimate and how much variance its sampling mode saved
+def show_rare_event(result, num_dice, biased):
+    exact = at_least_probability(color_probabilities(biased), num_dice, colors.index(result["target"]), result["min_matches"])
+    st.write(f"P(at least {result['min_matches']} of {num_dice} dice show {result['target']}) "
+             f"≈ {result['estimate']:.3e} ({result['confidence']:.0%} CI {result['ci_low']:.3e} – {result['ci_high']:.3e})")
+    deviation = (result["estimate"] - exact) / result["std_error"] if result["std_error"] else 0.0
+    st.write(f"Exact: {exact:.3e} | Deviation: {deviation:+.2f} standard errors")
+    st.write(f"Sampling mode: {result['mode'].title()} | Rolls: {result['rolls']:,} | "
+             f"Variance reduction vs. naive: {result['variance_reduction']:.1f}x "
+             f"(≈ {result['equivalent_naive_rolls']:,.0f} naive rolls)")
+
+# Function to list the most likely color combinations for one simulation, computed exactly
+def show_exact_combinations(num_dice, biased, top=10):
+    combinations = color_combinations(color_probabilities(biased), num_dice)
+    st.table(pd.DataFrame({
+        "Combination": [", ".join(f"{count} {color}" for count, color in zip(counts, colors) if count)
+                        for counts, _ in combinations[:top]],
+        "Exact Probability": [probability for _, probability in combinations[:top]],
+    }).set_index("Combination").style.format("{:.4f}"))
+    st.caption(f"{top} most likely of {len(combinations)} possible combinations of {num_dice} dice")
+
+# Function to analyze and plot the distribution of dice rolls
+def analyze_and_plot(counts, num_dice, biased):
+    """Analyze and plot the distribution of dice rolls"""
+    total = counts.sum()
+    probabilities = [counts[i] / total for i in range(len(colors))]
 
     # Add the theoretical distribution line
     theoretical_probs = [biased_probs[color] if biased else 1/len(colors) for color in colors]
-    ax.plot(bar_positions, theoretical_probs, 'k--', label='Theoretical (Biased)' if biased else 'Theoretical (Fair)')
-    ax.set_ylim(0, max(max(probabilities.values()), max(theoretical_probs)) + 0.05)
-    ax.legend()
-    ax.set_title('Probability Distribution of Colored Dice Rolls')
-    ax.set_xlabel('Colors')
-    ax.set_ylabel('Probability')
-    ax.set_xticks(bar_positions)
-    ax.set_xticklabels(colors)
-
-    # Display the plot with animation
-    for i in range(0, len(bar_positions), 1):
-        bar[i].set_height(0)
-        bar[i].set_color('grey')
-        plt.pause(0.05)  # Short delay for animation effect
-
-    for i, p in enumerate(probabilities.values()):
-        bar[i].set_height(p)
-        bar[i].set_color(colors[i])
-
-    plt.show()
-    st.pyplot(fig)
+    # The chart is drawn once per distinct run and reused on every rerun
+    show_bar_chart(bar_chart_spec(
+        colors, probabilities, colors=colors, title='Probability Distribution of Colored Dice Rolls',
+        xlabel='Colors', ylabel='Probability', line=theoretical_probs,
+        line_label='Theoretical (Biased)' if biased else 'Theoretical (Fair)',
+        ylim=(0, max(max(probabilities), max(theoretical_probs)) + 0.05), figsize=(10, 6)))
 
 # Streamlit app
 def main():
@@ -80,6 +124,9 @@ def main():
       - **Simulation Type**: Choose whether the dice rolls are biased or fair.
       - **Number of Simulations**: Adjust the number of times you want to roll the dice.
       - **Number of Dice per Simulation**: Choose how many dice will be rolled in each simulation.
+      - **Run Mode**: Roll a fixed number of simulations, or keep rolling until every color's confidence interval is narrower than the target half-width.
+      - **Rare Event**: Estimate the chance that at least the chosen number of dice show one color, using naive, stratified, antithetic or importance sampling over the same number of simulations.
+      - **Random Seed**: Optionally fix the seed to reproduce a run exactly.
     - Click **Run Simulation** to start the Monte Carlo simulation.
     - The results will display the probability distribution for each color.
     - Use **Reset Simulation** to start over with a fresh setup.
@@ -88,30 +135,62 @@ def main():
 
     st.sidebar.header("Simulation Settings")
     st.session_state.biased = st.sidebar.radio("Simulation Type", ["Biased", "Fair"], index=0)
-    st.session_state.num_simulations = st.sidebar.number_input("Number of Simulations", min_value=1, max_value=100000, value=st.session_state.num_simulations)
+    st.session_state.num_simulations = st.sidebar.number_input("Number of Simulations", min_value=1, max_value=1_000_000_000, value=st.session_state.num_simulations)
     st.session_state.num_dice = st.sidebar.number_input("Number of Dice per Simulation", min_value=1, max_value=6, value=st.session_state.num_dice)
+    run_mode = st.sidebar.radio("Run Mode", ["Fixed Simulations", "Target Precision"], index=0)
+    target_half_width = None
+    if run_mode == "Target Precision":
+        target_half_width = st.sidebar.number_input("Target CI Half-Width", min_value=0.00005, max_value=0.05, value=0.001, step=0.0005, format="%.5f")
+    confidence = st.sidebar.selectbox("Confidence Level", [0.90, 0.95, 0.99], index=1, format_func=lambda c: f"{c:.0%}")
+    st.sidebar.header("Rare Event")
+    sampling_mode = st.sidebar.selectbox("Sampling Mode", MODES, index=MODES.index("importance"), format_func=str.title)
+    rare_color = st.sidebar.selectbox("Rare Event Color", colors, index=colors.index("Purple"))
+    min_matches = st.sidebar.number_input("Minimum Matching Dice", min_value=1, max_value=st.session_state.num_dice, value=st.session_state.num_dice)
+    seed = st.sidebar.number_input("Random Seed (optional)", min_value=0, value=None, step=1)
+    profiler = profiling_controls()
 
     if st.sidebar.button("Run Simulation"):
         st.subheader("Running Simulation...")
-        
-        # Show statistics with delay for animation
-        with st.spinner('Simulating...'):
-            results = roll_multiple_dice(st.session_state.num_simulations, st.session_state.num_dice, biased=(st.session_state.biased == "Biased"))
-            time.sleep(0.5)  # Simulate processing time
-        
-        # Show statistics first
-        st.subheader("Simulation Statistics:")
-        probabilities = Counter([color for roll in results for color in roll])
-        for color, prob in probabilities.items():
-            st.write(f"{color}: {prob/st.session_state.num_simulations:.4f}")
+        run = (st.session_state.num_simulations, st.session_state.num_dice, st.session_state.biased == "Biased",
+               target_half_width, confidence, seed if seed is not None else new_seed(),
+               sampling_mode, rare_color, min_matches)
 
-        # Show graph with animation
-        st.subheader("Probability Distribution:")
-        analyze_and_plot(results, st.session_state.num_dice, biased=(st.session_state.biased == "Biased"))
+        with st.spinner('Simulating...'):
+            with profiler.stage("sampling"):
+                load_run(run)
+                load_rare_event(run)
+        st.session_state.last_run = run
 
     if st.sidebar.button("Reset Simulation"):
         st.session_state.clear()
         st.success("Simulation reset. Ready to start again!")
 
+    # Reruns redraw the last run from the result cache instead of re-rolling
+    if "last_run" in st.session_state:
+        with profiler.stage("cache lookup"):
+            summary = load_run(st.session_state.last_run)
+        num_dice, biased = st.session_state.last_run[1:3]
+
+        # Show statistics first
+        with profiler.stage("statistics"):
+            st.subheader("Simulation Statistics:")
+            show_estimates(summary)
+
+        with profiler.stage("rare event"):
+            st.subheader("Rare Event Estimate:")
+            show_rare_event(load_rare_event(st.session_state.last_run), num_dice, biased)
+
+        # Show graph
+        with profiler.stage("analyze_and_plot"):
+            st.subheader("Probability Distribution:")
+            analyze_and_plot(summary["counts"], num_dice, biased=biased)
+
+    # Exact combination probabilities need no sampling, so they follow the current settings
+    with profiler.stage("exact combinations"):
+        with st.expander("Exact Color Combinations"):
+            show_exact_combinations(st.session_state.num_dice, st.session_state.biased == "Biased")
+
+    show_profiling_panel(profiler)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,59 @@
+"""Headless simulation kernels shared by the Streamlit pages and the CLI
+
+Submodules are imported on first attribute access, so `import simulation`
+and the CLI's argument parsing stay cheap. Every kernel, the ATM engine
+included, uses NumPy, which loads with the first of them a job touches.
+"""
+import importlib
+
+_EXPORTS = {
+    "ATM": "simulation.atm",
+    "Customer": "simulation.atm",
+    "run_atm_simulation": "simulation.atm",
+    "simulate_atm": "simulation.atm",
+    "ResultCache": "simulation.cache",
+    "default_cache": "simulation.cache",
+    "estimate_until_converged": "simulation.convergence",
+    "summarize_counts": "simulation.convergence",
+    "accumulate_biased_faces": "simulation.dice",
+    "count_biased_faces": "simulation.dice",
+    "count_colored_rolls": "simulation.dice",
+    "sample_biased_faces": "simulation.dice",
+    "color_combinations": "simulation.exact",
+    "expected_longest_runs": "simulation.exact",
+    "sum_distribution": "simulation.exact",
+    "evaluate_strategies": "simulation.guessing",
+    "next_guess": "simulation.guessing",
+    "AtmTable": "simulation.fleet",
+    "JobPool": "simulation.jobs",
+    "default_pool": "simulation.jobs",
+    "CustomerTable": "simulation.fleet",
+    "Ledger": "simulation.ledger",
+    "run_sharded": "simulation.parallel",
+    "RollStore": "simulation.rollstore",
+    "write_rolls": "simulation.rollstore",
+    "AliasSampler": "simulation.sampling",
+    "sampler_for": "simulation.sampling",
+    "DiceAccumulator": "simulation.streaming",
+    "MomentAccumulator": "simulation.streaming",
+    "QuantileSketch": "simulation.streaming",
+    "statistics_from_counts": "simulation.stats",
+    "streak_summary": "simulation.stats",
+    "run_sweep": "simulation.sweep",
+    "estimate_rare_event": "simulation.variance",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'simulation' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,191 @@
+"""Bounded cache for simulation results keyed on page, parameters and seed
+
+Entries live in an in-memory LRU capped by an estimated byte budget. With a
+spill directory configured, evicted entries are pickled to disk and promoted
+back on their next hit. A run is only cacheable when its seed is fixed, so
+pages draw a concrete seed up front even when the user leaves it empty.
+"""
+import hashlib
+import json
+import os
+import pickle
+import secrets
+import sys
+import threading
+from collections import OrderedDict, deque
+
+# Bump whenever a kernel change alters the results for the same seed
+ENGINE_VERSION = 3
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def new_seed():
+    """Draw a fresh seed for runs the user did not seed explicitly"""
+    return secrets.randbits(63)
+
+
+def _slot_values(obj):
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if hasattr(obj, name):
+                yield getattr(obj, name)
+
+
+def estimate_size(obj, _seen=None):
+    """Rough deep size in bytes, exact for NumPy and array-module buffers
+
+    `nbytes` is trusted only for buffers; other objects that define it (the
+    ATM tables, the ledger) are walked like any object, so the arrays and
+    caches they share or reference are counted once each.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    try:
+        return memoryview(obj).nbytes
+    except (TypeError, ValueError):
+        pass
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int) and not hasattr(obj, "__dict__") and not hasattr(type(obj), "__slots__"):
+        return nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    else:
+        if hasattr(obj, "__dict__"):
+            size += estimate_size(vars(obj), _seen)
+        size += sum(estimate_size(value, _seen) for value in _slot_values(obj))
+    return size
+
+
+class ResultCache:
+    """Thread-safe LRU of simulation results with an optional disk spill"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, spill_dir=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(page, params, seed):
+        payload = json.dumps([page, params, seed, ENGINE_VERSION], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, f"{key}.pkl")
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        if self.spill_dir and os.path.exists(self._spill_path(key)):
+            try:
+                with open(self._spill_path(key), "rb") as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                self.put(key, value)
+                return value
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        spilled = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            if size > self.max_bytes:
+                # Too large to keep in memory; still worth spilling
+                spilled.append((key, value))
+            else:
+                self._entries[key] = (value, size)
+                self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                old_key, (old_value, old_size) = self._entries.popitem(last=False)
+                self.current_bytes -= old_size
+                self.evictions += 1
+                spilled.append((old_key, old_value))
+        if self.spill_dir:
+            for old_key, old_value in spilled:
+                self._spill(old_key, old_value)
+
+    def _spill(self, key, value):
+        path = self._spill_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_or_compute(self, page, params, seed, compute):
+        """Return the cached result for this run, computing and storing it on a miss"""
+        key = self.make_key(page, params, seed)
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """Process-wide cache shared by every page and session
+
+    Sized by SIMULATION_CACHE_BYTES and spilled to SIMULATION_CACHE_DIR when set.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache(
+                max_bytes=int(os.environ.get("SIMULATION_CACHE_BYTES", DEFAULT_MAX_BYTES)),
+                spill_dir=os.environ.get("SIMULATION_CACHE_DIR") or None,
+            )
+        return _default_cache
@@ -0,0 +1,206 @@
+"""Command-line batch runner for the simulation kernels
+
+    python -m simulation dice --rolls 100000000 --dice 3 --seed 1 -o colors.csv
+    python -m simulation rare --rolls 1000000 --dice 3 --target Purple
+    python -m simulation biased --rolls 1000000 --weights 4,2,1,1,1,1
+    python -m simulation biased --rolls 1000000000 --seed 1 --store rolls.rolls
+    python -m simulation guess --sample-size 50000 -o strategies.parquet
+    python -m simulation atm --customers 1000 --atms 10 --replications 20
+    python -m simulation sweep --customers 100,1000 --outage-prob 0,0.05 --checkpoint sweep.jsonl
+
+Results are written as CSV (stdout by default) or Parquet when the output
+path ends in .parquet. Each job imports only the kernels it needs.
+"""
+import argparse
+import csv
+import sys
+import time
+
+
+def write_table(rows, output):
+    """Write a list of dict rows to CSV/Parquet, or CSV on stdout for '-'"""
+    if output.endswith(".parquet"):
+        import pandas as pd
+        pd.DataFrame(rows).to_parquet(output, index=False)
+        return
+    if output == "-":
+        _write_csv(rows, sys.stdout)
+    else:
+        with open(output, "w", newline="") as f:
+            _write_csv(rows, f)
+
+
+def _write_csv(rows, f):
+    if not rows:
+        return
+    writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def run_dice(args):
+    from simulation.dice import colors, count_colored_rolls
+    from simulation.parallel import run_sharded
+
+    counts = run_sharded(count_colored_rolls, args.rolls, args.dice, not args.fair,
+                         seed=args.seed, workers=args.workers)
+    total = int(counts.sum())
+    return [{"color": color, "count": int(count), "probability": count / total}
+            for color, count in zip(colors, counts)]
+
+
+def run_rare(args):
+    from simulation.variance import MODES, estimate_rare_event
+
+    rows = []
+    for mode in args.modes.split(",") if args.modes else MODES:
+        result = estimate_rare_event(mode, args.rolls, args.dice, not args.fair, args.target,
+                                     args.min_matches, seed=args.seed, workers=args.workers)
+        rows.append({key: result[key] for key in ("mode", "rolls", "estimate", "std_error", "ci_low",
+                                                  "ci_high", "variance_reduction", "equivalent_naive_rolls")})
+    return rows
+
+
+def run_biased(args):
+    from simulation.dice import accumulate_biased_faces
+    from simulation.parallel import run_sharded
+    from simulation.streaming import merge_all
+
+    weights = [float(w) for w in args.weights.split(",")]
+    if args.store:
+        from simulation.rollstore import open_or_write_rolls
+
+        # Rolls stream into the store once; later runs with the same arguments reanalyze it
+        accumulator = open_or_write_rolls(args.store, args.rolls, weights, seed=args.seed).accumulate(workers=args.workers)
+    else:
+        accumulator = run_sharded(accumulate_biased_faces, args.rolls, weights, seed=args.seed,
+                                  workers=args.workers, merge=merge_all)
+    counts = accumulator.histogram.counts
+    streaks = accumulator.streaks.summary()
+    total = int(counts.sum())
+    return [{"face": face, "count": int(count), "frequency": count / total, "longest_streak": int(longest)}
+            for face, (count, longest) in enumerate(zip(counts, streaks["longest"]), 1)]
+
+
+def run_guess(args):
+    from simulation.guessing import evaluate_strategies, mode_titles
+
+    results = evaluate_strategies(sample_size=args.sample_size, seed=args.seed)
+    return [{"mode": mode, "title": mode_titles[mode], "mean": r["mean"], "p50": r["p50"],
+             "p99": r["p99"], "max": r["max"]} for mode, r in results.items()]
+
+
+def run_atm(args):
+    import random
+
+    from simulation.atm import run_atm_simulation
+
+    seeds = random.Random(args.seed)
+    rows = []
+    for replication in range(args.replications):
+        seed = seeds.getrandbits(63)
+        _, _, result = run_atm_simulation(args.customers, args.atms, args.max_iterations, seed,
+                                          outage_prob=args.outage_prob)
+        attempts = result["total_attempts"]
+        rows.append({
+            "replication": replication,
+            "seed": seed,
+            "successful_transactions": result["successful_transactions"],
+            "failed_transactions": result["failed_transactions"],
+            "total_attempts": attempts,
+            "avg_transaction_time": result["total_time"] / attempts if attempts else 0.0,
+            "p50_transaction_time": result["transaction_time_sketch"].quantile(0.5),
+            "p99_transaction_time": result["transaction_time_sketch"].quantile(0.99),
+            "sim_time": result["sim_time"],
+            "num_events": result["num_events"],
+            "all_atms_down": result["all_atms_down"],
+        })
+    return rows
+
+
+def _values(text, cast):
+    # Comma-separated grid values; "none" keeps the model's random draw
+    return [None if value.lower() == "none" else cast(value) for value in text.split(",")]
+
+
+def run_sweep(args):
+    from simulation.sweep import run_sweep as sweep
+
+    grid = {
+        "num_customers": _values(args.customers, int),
+        "num_atms": _values(args.atms, int),
+        "atm_cash": _values(args.cash, int),
+        "outage_prob": _values(args.outage_prob, float),
+        "maintenance_interval": _values(args.maintenance_interval, int),
+    }
+    progress = lambda done, total: print(f"sweep: {done}/{total} cells", file=sys.stderr)
+    return sweep(grid, args.replications, args.seed, args.workers, args.checkpoint,
+                 args.max_iterations, progress=progress)
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-o", "--output", default="-", help="CSV or .parquet path (default: CSV on stdout)")
+    common.add_argument("--seed", type=int, default=None, help="seed for reproducible runs")
+
+    parser = argparse.ArgumentParser(prog="python -m simulation", description="Run simulation batch jobs headlessly.")
+    jobs = parser.add_subparsers(dest="job", required=True)
+
+    dice = jobs.add_parser("dice", parents=[common], help="Monte Carlo colored dice color counts")
+    dice.add_argument("--rolls", type=int, default=1_000_000)
+    dice.add_argument("--dice", type=int, default=3)
+    dice.add_argument("--fair", action="store_true", help="roll fair instead of biased dice")
+    dice.add_argument("--workers", type=int, default=None)
+    dice.set_defaults(func=run_dice)
+
+    rare = jobs.add_parser("rare", parents=[common], help="rare color combination under each sampling mode")
+    rare.add_argument("--rolls", type=int, default=1_000_000)
+    rare.add_argument("--dice", type=int, default=3)
+    rare.add_argument("--fair", action="store_true", help="roll fair instead of biased dice")
+    rare.add_argument("--target", default="Purple", help="color the dice must show")
+    rare.add_argument("--min-matches", type=int, default=None, help="dice that must match (default: all)")
+    rare.add_argument("--modes", default=None, help="comma-separated sampling modes (default: all)")
+    rare.add_argument("--workers", type=int, default=None)
+    rare.set_defaults(func=run_rare)
+
+    biased = jobs.add_parser("biased", parents=[common], help="biased die face counts")
+    biased.add_argument("--rolls", type=int, default=1_000_000)
+    biased.add_argument("--weights", default="0.4,0.2,0.1,0.1,0.1,0.1")
+    biased.add_argument("--workers", type=int, default=None)
+    biased.add_argument("--store", default=None, help="memory-mapped roll store to write, or reopen if it matches")
+    biased.set_defaults(func=run_biased)
+
+    guess = jobs.add_parser("guess", parents=[common], help="compare the number-guessing strategies")
+    guess.add_argument("--sample-size", type=int, default=None, help="random secrets to play (default: all)")
+    guess.set_defaults(func=run_guess)
+
+    atm = jobs.add_parser("atm", parents=[common], help="replicated ATM simulations")
+    atm.add_argument("--customers", type=int, default=10)
+    atm.add_argument("--atms", type=int, default=3)
+    atm.add_argument("--max-iterations", type=int, default=20)
+    atm.add_argument("--outage-prob", type=float, default=0.05)
+    atm.add_argument("--replications", type=int, default=1)
+    atm.set_defaults(func=run_atm)
+
+    sweep = jobs.add_parser("sweep", parents=[common], help="ATM parameter grid with replicated, checkpointed cells")
+    sweep.add_argument("--customers", default="10", help="comma-separated customer counts")
+    sweep.add_argument("--atms", default="3", help="comma-separated ATM counts")
+    sweep.add_argument("--cash", default="none", help="comma-separated starting cash per ATM (none: random)")
+    sweep.add_argument("--outage-prob", default="0.05", help="comma-separated outage probabilities")
+    sweep.add_argument("--maintenance-interval", default="none",
+                       help="comma-separated maintenance intervals in 10 s rounds (none: random 1-5)")
+    sweep.add_argument("--max-iterations", type=int, default=20)
+    sweep.add_argument("--replications", type=int, default=10)
+    sweep.add_argument("--workers", type=int, default=None)
+    sweep.add_argument("--checkpoint", default=None, help="JSON-lines file of finished cells; rerun to resume")
+    sweep.set_defaults(func=run_sweep)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    start = time.perf_counter()
+    rows = args.func(args)
+    write_table(rows, args.output)
+    print(f"{args.job}: {len(rows)} rows in {time.perf_counter() - start:.3f}s", file=sys.stderr)
+    return 0
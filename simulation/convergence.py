@@ -0,0 +1,129 @@
+"""Precision-targeted Monte Carlo estimation with confidence intervals
+
+Colored dice are rolled in batches until every color's confidence interval
+is narrower than the requested half-width. Each die is one multinomial
+trial, so estimates are normalized by the number of dice rolled, not by the
+number of simulations.
+"""
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+from simulation.dice import color_probabilities, colors, count_colored_rolls
+from simulation.parallel import run_sharded
+
+
+def z_score(confidence):
+    """Two-sided standard normal critical value for `confidence` (e.g. 0.95)"""
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def wilson_intervals(counts, total, confidence=0.95):
+    """Wilson score intervals for each count out of `total` trials; returns (low, high)"""
+    counts = np.asarray(counts, dtype=np.float64)
+    z = z_score(confidence)
+    p = counts / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    spread = z * np.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return center - spread, center + spread
+
+
+def _regularized_gamma_q(a, x):
+    # Upper regularized incomplete gamma Q(a, x): series below a + 1, Lentz continued fraction above
+    if x <= 0:
+        return 1.0
+    log_prefactor = -x + a * math.log(x) - math.lgamma(a)
+    if x < a + 1:
+        term = total = 1 / a
+        n = a
+        for _ in range(1000):
+            n += 1
+            term *= x / n
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1 - total * math.exp(log_prefactor))
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(log_prefactor) * h
+
+
+def chi_square_test(counts, expected_probs):
+    """Pearson chi-square statistic and p-value of counts against expected probabilities"""
+    counts = np.asarray(counts, dtype=np.float64)
+    expected = counts.sum() * np.asarray(expected_probs, dtype=np.float64)
+    statistic = float(((counts - expected) ** 2 / expected).sum())
+    return statistic, _regularized_gamma_q((len(counts) - 1) / 2, statistic / 2)
+
+
+def summarize_counts(counts, biased, confidence=0.95):
+    """Per-color estimates, intervals and goodness of fit for a set of color counts"""
+    counts = np.asarray(counts)
+    total = int(counts.sum())
+    low, high = wilson_intervals(counts, total, confidence)
+    expected = color_probabilities(biased)
+    statistic, p_value = chi_square_test(counts, expected)
+    return {
+        "counts": counts,
+        "total_dice": total,
+        "probabilities": counts / total,
+        "expected": expected,
+        "ci_low": low,
+        "ci_high": high,
+        "max_half_width": float(((high - low) / 2).max()),
+        "chi_square": statistic,
+        "p_value": p_value,
+        "confidence": confidence,
+    }
+
+
+def estimate_until_converged(num_dice, biased, target_half_width=1e-3, confidence=0.95,
+                             batch_rolls=100_000, max_rolls=1_000_000_000, seed=None, workers=None):
+    """Roll in batches until every color's CI half-width is at most `target_half_width`
+
+    After each batch the rolls still needed are predicted from the current
+    estimates, so a typical query finishes in two or three batches. Batch i is
+    seeded from (seed, i), keeping results independent of the worker count.
+    """
+    entropy = np.random.SeedSequence(seed).entropy
+    z = z_score(confidence)
+    counts = np.zeros(len(colors), dtype=np.int64)
+    rolls = 0
+    history = []
+    next_batch = min(batch_rolls, max_rolls)
+    while next_batch > 0:
+        counts += run_sharded(count_colored_rolls, next_batch, num_dice, biased,
+                              seed=[entropy, len(history)], workers=workers)
+        rolls += next_batch
+        summary = summarize_counts(counts, biased, confidence)
+        history.append((rolls, summary["max_half_width"]))
+        if summary["max_half_width"] <= target_half_width:
+            break
+        # Dice needed for the widest interval to reach the target, with a little headroom
+        p = summary["probabilities"]
+        needed_dice = z * z * float((p * (1 - p)).max()) / target_half_width ** 2
+        needed_rolls = math.ceil(1.05 * needed_dice / num_dice) - rolls
+        next_batch = min(max(needed_rolls, batch_rolls), max_rolls - rolls)
+
+    summary["rolls"] = rolls
+    summary["batches"] = len(history)
+    summary["history"] = history
+    summary["converged"] = summary["max_half_width"] <= target_half_width
+    return summary
@@ -0,0 +1,105 @@
+"""Chunked NumPy sampling engine for the dice simulations"""
+import numpy as np
+
+from simulation.sampling import sampler_for
+from simulation.streaming import DiceAccumulator
+
+# Define dice faces
+dice_faces = ["⚀", "⚁", "⚂", "⚃", "⚄", "⚅"]
+
+# Define colors and their biased probabilities
+colors = ['Red', 'Blue', 'Green', 'Yellow', 'Purple', 'Orange']
+biased_probs = {
+    'Red': 0.3,
+    'Blue': 0.2,
+    'Green': 0.15,
+    'Yellow': 0.15,
+    'Purple': 0.1,
+    'Orange': 0.1
+}
+
+# Number of individual dice drawn per chunk; bounds peak memory for any run size
+DEFAULT_CHUNK_SIZE = 1 << 22
+
+
+def color_probabilities(biased):
+    """Return the per-color probabilities as an array ordered like `colors`"""
+    if biased:
+        return np.array([biased_probs[color] for color in colors], dtype=np.float64)
+    return np.full(len(colors), 1 / len(colors))
+
+
+def face_probabilities(weights):
+    """Normalize slider weights into per-face probabilities"""
+    probs = np.asarray(weights, dtype=np.float64)
+    total = probs.sum()
+    if total <= 0:
+        raise ValueError("At least one face weight must be positive")
+    return probs / total
+
+
+def sample_codes(num_draws, probs, rng=None):
+    """Draw `num_draws` integer codes (indices into `probs`) as a uint8 array"""
+    return sampler_for(probs).draw_array(num_draws, rng)
+
+
+def iter_code_chunks(num_draws, probs, chunk_size=DEFAULT_CHUNK_SIZE, rng=None):
+    """Yield `num_draws` integer codes in arrays of at most `chunk_size`"""
+    rng = np.random.default_rng(rng)
+    sampler = sampler_for(probs)
+    remaining = num_draws
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        yield sampler.draw_array(size, rng)
+        remaining -= size
+
+
+def count_codes(num_draws, probs, chunk_size=DEFAULT_CHUNK_SIZE, rng=None):
+    """Draw `num_draws` codes chunk by chunk and return only their counts"""
+    counts = np.zeros(len(probs), dtype=np.int64)
+    for chunk in iter_code_chunks(num_draws, probs, chunk_size, rng):
+        counts += np.bincount(chunk, minlength=len(probs))
+    return counts
+
+
+def iter_roll_chunks(num_rolls, num_dice=1, biased=False, chunk_size=DEFAULT_CHUNK_SIZE, rng=None):
+    """Yield integer-coded rolls as uint8 arrays of shape (rows, num_dice)
+
+    Each code is an index into `colors`. At most `chunk_size` dice are drawn
+    per chunk, so callers can fold results without holding the whole run.
+    """
+    rows_per_chunk = max(1, chunk_size // num_dice)
+    chunks = iter_code_chunks(num_rolls * num_dice, color_probabilities(biased),
+                              rows_per_chunk * num_dice, rng)
+    for codes in chunks:
+        yield codes.reshape(-1, num_dice)
+
+
+def count_colored_rolls(num_rolls, num_dice=1, biased=False, chunk_size=DEFAULT_CHUNK_SIZE, rng=None):
+    """Roll `num_rolls` sets of `num_dice` colored dice and return per-color counts"""
+    counts = np.zeros(len(colors), dtype=np.int64)
+    for chunk in iter_roll_chunks(num_rolls, num_dice, biased, chunk_size, rng):
+        counts += np.bincount(chunk.ravel(), minlength=len(colors))
+    return counts
+
+
+def sample_biased_faces(num_rolls, weights, rng=None):
+    """Roll a weighted die `num_rolls` times and return the face codes in order"""
+    return sample_codes(num_rolls, face_probabilities(weights), rng)
+
+
+def count_biased_faces(num_rolls, weights, chunk_size=DEFAULT_CHUNK_SIZE, rng=None):
+    """Roll a weighted die `num_rolls` times and return per-face counts"""
+    return count_codes(num_rolls, face_probabilities(weights), chunk_size, rng)
+
+
+def accumulate_biased_faces(num_rolls, weights, chunk_size=DEFAULT_CHUNK_SIZE, rng=None):
+    """Roll a weighted die `num_rolls` times, folding each chunk into a DiceAccumulator
+
+    Memory stays at one chunk however many rolls are made; accumulators from
+    consecutive shards merge in order into the exact statistics of the whole run.
+    """
+    accumulator = DiceAccumulator(len(weights))
+    for chunk in iter_code_chunks(num_rolls, face_probabilities(weights), chunk_size, rng):
+        accumulator.update(chunk)
+    return accumulator
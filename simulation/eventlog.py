@@ -0,0 +1,107 @@
+"""Bounded ring buffer of ATM simulation log events with severity levels
+
+The model appends every log entry as a (time, kind, customer index, ATM
+index, amount) tuple. Only the most recent `capacity` entries are kept, but
+per-level counts cover the whole run. Messages are formatted only for the
+rows a page actually shows.
+"""
+import sys
+from collections import deque
+
+from simulation.ledger import format_sim_time
+
+# Event kinds
+LOG_ARRIVE = "arrive"
+LOG_WITHDRAW = "withdraw"
+LOG_DEPOSIT = "deposit"
+LOG_INSUFFICIENT = "insufficient"
+LOG_OUT_OF_CASH = "out_of_cash"
+LOG_OUTAGE = "outage"
+LOG_MAINTENANCE = "maintenance"
+LOG_ONLINE = "online"
+LOG_ALL_DOWN = "all_down"
+
+# Severity levels, least severe first
+LEVELS = ["info", "success", "warning", "error"]
+
+KIND_LEVELS = {
+    LOG_ARRIVE: "info",
+    LOG_WITHDRAW: "success",
+    LOG_DEPOSIT: "success",
+    LOG_INSUFFICIENT: "warning",
+    LOG_OUT_OF_CASH: "warning",
+    LOG_OUTAGE: "error",
+    LOG_MAINTENANCE: "warning",
+    LOG_ONLINE: "success",
+    LOG_ALL_DOWN: "warning",
+}
+
+_TEMPLATES = {
+    LOG_ARRIVE: "{name} approaches ATM-{atm} for ${amount}",
+    LOG_WITHDRAW: "Transaction successful! {name} withdrew ${amount}",
+    LOG_DEPOSIT: "{name} deposited ${amount}",
+    LOG_INSUFFICIENT: "Insufficient balance for {name} to withdraw ${amount}",
+    LOG_OUT_OF_CASH: "ATM-{atm} is out of cash. {name}'s transaction failed.",
+    LOG_OUTAGE: "ATM-{atm} went out of service unexpectedly.",
+    LOG_MAINTENANCE: "ATM-{atm} is undergoing maintenance.",
+    LOG_ONLINE: "ATM-{atm} is back online.",
+    LOG_ALL_DOWN: "All ATMs are out of cash or disabled. Simulation ends.",
+}
+
+
+def format_event(entry, customer_name=None):
+    """Message for one entry; `customer_name(index)` labels customers, else Customer-<index>"""
+    _, kind, c, a, amount = entry
+    name = "" if c < 0 else customer_name(c) if customer_name is not None else f"Customer-{c}"
+    return _TEMPLATES[kind].format(name=name, atm=a, amount=amount)
+
+
+class EventLog:
+    """The last `capacity` log entries of a run (all of them for None), plus per-level totals"""
+
+    def __init__(self, capacity=None):
+        self.entries = deque(maxlen=capacity)
+        self.total = 0
+        self.level_counts = dict.fromkeys(LEVELS, 0)
+
+    def append(self, entry):
+        self.total += 1
+        self.level_counts[KIND_LEVELS[entry[1]]] += 1
+        self.entries.append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    @property
+    def capacity(self):
+        return self.entries.maxlen
+
+    @property
+    def dropped(self):
+        """Entries pushed out of the ring by newer ones"""
+        return self.total - len(self.entries)
+
+    @property
+    def nbytes(self):
+        return sys.getsizeof(self.entries) + sum(sys.getsizeof(entry) for entry in self.entries)
+
+    def filtered(self, levels=None):
+        """Kept entries whose level is in `levels` (all for None), oldest first"""
+        if levels is None:
+            return list(self.entries)
+        levels = set(levels)
+        return [entry for entry in self.entries if KIND_LEVELS[entry[1]] in levels]
+
+    def rows(self, levels=None, customer_name=None, limit=None):
+        """Columns of the newest `limit` matching entries, formatted for a table"""
+        entries = self.filtered(levels)
+        if limit is not None:
+            entries = entries[-limit:]
+        return {
+            "Time": [format_sim_time(entry[0]) for entry in entries],
+            "Level": [KIND_LEVELS[entry[1]] for entry in entries],
+            "Event": [format_event(entry, customer_name) for entry in entries],
+        }
@@ -0,0 +1,246 @@
+"""Exact distributions for the dice pages, computed without sampling
+
+Every query is a closed form or a short recurrence and is cached
+per weight vector, so the pages can show exact baselines instantly and use
+them to check how far a sampled run deviates.
+"""
+import math
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+
+# Largest number of rolls whose full sum distribution is tabulated
+MAX_SUM_ROLLS = 200_000
+# Run lengths whose probability falls below this no longer change the expectation
+RUN_TAIL = 1e-12
+# Longest-run probabilities switch from the exact recurrence to the dominant-root
+# formula once p^n < e^-ASYMPTOTIC_EXPONENT, or past MAX_EXACT_RUN_ROLLS rolls
+ASYMPTOTIC_EXPONENT = 36
+MAX_EXACT_RUN_ROLLS = 4096
+
+
+def _weights_key(weights):
+    probs = np.asarray(weights, dtype=np.float64)
+    return tuple((probs / probs.sum()).tolist())
+
+
+def _frozen(array):
+    array.setflags(write=False)
+    return array
+
+
+@lru_cache(maxsize=64)
+def _sum_distribution(probs, num_rolls):
+    k = len(probs)
+    size = num_rolls * (k - 1) + 1
+    if size <= 4096:
+        # Square-and-multiply with direct convolution is exact to rounding for small supports
+        result, base, n = np.ones(1), np.asarray(probs), num_rolls
+        while n:
+            if n & 1:
+                result = np.convolve(result, base)
+            n >>= 1
+            if n:
+                base = np.convolve(base, base)
+    else:
+        # One FFT power: the transform of an n-fold convolution is the n-th power of the transform
+        length = 1 << (size - 1).bit_length()
+        result = np.fft.irfft(np.fft.rfft(probs, length) ** num_rolls, length)[:size]
+        np.clip(result, 0.0, None, out=result)
+        result /= result.sum()
+    return _frozen(np.arange(num_rolls, num_rolls * k + 1)), _frozen(result)
+
+
+def sum_distribution(weights, num_rolls):
+    """Exact distribution of the sum of `num_rolls` rolls with faces worth 1..k
+
+    Returns (sums, probabilities). Raises ValueError above MAX_SUM_ROLLS rolls,
+    where only the moments from `sum_moments` are practical.
+    """
+    if num_rolls > MAX_SUM_ROLLS:
+        raise ValueError(f"Sum distributions are tabulated up to {MAX_SUM_ROLLS} rolls")
+    return _sum_distribution(_weights_key(weights), int(num_rolls))
+
+
+def sum_moments(weights, num_rolls):
+    """Exact mean and standard deviation of the sum of `num_rolls` rolls"""
+    probs = np.asarray(_weights_key(weights))
+    values = np.arange(1, len(probs) + 1)
+    mean = float(probs @ values)
+    variance = float(probs @ values ** 2) - mean * mean
+    return num_rolls * mean, math.sqrt(num_rolls * variance)
+
+
+@lru_cache(maxsize=64)
+def _color_combinations(probs, num_dice):
+    k = len(probs)
+    log_probs = np.log(np.maximum(probs, 1e-300))
+    rows = []
+    # Stars and bars: each choice of k - 1 bar positions is one combination of color counts
+    for bars in combinations(range(num_dice + k - 1), k - 1):
+        edges = (-1,) + bars + (num_dice + k - 1,)
+        counts = tuple(edges[i + 1] - edges[i] - 1 for i in range(k))
+        log_p = math.lgamma(num_dice + 1) + sum(c * lp - math.lgamma(c + 1) for c, lp in zip(counts, log_probs))
+        rows.append((counts, math.exp(log_p)))
+    rows.sort(key=lambda row: -row[1])
+    return tuple(rows)
+
+
+def color_combinations(weights, num_dice):
+    """Every multiset of colors `num_dice` dice can show with its exact multinomial probability
+
+    Returns ((per-color counts, probability), ...) sorted from most to least likely.
+    """
+    return _color_combinations(_weights_key(weights), int(num_dice))
+
+
+def at_least_probability(weights, num_dice, target, min_matches):
+    """Exact P(at least `min_matches` of `num_dice` dice show outcome `target`)"""
+    p = _weights_key(weights)[target]
+    return sum(math.comb(num_dice, m) * p ** m * (1 - p) ** (num_dice - m)
+               for m in range(min_matches, num_dice + 1))
+
+
+def _exact_run_reached(p, length, num_rolls):
+    # reached[m] = P(a run of `length` has occurred within m rolls). A first run ends at roll m
+    # when none occurred by m - length - 1, that roll differs and the next `length` match:
+    # reached[m] = reached[m-1] + q p^length (1 - reached[m-length-1]). Each block of
+    # length + 1 rolls depends only on the block before it, so it is one cumulative sum
+    if length > num_rolls:
+        return 0.0
+    start = length + 1
+    reached = np.zeros(num_rolls + 1)
+    reached[length] = p ** length
+    step = (1 - p) * p ** length
+    while start <= num_rolls:
+        end = min(start + length + 1, num_rolls + 1)
+        reached[start:end] = reached[start - 1] + np.cumsum(step * (1 - reached[start - length - 1:end - length - 1]))
+        start = end
+    return float(reached[num_rolls])
+
+
+def _series(z, coefficients):
+    # Horner evaluation of sum_k coefficients[k] z^k
+    total = np.zeros_like(z)
+    for c in reversed(coefficients):
+        total = total * z + c
+    return total
+
+
+# Taylor coefficients of t e^t - (e^t - 1) and of (e^z - 1 - z) / z, used for small arguments
+_SHIFTED_EXP = [0.0, 0.0] + [(k - 1) / math.factorial(k) for k in range(2, 20)]
+_EXPM1_RATIO = [0.0] + [1 / math.factorial(k + 1) for k in range(1, 20)]
+
+
+def _power_sums(log_y, lengths):
+    # sum_{j<L} y^j and sum_{j<L} (j+1) y^j from their closed forms, rewritten with expm1 and
+    # short series so nothing cancels as y -> 1, where the run equation has a double root
+    t = lengths * log_y
+    growth = np.expm1(t)
+    gap = np.expm1(log_y)
+    shifted = t * np.exp(t) - growth
+    near = np.abs(t) < 0.5
+    shifted[near] = _series(t[near], _SHIFTED_EXP)
+    ratio = np.empty_like(log_y)
+    near = np.abs(log_y) < 0.5
+    ratio[near] = _series(log_y[near], _EXPM1_RATIO)
+    ratio[~near] = gap[~near] / log_y[~near] - 1
+    plain = lengths.copy()
+    weighted = lengths * (lengths + 1) / 2
+    # (L (y - 1) y^L - (y^L - 1)) / (y - 1)^2, with y - 1 = log_y (1 + ratio)
+    moved = gap != 0
+    plain[moved] = growth[moved] / gap[moved]
+    weighted[moved] = (shifted[moved] + t[moved] * np.exp(t[moved]) * ratio[moved]) / gap[moved] ** 2
+    return plain, weighted
+
+
+def _asymptotic_run_reached(p, lengths, num_rolls):
+    # Feller's dominant-root formula for "no run of L in n rolls": x^-n times the residue at x,
+    # the one positive root of q x sum_{j<L} (p x)^j = 1. The remaining roots add terms that
+    # shrink like p^n, which is why short sequences use the exact recurrence
+    q = 1 - p
+    lengths = lengths.astype(np.float64)
+    # Newton on u = log x: log q + u + log(sum) is increasing and convex in u, so after
+    # the first step the iterates close in on the root from above
+    log_x = np.zeros_like(lengths)
+    active = np.arange(len(lengths))
+    for _ in range(100):
+        plain, weighted = _power_sums(math.log(p) + log_x[active], lengths[active])
+        step = (math.log(q) + log_x[active] + np.log(plain)) * plain / weighted
+        log_x[active] -= step
+        active = active[np.abs(step) > 1e-15]
+        if not len(active):
+            break
+    # Long runs have x - 1 far below rounding in the equation above, so refine
+    # delta = x - 1 from delta = q p^L (1 + delta)^(L + 1), which keeps its relative precision
+    delta = np.expm1(log_x)
+    small = delta < 1e-2
+    d, run = delta[small], lengths[small]
+    log_step = math.log(q) + run * math.log(p)
+    for _ in range(50):
+        grown = np.exp(log_step + run * np.log1p(d))
+        d = d - (grown * (1 + d) - d) / ((run + 1) * grown - 1)
+    delta[small] = d
+    _, weighted = _power_sums(math.log(p) + np.log1p(delta), lengths)
+    log_clear = -2 * math.log(q) - 2 * np.log1p(delta) - np.log(weighted) - num_rolls * np.log1p(delta)
+    return np.clip(-np.expm1(log_clear), 0.0, 1.0)
+
+
+@lru_cache(maxsize=64)
+def _expected_longest_runs(probs, num_rolls):
+    expected = np.zeros(len(probs))
+    for face, p in enumerate(probs):
+        if p == 0:
+            continue
+        if p == 1:
+            expected[face] = num_rolls
+            continue
+        # E[longest] = sum over L >= 1 of P(some run reaches L); past the L where the union
+        # bound (1 + n q) p^L drops below RUN_TAIL the terms no longer change the sum
+        tail = math.log(RUN_TAIL / (1 + num_rolls * (1 - p))) / math.log(p)
+        longest = min(num_rolls, max(1, math.ceil(tail)))
+        if -num_rolls * math.log(p) < ASYMPTOTIC_EXPONENT and num_rolls <= MAX_EXACT_RUN_ROLLS:
+            for length in range(1, longest + 1):
+                reached = _exact_run_reached(p, length, num_rolls)
+                expected[face] += reached
+                if reached < RUN_TAIL:
+                    break
+        else:
+            expected[face] = _asymptotic_run_reached(p, np.arange(1, longest + 1), num_rolls).sum()
+    return _frozen(expected)
+
+
+def expected_longest_runs(weights, num_rolls):
+    """Exact expected longest streak of each face over `num_rolls` rolls
+
+    Short sequences use the exact run recurrence and longer ones Feller's
+    dominant-root formula, whose error (about p^n per run length) is below
+    rounding there; only a face with probability above ~0.99 rolled more than
+    MAX_EXACT_RUN_ROLLS times can see a visible error.
+    """
+    return _expected_longest_runs(_weights_key(weights), int(num_rolls))
+
+
+def expected_num_runs(weights, num_rolls):
+    """Exact expected number of streaks (maximal runs of one face) in `num_rolls` rolls"""
+    if num_rolls == 0:
+        return 0.0
+    probs = np.asarray(_weights_key(weights))
+    return 1 + (num_rolls - 1) * (1 - float(probs @ probs))
+
+
+def expected_run_lengths(weights, num_rolls, max_length):
+    """Exact expected number of streaks of each length 0..max_length, summed over faces"""
+    probs = np.asarray(_weights_key(weights))
+    lengths = np.arange(max_length + 1)
+    expected = np.zeros(max_length + 1)
+    for p in probs:
+        run = p ** lengths
+        # A run is bounded by a different face (or the sequence end) on both sides
+        inside = np.clip(num_rolls - lengths - 1, 0, None) * run * (1 - p) ** 2
+        edges = np.where(lengths < num_rolls, 2 * run * (1 - p), 0.0)
+        whole = np.where(lengths == num_rolls, run, 0.0)
+        expected += inside + edges + whole
+    expected[0] = 0.0
+    return expected
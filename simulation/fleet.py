@@ -0,0 +1,266 @@
+"""Array-backed customer and ATM tables for large ATM simulations
+
+A run with a million customers and ten thousand ATMs keeps one typed column
+per attribute instead of one Python object per entity. Indexing a table
+returns a small view with the attributes the pages read, so code written for
+`Customer` and `ATM` objects keeps working. Available ATMs are tracked in an
+indexed set with O(1) insert, remove and uniform choice.
+"""
+from array import array
+
+from simulation.ledger import DEPOSITED, DISPENSED, FAILED_WITHDRAW, WITHDRAWN, Ledger
+
+
+class AvailableSet:
+    """Subset of 0..size-1 with O(1) add, remove, membership and uniform choice
+
+    Members sit in a dense list; removing one moves the last member into its
+    slot, so the list never needs scanning or rebuilding.
+    """
+
+    __slots__ = ("members", "positions")
+
+    def __init__(self, size, members=()):
+        self.members = []
+        self.positions = array('l', [-1]) * size
+        for item in members:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.members)
+
+    def __contains__(self, item):
+        return self.positions[item] >= 0
+
+    def add(self, item):
+        if self.positions[item] < 0:
+            self.positions[item] = len(self.members)
+            self.members.append(item)
+
+    def remove(self, item):
+        position = self.positions[item]
+        if position < 0:
+            return
+        last = self.members.pop()
+        if last != item:
+            self.members[position] = last
+            self.positions[last] = position
+        self.positions[item] = -1
+
+    def choice(self, u):
+        """Member picked by a uniform `u` in [0, 1)"""
+        return self.members[int(u * len(self.members))]
+
+
+class CustomerTable:
+    """Customers as a balance column plus a contiguous block of ledger ids"""
+
+    __slots__ = ("balance", "entity", "ledger")
+
+    def __init__(self, balances, ledger=None, entity=None):
+        self.balance = array('q', balances)
+        self.ledger = ledger if ledger is not None else Ledger()
+        if entity is None:
+            first = self.ledger.register_range("Customer-{}", len(self.balance))
+            entity = range(first, first + len(self.balance))
+        self.entity = entity
+
+    def __len__(self):
+        return len(self.balance)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [CustomerView(self, i) for i in range(len(self))[index]]
+        return CustomerView(self, range(len(self))[index])
+
+    def __iter__(self):
+        return (CustomerView(self, index) for index in range(len(self)))
+
+    @property
+    def nbytes(self):
+        """Bytes of the balance column plus the shared ledger"""
+        return self.balance.itemsize * len(self.balance) + self.ledger.nbytes
+
+    def withdraw(self, index, amount, now=0.0):
+        if self.balance[index] >= amount:
+            self.balance[index] -= amount
+            self.ledger.record(self.entity[index], WITHDRAWN, amount, now)
+            return True
+        self.ledger.record(self.entity[index], FAILED_WITHDRAW, amount, now)
+        return False
+
+    def deposit(self, index, amount, now=0.0):
+        self.balance[index] += amount
+        self.ledger.record(self.entity[index], DEPOSITED, amount, now)
+
+
+class AtmTable:
+    """ATMs as cash and enabled columns plus a contiguous block of ledger ids"""
+
+    __slots__ = ("atm_id", "cash_balance", "enabled", "entity", "ledger")
+
+    def __init__(self, cash_balances, ledger=None, atm_ids=None, entity=None):
+        self.cash_balance = array('q', cash_balances)
+        self.enabled = bytearray(b"\x01") * len(self.cash_balance)
+        self.atm_id = atm_ids if atm_ids is not None else range(len(self.cash_balance))
+        self.ledger = ledger if ledger is not None else Ledger()
+        if entity is None:
+            first = self.ledger.register_range("ATM-{}", len(self.cash_balance))
+            entity = range(first, first + len(self.cash_balance))
+        self.entity = entity
+
+    def __len__(self):
+        return len(self.cash_balance)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [AtmView(self, i) for i in range(len(self))[index]]
+        return AtmView(self, range(len(self))[index])
+
+    def __iter__(self):
+        return (AtmView(self, index) for index in range(len(self)))
+
+    @property
+    def nbytes(self):
+        """Bytes of the cash and enabled columns plus the shared ledger"""
+        return self.cash_balance.itemsize * len(self.cash_balance) + len(self.enabled) + self.ledger.nbytes
+
+    def dispense_cash(self, index, amount, now=0.0):
+        if self.cash_balance[index] >= amount:
+            self.cash_balance[index] -= amount
+            self.ledger.record(self.entity[index], DISPENSED, amount, now)
+            return True
+        self.enabled[index] = 0
+        return False
+
+
+class CustomerView:
+    """One row of a CustomerTable, read and written through its columns"""
+
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def name(self):
+        return self.table.ledger.label(self.table.entity[self.index])
+
+    @property
+    def balance(self):
+        return self.table.balance[self.index]
+
+    @balance.setter
+    def balance(self, value):
+        self.table.balance[self.index] = value
+
+    @property
+    def entity_id(self):
+        return self.table.entity[self.index]
+
+    @property
+    def transactions(self):
+        return self.table.ledger.entries(self.entity_id)
+
+    def withdraw(self, amount, now=0.0):
+        return self.table.withdraw(self.index, amount, now)
+
+    def deposit(self, amount, now=0.0):
+        self.table.deposit(self.index, amount, now)
+
+
+class AtmView:
+    """One row of an AtmTable, read and written through its columns"""
+
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def atm_id(self):
+        return self.table.atm_id[self.index]
+
+    @property
+    def cash_balance(self):
+        return self.table.cash_balance[self.index]
+
+    @cash_balance.setter
+    def cash_balance(self, value):
+        self.table.cash_balance[self.index] = value
+
+    @property
+    def enabled(self):
+        return bool(self.table.enabled[self.index])
+
+    @enabled.setter
+    def enabled(self, value):
+        self.table.enabled[self.index] = bool(value)
+
+    @property
+    def entity_id(self):
+        return self.table.entity[self.index]
+
+    @property
+    def transactions(self):
+        return self.table.ledger.entries(self.entity_id)
+
+    def dispense_cash(self, amount, now=0.0):
+        return self.table.dispense_cash(self.index, amount, now)
+
+
+def _shared_ledger(entities):
+    """The one ledger a list of Customer/ATM objects records into
+
+    Objects built without a shared ledger each have their own; they are
+    re-registered, with their transactions so far, in a fresh ledger that
+    they record into from then on.
+    """
+    ledgers = {id(entity.ledger): entity.ledger for entity in entities}
+    if len(ledgers) <= 1:
+        return next(iter(ledgers.values()), None)
+    ledger = Ledger()
+    for entity in entities:
+        if entity.ledger is ledger:
+            continue
+        old, old_id = entity.ledger, entity.entity_id
+        entity_id = ledger.register(old.label(old_id))
+        for row in old.rows_for(old_id):
+            ledger.record(entity_id, old.kind[row], old.amount[row], old.time[row])
+        entity.ledger = ledger
+        entity.entity_id = entity_id
+    return ledger
+
+
+def as_tables(customers, atms):
+    """Return (customer table, ATM table) for tables or lists of Customer/ATM objects
+
+    Objects are copied into tables that record into the objects' ledger (see
+    `_shared_ledger`); call `write_back` after the run to copy balances and
+    status back to them.
+    """
+    if not isinstance(customers, CustomerTable):
+        ledger = _shared_ledger(customers)
+        customers = CustomerTable([c.balance for c in customers], ledger,
+                                  entity=array('i', [c.entity_id for c in customers]))
+    if not isinstance(atms, AtmTable):
+        ledger = _shared_ledger(atms)
+        table = AtmTable([atm.cash_balance for atm in atms], ledger,
+                         atm_ids=[atm.atm_id for atm in atms],
+                         entity=array('i', [atm.entity_id for atm in atms]))
+        table.enabled[:] = bytes(bool(atm.enabled) for atm in atms)
+        atms = table
+    return customers, atms
+
+
+def write_back(customers, atms, customer_table, atm_table):
+    """Copy a run's final balances and ATM status back onto Customer/ATM objects"""
+    if customers is not customer_table:
+        for customer, balance in zip(customers, customer_table.balance):
+            customer.balance = balance
+    if atms is not atm_table:
+        for atm, cash, enabled in zip(atms, atm_table.cash_balance, atm_table.enabled):
+            atm.cash_balance = cash
+            atm.enabled = bool(enabled)
@@ -0,0 +1,100 @@
+"""Number-guessing strategies and a vectorized evaluator across secrets"""
+import random
+
+import numpy as np
+
+LOW = 1
+HIGH = 100000
+GOLDEN_RATIO = 0.618
+
+mode_titles = {
+    1: 'Random Guess Mode',
+    2: 'Binary Search Mode',
+    3: 'Ternary Search Mode',
+    4: 'Golden Ratio Search Mode',
+    5: 'Logarithmic Search Mode'
+}
+
+
+def next_guess(mode, low, high, attempt, secret_number, rng=random):
+    """Return the next guess of one strategy; `attempt` counts guesses made so far"""
+    if mode == 1:  # Random Guess Mode
+        return rng.randint(low, high)
+    elif mode == 2:  # Binary Search Mode
+        return (low + high) // 2
+    elif mode == 3:  # Ternary Search Mode
+        mid1 = low + (high - low) // 3
+        mid2 = high - (high - low) // 3
+        if secret_number < mid1:
+            return low + (mid1 - low) // 2
+        elif secret_number > mid2:
+            return high - (high - mid2) // 2
+        return (mid1 + mid2) // 2
+    elif mode == 4:  # Golden Ratio Search Mode
+        return int(low + GOLDEN_RATIO * (high - low))
+    elif mode == 5:  # Logarithmic Search Mode
+        return low + int((high - low) / (2 ** (attempt / 10 + 1)))
+    raise ValueError(f"Unknown guessing mode: {mode}")
+
+
+def _next_guesses(mode, low, high, attempt, secrets, rng):
+    # Array version of next_guess over every game still in play
+    if mode == 1:
+        return rng.integers(low, high + 1)
+    elif mode == 2:
+        return (low + high) // 2
+    elif mode == 3:
+        mid1 = low + (high - low) // 3
+        mid2 = high - (high - low) // 3
+        return np.where(secrets < mid1, low + (mid1 - low) // 2,
+                        np.where(secrets > mid2, high - (high - mid2) // 2, (mid1 + mid2) // 2))
+    elif mode == 4:
+        return (low + GOLDEN_RATIO * (high - low)).astype(np.int64)
+    elif mode == 5:
+        return low + ((high - low) / 2.0 ** (attempt / 10 + 1)).astype(np.int64)
+    raise ValueError(f"Unknown guessing mode: {mode}")
+
+
+def batch_attempts(mode, secrets, rng=None):
+    """Play one game per secret in lockstep and return the attempts each needed"""
+    rng = np.random.default_rng(rng)
+    secrets = np.asarray(secrets, dtype=np.int64)
+    attempts = np.zeros(len(secrets), dtype=np.int64)
+    # Only unfinished games stay in the working arrays
+    active = np.arange(len(secrets))
+    low = np.full(len(secrets), LOW, dtype=np.int64)
+    high = np.full(len(secrets), HIGH, dtype=np.int64)
+    remaining = secrets
+    attempt = 0
+    while len(active):
+        guesses = _next_guesses(mode, low, high, attempt, remaining, rng)
+        attempt += 1
+        too_low = guesses < remaining
+        low = np.where(too_low, guesses + 1, low)
+        high = np.where(guesses > remaining, guesses - 1, high)
+        found = guesses == remaining
+        attempts[active[found]] = attempt
+        keep = ~found
+        active, low, high, remaining = active[keep], low[keep], high[keep], remaining[keep]
+    return attempts
+
+
+def summarize_attempts(attempts):
+    """Reduce per-secret attempt counts to the distribution and its key statistics"""
+    return {
+        "distribution": np.bincount(attempts),
+        "mean": float(attempts.mean()),
+        "p50": float(np.percentile(attempts, 50)),
+        "p99": float(np.percentile(attempts, 99)),
+        "max": int(attempts.max()),
+    }
+
+
+def evaluate_strategies(modes=tuple(mode_titles), sample_size=None, seed=None):
+    """Compare strategies over every secret in LOW..HIGH, or a random sample of them"""
+    rng = np.random.default_rng(seed)
+    if sample_size is None:
+        secrets = np.arange(LOW, HIGH + 1)
+    else:
+        secrets = rng.integers(LOW, HIGH + 1, sample_size)
+    return {mode: summarize_attempts(batch_attempts(mode, secrets, rng)) for mode in modes}
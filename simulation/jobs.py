@@ -0,0 +1,251 @@
+"""Process-wide job queue that runs simulations off the page script threads
+
+Every session submits its runs to one queue, and at most `workers` of them
+run at once. CPU-bound runs go to the shared process pool of
+simulation.parallel, so sessions don't serialize on the GIL; runs that
+already fan their shards out to that pool (or return objects tied to this
+process, like memory maps) run on a thread instead. A session may have only
+`per_session` runs queued or running at once and the queue holds at most
+`max_queued` runs, so a burst of users waits in line instead of starting
+dozens of simulations together. Identical runs (same key) already in flight
+are shared rather than repeated. A queued run is dropped once every session
+waiting on it has cancelled or gone away; a run that has started finishes
+(its result still lands in the cache) and keeps counting against the
+sessions that asked for it until it does.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from simulation.parallel import submit_task
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobLimitError(RuntimeError):
+    """Raised when a session or the whole queue already has too many runs"""
+
+
+class JobCancelledError(RuntimeError):
+    """Raised when the result of a cancelled run is requested"""
+
+
+class Job:
+    """One queued run; wait on it with `wait` and read it with `result`"""
+
+    def __init__(self, key, fn, process=False, on_result=None):
+        self.key = key
+        self.fn = fn
+        self.process = process
+        self.on_result = on_result
+        # Sessions waiting on the run, and every session that asked for it
+        self.sessions = set()
+        self.owners = set()
+        self.state = QUEUED
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self._value = None
+        self._error = None
+        self._done = threading.Event()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block up to `timeout` seconds; returns whether the run has finished"""
+        return self._done.wait(timeout)
+
+    def result(self):
+        self._done.wait()
+        if self.state == CANCELLED:
+            raise JobCancelledError(f"Run {self.key} was cancelled")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    @property
+    def elapsed(self):
+        """Seconds spent running so far"""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def _finish(self, state, value=None, error=None):
+        self.state = state
+        self._value = value
+        self._error = error
+        self.finished = time.perf_counter()
+        self._done.set()
+
+
+class JobPool:
+    """Bounded FIFO of runs, `workers` of them running at a time
+
+    `session_alive(session_id)`, when set, is checked before a queued run
+    starts so runs left behind by closed sessions are skipped.
+    """
+
+    def __init__(self, workers=None, max_queued=64, per_session=2, session_alive=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queued = max_queued
+        self.per_session = per_session
+        self.session_alive = session_alive
+        # Reentrant: a run that finishes at once completes inside the _dispatch that started it
+        self._lock = threading.RLock()
+        self._queue = deque()
+        self._jobs = {}
+        self._threads = None
+        self.running = 0
+        self.submitted = 0
+        self.shared = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    def submit(self, session_id, key, fn, process=False, on_result=None):
+        """Queue `fn()` for a session, or join the identical run already in flight
+
+        With `process=True`, `fn` runs on the shared process pool, so it and
+        its result must pickle (a module-level function or a partial of one);
+        otherwise it runs on one of the pool's threads. `on_result(value)`
+        runs in this process once the run succeeds, and what it returns
+        becomes the run's result.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                if session_id not in job.sessions:
+                    self.shared += 1
+                job.sessions.add(session_id)
+                job.owners.add(session_id)
+                return job
+            # A started run counts until it finishes, even if the session stopped waiting
+            active = sum(session_id in job.owners for job in self._jobs.values())
+            if active >= self.per_session:
+                self.rejected += 1
+                raise JobLimitError(f"Session already has {active} simulations queued or running")
+            if len(self._queue) >= self.max_queued:
+                self.rejected += 1
+                raise JobLimitError(f"The simulation queue is full ({len(self._queue)} waiting)")
+            job = Job(key, fn, process, on_result)
+            job.sessions.add(session_id)
+            job.owners.add(session_id)
+            self._jobs[key] = job
+            self._queue.append(job)
+            self.submitted += 1
+            self._dispatch()
+            return job
+
+    def cancel(self, job, session_id):
+        """Stop waiting on `job` for this session; drops it if nobody else waits and it has not started"""
+        with self._lock:
+            job.sessions.discard(session_id)
+            if not job.sessions and job.state == QUEUED:
+                self._queue.remove(job)
+                self._drop(job)
+
+    def cancel_session(self, session_id):
+        """Cancel every run a session is waiting on"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if session_id in job.sessions]
+        for job in jobs:
+            self.cancel(job, session_id)
+
+    def position(self, job):
+        """1-based place in the queue, or 0 once the run has started"""
+        with self._lock:
+            if job.state != QUEUED:
+                return 0
+            return self._queue.index(job) + 1
+
+    def stats(self):
+        with self._lock:
+            started = self.completed + self.failed
+            return {
+                "workers": self.workers,
+                "queued": len(self._queue),
+                "running": self.running,
+                "submitted": self.submitted,
+                "shared": self.shared,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "rejected": self.rejected,
+                "mean_wait_seconds": self.wait_seconds / started if started else 0.0,
+            }
+
+    def _drop(self, job):
+        # Caller holds the lock
+        del self._jobs[job.key]
+        self.cancelled += 1
+        job._finish(CANCELLED)
+
+    def _dispatch(self):
+        # Caller holds the lock; start queued runs while fewer than `workers` are running
+        while self._queue and self.running < self.workers:
+            job = self._queue.popleft()
+            if self.session_alive is not None:
+                job.sessions = {session for session in job.sessions if self.session_alive(session)}
+            if not job.sessions:
+                self._drop(job)
+                continue
+            job.state = RUNNING
+            job.started = time.perf_counter()
+            self.wait_seconds += job.started - job.submitted
+            self.running += 1
+            if job.process:
+                future = submit_task(job.fn)
+            else:
+                if self._threads is None:
+                    self._threads = ThreadPoolExecutor(self.workers, thread_name_prefix="simulation-job")
+                future = self._threads.submit(job.fn)
+            future.add_done_callback(lambda done, job=job: self._complete(job, done))
+
+    def _complete(self, job, future):
+        try:
+            value = future.result()
+            if job.on_result is not None:
+                value = job.on_result(value)
+        except Exception as exc:
+            state, value, error = FAILED, None, exc
+        else:
+            state, error = DONE, None
+        with self._lock:
+            del self._jobs[job.key]
+            self.running -= 1
+            if state == DONE:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._dispatch()
+        job._finish(state, value, error)
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def default_pool():
+    """Process-wide pool shared by every page and session
+
+    Sized by SIMULATION_JOB_WORKERS (default: one per core),
+    SIMULATION_JOB_QUEUE (default 64) and SIMULATION_JOBS_PER_SESSION (default 2).
+    """
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = JobPool(
+                workers=int(os.environ.get("SIMULATION_JOB_WORKERS", 0)) or None,
+                max_queued=int(os.environ.get("SIMULATION_JOB_QUEUE", 64)),
+                per_session=int(os.environ.get("SIMULATION_JOBS_PER_SESSION", 2)),
+            )
+        return _default_pool
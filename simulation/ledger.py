@@ -0,0 +1,130 @@
+"""Compact columnar transaction ledger for the ATM simulation
+
+Every transaction is stored as one row of four typed arrays (entity id, kind,
+amount, simulated time), about 13 bytes per row. Human-readable lines are only
+built when a view is indexed or iterated.
+"""
+from array import array
+from bisect import bisect_right
+
+# Transaction kinds
+WITHDRAWN = 0
+FAILED_WITHDRAW = 1
+DEPOSITED = 2
+DISPENSED = 3
+
+_TEMPLATES = {
+    WITHDRAWN: "- Withdrawn ${amount} ({stamp})",
+    FAILED_WITHDRAW: "- Failed Withdraw ${amount} (Insufficient Balance) ({stamp})",
+    DEPOSITED: "+ Deposited ${amount} ({stamp})",
+    DISPENSED: "- Dispensed ${amount} ({stamp})",
+}
+
+# Entities whose row indexes `rows_for` keeps, so a cached run stays close to its size estimate
+INDEX_CACHE_ENTITIES = 256
+
+
+def format_sim_time(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    return f"[t+{int(minutes):02d}:{seconds:05.2f}]"
+
+
+class Ledger:
+    """Append-only struct-of-arrays log shared by every entity of one run"""
+
+    def __init__(self):
+        # Labels are stored as (first id, count, template) blocks so a million
+        # customers registered together cost one entry, not a million strings
+        self._label_starts = []
+        self._label_blocks = []
+        self.num_entities = 0
+        self.entity = array('i')
+        self.kind = array('B')
+        self.amount = array('i')
+        self.time = array('f')
+        self._index_cache = {}
+
+    def register(self, label):
+        """Add an entity (customer or ATM) and return its id"""
+        return self.register_range(label.replace("{", "{{").replace("}", "}}"), 1)
+
+    def register_range(self, template, count, first_index=0):
+        """Add `count` entities labelled template.format(i) and return the first id"""
+        first = self.num_entities
+        self._label_starts.append(first)
+        self._label_blocks.append((template, first_index))
+        self.num_entities += count
+        return first
+
+    def label(self, entity_id):
+        """Label of one entity, formatted on demand"""
+        block = bisect_right(self._label_starts, entity_id) - 1
+        template, first_index = self._label_blocks[block]
+        return template.format(first_index + entity_id - self._label_starts[block])
+
+    def record(self, entity_id, kind, amount, now):
+        self.entity.append(entity_id)
+        self.kind.append(kind)
+        self.amount.append(amount)
+        self.time.append(now)
+
+    def __len__(self):
+        return len(self.entity)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the columns and the row index cache"""
+        columns = sum(column.itemsize * len(column)
+                      for column in (self.entity, self.kind, self.amount, self.time))
+        return columns + sum(rows.nbytes for _, rows in self._index_cache.values())
+
+    def format_row(self, row):
+        """Render one row as the line the summary prints"""
+        template = _TEMPLATES[self.kind[row]]
+        return template.format(amount=self.amount[row], stamp=format_sim_time(self.time[row]))
+
+    def rows_for(self, entity_id):
+        """Return the row numbers belonging to one entity, in time order"""
+        cached = self._index_cache.get(entity_id)
+        if cached is not None and cached[0] == len(self):
+            return cached[1]
+        import numpy as np
+        rows = np.flatnonzero(np.frombuffer(self.entity, dtype=np.int32) == entity_id)
+        if len(self._index_cache) >= INDEX_CACHE_ENTITIES:
+            del self._index_cache[next(iter(self._index_cache))]
+        self._index_cache[entity_id] = (len(self), rows)
+        return rows
+
+    def entries(self, entity_id):
+        return LedgerEntries(self, entity_id)
+
+    def to_numpy(self):
+        """Expose the columns as NumPy arrays without copying"""
+        import numpy as np
+        return {
+            "entity": np.frombuffer(self.entity, dtype=np.int32),
+            "kind": np.frombuffer(self.kind, dtype=np.uint8),
+            "amount": np.frombuffer(self.amount, dtype=np.int32),
+            "time": np.frombuffer(self.time, dtype=np.float32),
+        }
+
+
+class LedgerEntries:
+    """Lazy, sliceable view of one entity's transactions"""
+
+    def __init__(self, ledger, entity_id):
+        self.ledger = ledger
+        self.entity_id = entity_id
+
+    def __len__(self):
+        return len(self.ledger.rows_for(self.entity_id))
+
+    def __getitem__(self, index):
+        rows = self.ledger.rows_for(self.entity_id)
+        if isinstance(index, slice):
+            return [self.ledger.format_row(row) for row in rows[index]]
+        return self.ledger.format_row(rows[index])
+
+    def __iter__(self):
+        for row in self.ledger.rows_for(self.entity_id):
+            yield self.ledger.format_row(row)
@@ -0,0 +1,146 @@
+"""Process-pool runner that shards large simulations across cores
+
+A run is cut into fixed-size shards and every shard gets its own child of a
+single `SeedSequence`. The shard layout depends only on the run size, never on
+the worker count, so the same seed always merges to the same result.
+
+Runs that leave the worker count to us share one process pool sized to the
+machine, so concurrent runs (say, from several app sessions) queue their
+shards on the same workers rather than each starting a pool of its own.
+Workers come from a fork server, never from forking the (threaded) caller.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+# Kernel units (rolls) per shard; large enough to amortize pickling overhead
+DEFAULT_SHARD_SIZE = 1 << 22
+
+_shared_executor = None
+_shared_lock = threading.Lock()
+
+
+def mp_context():
+    """Start method for every worker process: a fork server, or spawn where there is none
+
+    Forking a process that runs threads (a Streamlit server, the job pool) can
+    copy held locks into the child. Workers start from a clean server instead
+    and import task functions by name, so those must live in simulation modules.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Not "__main__": that would rerun whatever script started the server
+        context.set_forkserver_preload(["simulation.parallel"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def shared_executor():
+    """Process pool shared by every run in this process, one worker per core"""
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=mp_context())
+        return _shared_executor
+
+
+def _discard(executor):
+    # A worker died (killed for memory, say); the next run starts a fresh pool
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is executor:
+            _shared_executor = None
+
+
+def submit_task(fn, *args):
+    """Schedule `fn(*args)` on the shared pool and return its Future
+
+    `fn` must be a module-level function (or a partial of one) so it can be
+    sent to the workers.
+    """
+    executor = shared_executor()
+    try:
+        future = executor.submit(fn, *args)
+    except BrokenProcessPool:
+        _discard(executor)
+        executor = shared_executor()
+        future = executor.submit(fn, *args)
+
+    def discard_if_broken(done):
+        if not done.cancelled() and isinstance(done.exception(), BrokenProcessPool):
+            _discard(executor)
+
+    future.add_done_callback(discard_if_broken)
+    return future
+
+
+def map_tasks(fn, tasks, workers=None):
+    """`[fn(task) for task in tasks]` on worker processes, in task order
+
+    `workers=None` uses the shared pool; an explicit count gets a pool of its
+    own; a single worker (or task) stays in-process, as does every run made
+    from inside a pool worker, whose siblings already use the other cores.
+    """
+    count = min(workers or os.cpu_count() or 1, len(tasks))
+    if count <= 1 or multiprocessing.parent_process() is not None:
+        return [fn(task) for task in tasks]
+    if workers is not None:
+        with ProcessPoolExecutor(max_workers=count, mp_context=mp_context()) as pool:
+            return list(pool.map(fn, tasks))
+    executor = shared_executor()
+    try:
+        return list(executor.map(fn, tasks))
+    except BrokenProcessPool:
+        _discard(executor)
+        raise
+
+
+def shard_sizes(total, shard_size=DEFAULT_SHARD_SIZE):
+    """Split `total` units into full shards plus one remainder shard"""
+    full, rest = divmod(total, shard_size)
+    return [shard_size] * full + ([rest] if rest else [])
+
+
+def sum_counts(parts):
+    """Merge partial count arrays by summing them"""
+    return np.sum(parts, axis=0)
+
+
+def concat_samples(parts):
+    """Merge partial sample arrays by concatenating them in shard order"""
+    return np.concatenate(parts)
+
+
+def _run_shard(task):
+    kernel, size, args, seed_seq = task
+    return kernel(size, *args, rng=np.random.default_rng(seed_seq))
+
+
+def _shard_tasks(kernel, total, args, seed, shard_size):
+    sizes = shard_sizes(total, shard_size)
+    children = np.random.SeedSequence(seed).spawn(len(sizes))
+    return [(kernel, size, args, child) for size, child in zip(sizes, children)]
+
+
+def run_sharded(kernel, total, *args, seed=None, workers=None,
+                shard_size=DEFAULT_SHARD_SIZE, merge=sum_counts):
+    """Run `kernel(size, *args, rng=...)` over `total` units split into shards
+
+    `kernel` must be a module-level function so it can be sent to workers.
+    `workers=None` spreads shards over the shared pool; runs that fit in one
+    shard stay in-process.
+    """
+    tasks = _shard_tasks(kernel, total, args, seed, shard_size)
+    if not tasks:
+        return merge([kernel(0, *args, rng=np.random.default_rng(seed))])
+    return merge(map_tasks(_run_shard, tasks, workers))
+
+
+def iter_sharded(kernel, total, *args, seed=None, shard_size=DEFAULT_SHARD_SIZE):
+    """Yield the shard results `run_sharded` would merge, in order, one shard in memory at a time"""
+    for task in _shard_tasks(kernel, total, args, seed, shard_size):
+        yield _run_shard(task)
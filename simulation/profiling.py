@@ -0,0 +1,151 @@
+"""Per-stage timing, call counts and output bytes, with optional cProfile capture
+
+A disabled Profiler costs one attribute check per stage, so instrumented code
+can keep its hooks in place permanently. cProfile only sees the thread that
+enabled it, so work handed to another thread is captured through `call`, and
+work sent to another process through `profile_call` and `merge`.
+"""
+import cProfile
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Profiler:
+    """Collects wall time, calls and emitted bytes per named stage"""
+
+    def __init__(self, enabled=True, cprofile=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.messages = 0
+        self.total_bytes = 0
+        self._stack = []
+        self._profile = cProfile.Profile() if enabled and cprofile else None
+        self._thread = threading.get_ident()
+        self._thread_profiles = []
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        if self._profile is not None:
+            self._profile.enable()
+
+    def _entry(self, name):
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = {"calls": 0, "seconds": 0.0, "messages": 0, "bytes": 0}
+        return entry
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one call of `name`; stages may nest"""
+        if not self.enabled:
+            yield
+            return
+        entry = self._entry(name)
+        self._stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry["seconds"] += time.perf_counter() - start
+            entry["calls"] += 1
+            self._stack.pop()
+
+    def add_output(self, nbytes):
+        """Attribute one emitted message of `nbytes` to the innermost open stage"""
+        if not self.enabled:
+            return
+        self.messages += 1
+        self.total_bytes += nbytes
+        entry = self._entry(self._stack[-1] if self._stack else "(outside stages)")
+        entry["messages"] += 1
+        entry["bytes"] += nbytes
+
+    def call(self, fn):
+        """Return `fn()`, profiled into this capture when it runs on another thread"""
+        if self._profile is None or threading.get_ident() == self._thread:
+            return fn()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler, which already sees every thread
+            return fn()
+        try:
+            return fn()
+        finally:
+            profile.disable()
+            with self._lock:
+                self._thread_profiles.append(profile)
+
+    @property
+    def capturing(self):
+        """Whether cProfile capture is on"""
+        return self._profile is not None
+
+    def merge(self, captured):
+        """Add a (result, stats) pair from `profile_call` in another process to this capture; returns the result"""
+        value, stats = captured
+        if self._profile is not None:
+            with self._lock:
+                self._thread_profiles.append(_RawStats(stats))
+        return value
+
+    def stop(self):
+        """Stop cProfile capture; returns its pstats.Stats (all threads merged) or None"""
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        stats = pstats.Stats(self._profile)
+        with self._lock:
+            for profile in self._thread_profiles:
+                stats.add(profile)
+        return stats
+
+    def dump(self, path):
+        """Write the cProfile capture to `path` (readable by pstats, snakeviz, flameprof)"""
+        stats = self.stop()
+        if stats is None:
+            raise RuntimeError("Profiler was created without cprofile=True")
+        stats.dump_stats(path)
+        return path
+
+    def report(self):
+        """One row per stage, slowest first"""
+        rows = [
+            {
+                "stage": name,
+                "calls": entry["calls"],
+                "total_ms": entry["seconds"] * 1e3,
+                "mean_ms": entry["seconds"] * 1e3 / entry["calls"] if entry["calls"] else 0.0,
+                "messages": entry["messages"],
+                "bytes": entry["bytes"],
+            }
+            for name, entry in self.stages.items()
+        ]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+
+class _RawStats:
+    # Raw cProfile stats from another process, in the shape pstats.Stats loads (and empties)
+    def __init__(self, stats):
+        self._stats = stats
+
+    def create_stats(self):
+        self.stats = dict(self._stats)
+
+
+def profile_call(fn):
+    """Return (fn(), raw cProfile stats); run it in a worker process and pass the pair to Profiler.merge"""
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        value = fn()
+    finally:
+        profile.disable()
+    profile.create_stats()
+    return value, profile.stats
@@ -0,0 +1,341 @@
+"""Memory-mapped on-disk store of integer-coded dice rolls
+
+A store file holds an 8-byte magic, a 4-byte little-endian header length, a
+JSON header (seed, weights, shape, chunk size, completeness), zero padding up
+to a HEADER_ALIGN boundary, then the codes as raw uint8 rows. Samplers stream
+chunks straight into the file and readers map it read-only, so a run of a
+billion rolls can be reopened and reanalyzed without resampling it or
+loading it into RAM. Stores share a directory capped by a byte budget: the
+least recently used ones are deleted to make room for a new one.
+"""
+import json
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+from simulation.cache import ResultCache
+from simulation.dice import DEFAULT_CHUNK_SIZE, face_probabilities, sample_biased_faces
+from simulation.parallel import iter_sharded, map_tasks
+from simulation.stats import run_length_encode
+from simulation.streaming import DiceAccumulator, merge_all
+
+MAGIC = b"DICEROLL"
+# Version 2 samples with run_sharded's seeding; version 1 stores are resampled
+FORMAT_VERSION = 2
+# Codes start on a page boundary so the data maps cleanly
+HEADER_ALIGN = 4096
+STORE_SUFFIX = ".rolls"
+# Bytes all stores in a directory may use together, unless SIMULATION_STORE_BYTES says otherwise
+DEFAULT_STORE_BYTES = 4 * 1024 ** 3
+# Incomplete stores untouched this long are leftovers of interrupted runs, not writes in progress
+STALE_WRITE_SECONDS = 3600
+
+_PREFIX = struct.Struct("<8sI")
+
+
+def default_store_dir():
+    """Directory for roll stores: SIMULATION_STORE_DIR, or a folder in the system temp dir"""
+    return os.environ.get("SIMULATION_STORE_DIR") or os.path.join(tempfile.gettempdir(), "simulation-rolls")
+
+
+def default_store_bytes():
+    """Byte budget for a store directory: SIMULATION_STORE_BYTES, or DEFAULT_STORE_BYTES"""
+    return int(os.environ.get("SIMULATION_STORE_BYTES") or DEFAULT_STORE_BYTES)
+
+
+def store_path(params, seed, directory=None):
+    """Deterministic store path for a run, so the same run reopens the same file"""
+    key = ResultCache.make_key("rolls", params, seed)[:16]
+    return os.path.join(directory or default_store_dir(), key + STORE_SUFFIX)
+
+
+def read_header(path):
+    """Parse a store's header without mapping its data"""
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"{path} is not a roll store")
+        magic, length = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a roll store")
+        header = json.loads(f.read(length))
+    if header["version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported roll store version {header['version']}")
+    return header
+
+
+def _header_block(header):
+    payload = json.dumps(header, sort_keys=True).encode()
+    # Leave room for the header to be rewritten with "complete": true on close
+    size = -(-(_PREFIX.size + len(payload) + 16) // HEADER_ALIGN) * HEADER_ALIGN
+    return (_PREFIX.pack(MAGIC, len(payload)) + payload).ljust(size, b"\0")
+
+
+class RollWriter:
+    """Append integer-coded rolls to a new store; use as a context manager
+
+    The header is marked complete only when every declared roll was written,
+    so a store from an interrupted run is recognized and resampled.
+    """
+
+    def __init__(self, path, num_rolls, num_dice, weights, seed, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.header = {
+            "version": FORMAT_VERSION,
+            "seed": seed,
+            "weights": [float(w) for w in weights],
+            "shape": [num_rolls, num_dice],
+            "dtype": "uint8",
+            "chunk_size": chunk_size,
+            "complete": False,
+        }
+        self.written = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._block = _header_block(self.header)
+        self._file = open(path, "wb")
+        self._file.write(self._block)
+
+    def write(self, codes):
+        """Append a chunk of codes in roll order"""
+        codes = np.ascontiguousarray(codes, dtype=np.uint8)
+        if self.written + codes.size > self.header["shape"][0] * self.header["shape"][1]:
+            raise ValueError("More rolls written than the store was created for")
+        self._file.write(memoryview(codes).cast("B"))
+        self.written += codes.size
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.header["complete"] = self.written == self.header["shape"][0] * self.header["shape"][1]
+        block = _header_block(self.header)
+        if len(block) != len(self._block):
+            raise ValueError("Roll store header grew while writing")
+        self._file.seek(0)
+        self._file.write(block)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RollStore:
+    """Read-only, zero-copy view of a roll store file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.header = read_header(path)
+        self.offset = len(_header_block(self.header))
+        shape = tuple(self.header["shape"])
+        if self.complete and shape[0] * shape[1]:
+            self.codes = np.memmap(path, dtype=np.uint8, mode="r", offset=self.offset, shape=shape)
+        else:
+            self.codes = np.zeros((0, shape[1]), dtype=np.uint8)
+
+    @property
+    def seed(self):
+        return self.header["seed"]
+
+    @property
+    def weights(self):
+        return self.header["weights"]
+
+    @property
+    def num_rolls(self):
+        return self.header["shape"][0]
+
+    @property
+    def num_dice(self):
+        return self.header["shape"][1]
+
+    @property
+    def complete(self):
+        return self.header["complete"]
+
+    @property
+    def flat(self):
+        """All codes in roll order as a flat memory-mapped view"""
+        return self.codes.reshape(-1)
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE, start=0, stop=None):
+        """Yield flat views of at most `chunk_size` codes between `start` and `stop`; nothing is copied"""
+        flat = self.flat
+        stop = len(flat) if stop is None else stop
+        for first in range(start, stop, chunk_size):
+            yield flat[first:min(first + chunk_size, stop)]
+
+    def accumulate(self, chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+        """Face histogram and streaks of the whole store, one chunk in memory at a time
+
+        With several workers each maps the file itself and folds a contiguous
+        range; the partial accumulators merge in file order. `workers=None`
+        uses the shared process pool.
+        """
+        total = len(self.flat)
+        ranges = min(workers or os.cpu_count() or 1, max(1, total // chunk_size))
+        bounds = np.linspace(0, total, ranges + 1).astype(np.int64).tolist()
+        tasks = [(self.path, start, stop, chunk_size) for start, stop in zip(bounds, bounds[1:])]
+        return merge_all(map_tasks(_accumulate_range, tasks, workers))
+
+    def iter_runs(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yield (values, lengths, starts) of streaks in roll order, joining runs across chunks"""
+        open_run = None
+        offset = 0
+        for chunk in self.iter_chunks(chunk_size):
+            values, lengths, starts = run_length_encode(chunk)
+            starts = starts + offset
+            offset += len(chunk)
+            if open_run is not None:
+                value, length, start = open_run
+                if values[0] == value:
+                    lengths[0] += length
+                    starts[0] = start
+                else:
+                    values = np.concatenate(([value], values)).astype(chunk.dtype)
+                    lengths = np.concatenate(([length], lengths))
+                    starts = np.concatenate(([start], starts))
+            # The last run may continue into the next chunk
+            open_run = (values[-1], lengths[-1], starts[-1])
+            yield values[:-1], lengths[:-1], starts[:-1]
+        if open_run is not None:
+            value, length, start = open_run
+            yield np.array([value], dtype=np.uint8), np.array([length]), np.array([start])
+
+    def runs(self, first, count, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Streaks first..first+count-1 as (values, lengths, starts), scanning only up to them"""
+        parts = []
+        seen = 0
+        for values, lengths, starts in self.iter_runs(chunk_size):
+            lo, hi = max(first - seen, 0), min(first + count - seen, len(lengths))
+            if lo < hi:
+                parts.append((values[lo:hi], lengths[lo:hi], starts[lo:hi]))
+            seen += len(lengths)
+            if seen >= first + count:
+                break
+        if not parts:
+            empty = np.zeros(0, dtype=np.int64)
+            return np.zeros(0, dtype=np.uint8), empty, empty
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+    def close(self):
+        """Release the memory map"""
+        mapping = getattr(self.codes, "_mmap", None)
+        self.codes = np.zeros((0, self.num_dice), dtype=np.uint8)
+        if mapping is not None:
+            mapping.close()
+
+
+def _accumulate_range(task):
+    path, start, stop, chunk_size = task
+    store = RollStore(path)
+    accumulator = DiceAccumulator(len(store.weights))
+    for chunk in store.iter_chunks(chunk_size, start, stop):
+        accumulator.update(chunk)
+    store.close()
+    return accumulator
+
+
+def write_rolls(path, num_rolls, weights, num_dice=1, seed=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Sample rolls shard by shard straight into a new store at `path` and open it
+
+    The shards and their seeds are run_sharded's, so a seed gives the same
+    rolls as sampling `sample_biased_faces` in memory with run_sharded.
+    """
+    probs = face_probabilities(weights)
+    with RollWriter(path, num_rolls, num_dice, probs.tolist(), seed, chunk_size) as writer:
+        for shard in iter_sharded(sample_biased_faces, num_rolls * num_dice, probs, seed=seed):
+            writer.write(shard)
+    return RollStore(path)
+
+
+def open_or_write_rolls(path, num_rolls, weights, num_dice=1, seed=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                        max_bytes=None):
+    """Reopen a complete store for the same run, or sample a new one
+
+    With `max_bytes`, the least recently used stores in the same directory
+    are deleted first so the new store fits in that budget.
+    """
+    if os.path.exists(path):
+        try:
+            store = RollStore(path)
+        except ValueError:
+            store = None
+        if (store is not None and store.complete and store.seed == seed
+                and store.header["shape"] == [num_rolls, num_dice]
+                and np.allclose(store.weights, face_probabilities(weights))):
+            # Reopening counts as a use for the byte budget
+            os.utime(path)
+            return store
+    if max_bytes is not None:
+        prune_stores(os.path.dirname(os.path.abspath(path)), max_bytes - HEADER_ALIGN - num_rolls * num_dice,
+                     keep=[path])
+    return write_rolls(path, num_rolls, weights, num_dice, seed, chunk_size)
+
+
+def _store_files(directory):
+    # (mtime, size, path) of every store file in `directory`, oldest first
+    if not os.path.isdir(directory):
+        return []
+    files = []
+    for name in os.listdir(directory):
+        if not name.endswith(STORE_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    return sorted(files)
+
+
+def prune_stores(directory=None, max_bytes=None, keep=()):
+    """Delete the least recently used stores until the rest fit in `max_bytes`
+
+    Stores in `keep` and incomplete stores written to in the last
+    STALE_WRITE_SECONDS (runs still streaming) are never deleted. Returns the
+    deleted paths.
+    """
+    directory = directory or default_store_dir()
+    max_bytes = default_store_bytes() if max_bytes is None else max_bytes
+    files = _store_files(directory)
+    total = sum(size for _, size, _ in files)
+    keep = {os.path.abspath(path) for path in keep}
+    deleted = []
+    for mtime, size, path in files:
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            complete = read_header(path)["complete"]
+        except (OSError, ValueError, KeyError):
+            complete = False
+        if not complete and time.time() - mtime < STALE_WRITE_SECONDS:
+            continue
+        try:
+            # Readers that already mapped the file keep their view until they close it
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        deleted.append(path)
+    return deleted
+
+
+def list_stores(directory=None):
+    """Complete stores in `directory` as (path, header) pairs, newest first; only headers are read"""
+    stores = []
+    for _, _, path in reversed(_store_files(directory or default_store_dir())):
+        try:
+            header = read_header(path)
+        except (OSError, ValueError):
+            continue
+        if header.get("complete"):
+            stores.append((path, header))
+    return stores
@@ -0,0 +1,93 @@
+"""Weighted discrete sampler built once per weight vector
+
+Scalar draws use Walker/Vose alias tables: one uniform, one table lookup,
+O(1) regardless of the number of outcomes. Batch draws use the same tables
+for large outcome sets; for a handful of outcomes (every die in this app)
+counting crossed cumulative thresholds is branch-free and beats the two
+gathers an alias lookup needs in NumPy.
+"""
+import random
+from functools import lru_cache
+
+import numpy as np
+
+# Up to this many outcomes, batches use cumulative thresholds instead of alias lookups
+SMALL_TABLE = 16
+
+
+class AliasSampler:
+    """Draw outcome indices 0..k-1 with probability proportional to `weights`"""
+
+    def __init__(self, weights):
+        probs = np.asarray(weights, dtype=np.float64)
+        if probs.ndim != 1 or len(probs) == 0:
+            raise ValueError("Weights must be a non-empty 1-D sequence")
+        if (probs < 0).any() or probs.sum() <= 0:
+            raise ValueError("Weights must be non-negative with a positive total")
+        self.probs = probs / probs.sum()
+        self.k = len(probs)
+        self.dtype = np.uint8 if self.k <= 256 else np.intp
+        self.uniform = bool(np.all(self.probs == self.probs[0]))
+        self.cdf = np.cumsum(self.probs)
+        self.cdf[-1] = 1.0
+        self.prob, self.alias = self._build_tables(self.probs)
+        # Plain lists keep scalar draws free of NumPy scalar overhead
+        self._prob_list = self.prob.tolist()
+        self._alias_list = self.alias.tolist()
+
+    @staticmethod
+    def _build_tables(probs):
+        # Vose's method: pair each under-full column with an over-full donor
+        k = len(probs)
+        scaled = (probs * k).tolist()
+        prob = np.ones(k)
+        alias = np.arange(k)
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Leftovers are full columns up to rounding error
+        for i in small + large:
+            prob[i] = 1.0
+            alias[i] = i
+        return prob, alias
+
+    def draw(self, rng=random):
+        """Draw one outcome using a `random.Random`-like generator"""
+        u = rng.random() * self.k
+        i = int(u)
+        return i if u - i < self._prob_list[i] else self._alias_list[i]
+
+    def draw_array(self, size, rng=None):
+        """Draw `size` outcomes as a NumPy array using a NumPy generator"""
+        rng = np.random.default_rng(rng)
+        if self.uniform:
+            return rng.integers(0, self.k, size, dtype=self.dtype)
+        uniforms = rng.random(size)
+        if self.k <= SMALL_TABLE:
+            codes = np.zeros(size, dtype=self.dtype)
+            for threshold in self.cdf[:-1]:
+                codes += uniforms >= threshold
+            return codes
+        uniforms *= self.k
+        columns = uniforms.astype(np.intp)
+        uniforms -= columns
+        codes = self.alias.take(columns).astype(self.dtype)
+        keep = uniforms < self.prob.take(columns)
+        codes[keep] = columns[keep]
+        return codes
+
+
+@lru_cache(maxsize=64)
+def _cached_sampler(weights):
+    return AliasSampler(weights)
+
+
+def sampler_for(weights):
+    """Return a shared sampler for this weight vector, building it on first use"""
+    return _cached_sampler(tuple(float(w) for w in weights))
@@ -0,0 +1,66 @@
+"""Count-based dice statistics and run-length streak analysis
+
+Everything here works from a histogram or from integer-coded rolls, so the
+cost is linear in the number of rolls and independent of their labels.
+"""
+import numpy as np
+
+
+def median_from_counts(counts, values):
+    """Exact median of a sample given per-value counts (values in ascending order)"""
+    n = int(counts.sum())
+    if n == 0:
+        return float("nan")
+    cumulative = np.cumsum(counts)
+    lower = values[np.searchsorted(cumulative, (n - 1) // 2, side='right')]
+    upper = values[np.searchsorted(cumulative, n // 2, side='right')]
+    return (lower + upper) / 2
+
+
+def statistics_from_counts(counts, labels):
+    """Sum, mean, median, mode and extremes of dice rolls from their face counts
+
+    Face i (0-based) is worth i + 1. Ties resolve the way `Counter.most_common`
+    did over sorted rolls: the lowest face wins most common, the highest face
+    among the rarest present faces is least common.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    values = np.arange(1, len(counts) + 1)
+    n = int(counts.sum())
+    dice_sum = int(counts @ values)
+    present = np.flatnonzero(counts)
+    mode_index = int(np.argmax(counts))
+    rarest = present[counts[present] == counts[present].min()][-1]
+    most_common = (labels[mode_index], int(counts[mode_index]))
+    return {
+        "frequency": dict(zip(labels, counts.tolist())),
+        "sum": dice_sum,
+        "mean": dice_sum / n,
+        "median": median_from_counts(counts, values),
+        "mode": most_common,
+        "most_common": most_common,
+        "least_common": (labels[rarest], int(counts[rarest])),
+    }
+
+
+def run_length_encode(codes):
+    """Split a sequence into runs of equal codes; returns (values, lengths, starts)"""
+    codes = np.asarray(codes)
+    if len(codes) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return codes[:0], empty, empty
+    starts = np.concatenate(([0], np.flatnonzero(codes[1:] != codes[:-1]) + 1))
+    lengths = np.diff(np.append(starts, len(codes)))
+    return codes[starts], lengths, starts
+
+
+def streak_summary(codes, num_faces):
+    """Longest run per face and the distribution of run lengths over all faces"""
+    values, lengths, _ = run_length_encode(codes)
+    longest = np.zeros(num_faces, dtype=np.int64)
+    np.maximum.at(longest, values.astype(np.intp), lengths)
+    return {
+        "num_runs": len(lengths),
+        "longest": longest,
+        "length_distribution": np.bincount(lengths),
+    }
@@ -0,0 +1,298 @@
+"""Constant-memory, mergeable accumulators for streaming simulation output
+
+Each accumulator is fed chunk by chunk with `update` and combined with
+`merge`, so shards can be summarized independently and folded together in
+shard order. Memory depends on the number of bins or runs tracked, never on
+the number of samples.
+"""
+import math
+from functools import reduce
+
+import numpy as np
+
+from simulation.stats import median_from_counts, run_length_encode, statistics_from_counts
+
+
+def merge_all(parts):
+    """Fold a list of accumulators left to right (shard order matters for streaks)"""
+    return reduce(lambda left, right: left.merge(right), parts)
+
+
+class HistogramAccumulator:
+    """Counts of integer codes 0..num_bins-1, with exact moments and median"""
+
+    def __init__(self, num_bins):
+        self.counts = np.zeros(num_bins, dtype=np.int64)
+
+    def update(self, codes):
+        self.counts += np.bincount(codes, minlength=len(self.counts))
+        return self
+
+    def merge(self, other):
+        self.counts += other.counts
+        return self
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def mean(self, values=None):
+        values = np.arange(1, len(self.counts) + 1) if values is None else np.asarray(values)
+        return float(self.counts @ values) / self.total
+
+    def median(self, values=None):
+        values = np.arange(1, len(self.counts) + 1) if values is None else np.asarray(values)
+        return median_from_counts(self.counts, values)
+
+    def summary(self, labels):
+        return statistics_from_counts(self.counts, labels)
+
+
+class MomentAccumulator:
+    """Welford mean and variance, merged with Chan's pairwise update"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x):
+        """Add one value; the cheap path for event-driven code"""
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def update(self, values):
+        """Add a chunk of values with one vectorized pass"""
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return self
+        chunk = MomentAccumulator()
+        chunk.count = values.size
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        return self.merge(chunk)
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class QuantileSketch:
+    """Relative-error quantile sketch over non-negative values (DDSketch-style)
+
+    Values fall into logarithmic buckets of ratio gamma = (1 + a) / (1 - a),
+    so every reported quantile is within relative error `a` of a true sample
+    value. Buckets merge by addition; memory grows with log(max / min), not
+    with the number of values.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        if x < 0:
+            raise ValueError("QuantileSketch only accepts non-negative values")
+        self.count += 1
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        if x == 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(x) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return self
+        if (values < 0).any():
+            raise ValueError("QuantileSketch only accepts non-negative values")
+        self.count += values.size
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > 0]
+        self.zero_count += values.size - positive.size
+        keys, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        return self
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1); NaN when empty"""
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class StreakAccumulator:
+    """Run-length statistics over a sequence that arrives in consecutive chunks
+
+    Only the first and last run of the sequence so far stay open, since they
+    may join runs in neighbouring chunks; every run in between is final and
+    is folded into the per-face longest run and the run-length histogram.
+    """
+
+    def __init__(self, num_faces):
+        self.num_faces = num_faces
+        self.length = 0
+        self.head = None  # (code, length) of the first run
+        self.tail = None  # (code, length) of the last run, None if only one run
+        self.longest = np.zeros(num_faces, dtype=np.int64)
+        self.length_counts = np.zeros(1, dtype=np.int64)
+        self.interior_runs = 0
+
+    def _close(self, code, length):
+        self.interior_runs += 1
+        if self.longest[code] < length:
+            self.longest[code] = length
+        if length >= len(self.length_counts):
+            self.length_counts = np.concatenate(
+                (self.length_counts, np.zeros(length + 1 - len(self.length_counts), dtype=np.int64)))
+        self.length_counts[length] += 1
+
+    def _close_many(self, values, lengths):
+        if len(lengths) == 0:
+            return
+        self.interior_runs += len(lengths)
+        np.maximum.at(self.longest, values.astype(np.intp), lengths)
+        counts = np.bincount(lengths)
+        if len(counts) > len(self.length_counts):
+            counts[:len(self.length_counts)] += self.length_counts
+            self.length_counts = counts
+        else:
+            self.length_counts[:len(counts)] += counts
+
+    def update(self, codes):
+        chunk = StreakAccumulator(self.num_faces)
+        values, lengths, _ = run_length_encode(codes)
+        if len(lengths) == 0:
+            return self
+        chunk.length = len(codes)
+        chunk.head = (int(values[0]), int(lengths[0]))
+        if len(lengths) > 1:
+            chunk.tail = (int(values[-1]), int(lengths[-1]))
+            chunk._close_many(values[1:-1], lengths[1:-1])
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """Append `other`, which must cover the sequence right after this one"""
+        if other.length == 0:
+            return self
+        if self.length == 0:
+            self.__dict__.update({k: (v.copy() if isinstance(v, np.ndarray) else v)
+                                  for k, v in other.__dict__.items()})
+            return self
+        np.maximum(self.longest, other.longest, out=self.longest)
+        if len(other.length_counts) > len(self.length_counts):
+            merged = other.length_counts.copy()
+            merged[:len(self.length_counts)] += self.length_counts
+            self.length_counts = merged
+        else:
+            self.length_counts[:len(other.length_counts)] += other.length_counts
+        self.interior_runs += other.interior_runs
+
+        left = self.tail or self.head
+        right = other.head
+        if left[0] == right[0]:
+            joined = (left[0], left[1] + right[1])
+            if self.tail is None and other.tail is None:
+                self.head = joined
+            elif self.tail is None:
+                self.head, self.tail = joined, other.tail
+            elif other.tail is None:
+                self.tail = joined
+            else:
+                self._close(*joined)
+                self.tail = other.tail
+        else:
+            if self.tail is not None:
+                self._close(*self.tail)
+            if other.tail is None:
+                self.tail = other.head
+            else:
+                self._close(*other.head)
+                self.tail = other.tail
+        self.length += other.length
+        return self
+
+    def summary(self):
+        """Longest run per face, run-length distribution and number of runs"""
+        longest = self.longest.copy()
+        length_counts = self.length_counts.copy()
+        for run in (self.head, self.tail):
+            if run is None:
+                continue
+            code, length = run
+            longest[code] = max(longest[code], length)
+            if length >= len(length_counts):
+                length_counts = np.concatenate((length_counts, np.zeros(length + 1 - len(length_counts), dtype=np.int64)))
+            length_counts[length] += 1
+        open_runs = (self.head is not None) + (self.tail is not None)
+        return {
+            "num_runs": self.interior_runs + open_runs,
+            "longest": longest,
+            "length_distribution": length_counts,
+        }
+
+
+class DiceAccumulator:
+    """Face histogram plus streaks for one stream of die rolls"""
+
+    def __init__(self, num_faces):
+        self.histogram = HistogramAccumulator(num_faces)
+        self.streaks = StreakAccumulator(num_faces)
+
+    def update(self, codes):
+        self.histogram.update(codes)
+        self.streaks.update(codes)
+        return self
+
+    def merge(self, other):
+        self.histogram.merge(other.histogram)
+        self.streaks.merge(other.streaks)
+        return self
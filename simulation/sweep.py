@@ -0,0 +1,227 @@
+"""Parallel parameter sweeps over the ATM simulation
+
+A grid maps each parameter to the values to try; every combination is one
+cell, run `replications` times on a process pool. Each run's seed is derived
+from the sweep seed, the cell's parameters and the replication number, so a
+cell gives the same results whatever the grid, worker count or run order.
+Finished cells are appended to a JSON-lines checkpoint, and a sweep restarted
+with the same checkpoint only runs the cells that are missing.
+
+    rows = run_sweep({"num_customers": [100, 1000], "outage_prob": [0.0, 0.05]},
+                     replications=20, seed=1, checkpoint="sweep.jsonl")
+"""
+import hashlib
+import itertools
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from simulation.atm import MAINTENANCE_ROUND, run_atm_simulation
+from simulation.cache import new_seed
+from simulation.parallel import mp_context, submit_task
+from simulation.streaming import MomentAccumulator
+
+# Defaults for parameters a grid leaves out; None keeps the model's random draw.
+# maintenance_interval counts rounds of MAINTENANCE_ROUND simulated seconds, the
+# unit of the model's default draw of 1-5 rounds
+DEFAULT_GRID = {
+    "num_customers": [10],
+    "num_atms": [3],
+    "atm_cash": [None],
+    "outage_prob": [0.05],
+    "maintenance_interval": [None],
+}
+
+# Per-run metrics averaged over each cell's replications
+RUN_METRICS = ["failure_rate", "throughput", "first_cash_out", "all_atms_down", "sim_time", "p99_transaction_time"]
+
+
+def expand_grid(grid):
+    """List every combination of the grid as a dict, in grid order"""
+    unknown = set(grid) - set(DEFAULT_GRID)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    values = {**DEFAULT_GRID, **grid}
+    keys = list(DEFAULT_GRID)
+    return [dict(zip(keys, combination)) for combination in itertools.product(*(values[key] for key in keys))]
+
+
+def cell_key(cell):
+    """Stable text key of a cell's parameters"""
+    return json.dumps(cell, sort_keys=True)
+
+
+def run_seed(sweep_seed, cell, replication):
+    """63-bit seed for one replication of one cell"""
+    payload = json.dumps([sweep_seed, cell_key(cell), replication]).encode()
+    return int.from_bytes(hashlib.sha256(payload).digest()[:8], "little") >> 1
+
+
+def run_replication(task):
+    """Simulate one replication of a cell and reduce it to scalar metrics"""
+    cell, replication, seed, max_iterations, max_time = task
+    options = {"outage_prob": cell["outage_prob"], "max_time": max_time}
+    if cell["maintenance_interval"] is not None:
+        options["maintenance_interval"] = cell["maintenance_interval"] * MAINTENANCE_ROUND
+    if cell["atm_cash"] is not None:
+        options["cash_range"] = (cell["atm_cash"], cell["atm_cash"])
+    start = time.perf_counter()
+    _, _, result = run_atm_simulation(cell["num_customers"], cell["num_atms"], max_iterations, seed, **options)
+    finished = result["successful_transactions"] + result["failed_transactions"]
+    return {
+        "replication": replication,
+        "seed": seed,
+        "failure_rate": result["failed_transactions"] / finished if finished else 0.0,
+        # Completed transactions per simulated second
+        "throughput": result["successful_transactions"] / result["sim_time"] if result["sim_time"] else 0.0,
+        "first_cash_out": min(result["cash_out_times"], default=None),
+        "num_cash_outs": len(result["cash_out_times"]),
+        "all_atms_down": float(result["all_atms_down"]),
+        "sim_time": result["sim_time"],
+        "p99_transaction_time": result["transaction_time_sketch"].quantile(0.99),
+        "num_events": result["num_events"],
+        "wall_seconds": time.perf_counter() - start,
+    }
+
+
+def summarize_cell(cell, runs):
+    """One results row: the cell's parameters plus mean and std of each run metric"""
+    row = dict(cell)
+    row["replications"] = len(runs)
+    for metric in RUN_METRICS:
+        moments = MomentAccumulator()
+        for run in runs:
+            value = run[metric]
+            if value is not None and not math.isnan(value):
+                moments.add(value)
+        row[f"{metric}_mean"] = moments.mean if moments.count else None
+        row[f"{metric}_std"] = moments.std if moments.count > 1 else None
+    # Share of runs in which at least one ATM ran out of cash
+    row["cash_out_share"] = sum(run["num_cash_outs"] > 0 for run in runs) / len(runs) if runs else 0.0
+    row["events"] = sum(run["num_events"] for run in runs)
+    row["wall_seconds"] = sum(run["wall_seconds"] for run in runs)
+    return row
+
+
+def _read_checkpoint(path):
+    # Parsed lines of a checkpoint. A sweep killed mid-append leaves a torn last
+    # line, which is cut off so its cell reruns and later appends start cleanly
+    with open(path, "rb") as f:
+        data = f.read()
+    entries = []
+    offset = 0
+    for line in data.splitlines(keepends=True):
+        try:
+            entry = json.loads(line) if line.endswith(b"\n") else None
+        except ValueError:
+            entry = None
+        if entry is None and line.strip():
+            if offset + len(line) < len(data):
+                raise ValueError(f"Checkpoint {path} is corrupt at byte {offset}")
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+            break
+        if entry is not None:
+            entries.append(entry)
+        offset += len(line)
+    return entries
+
+
+def _load_checkpoint(path, settings):
+    # Returns {cell key: runs} for finished cells; the header must match this sweep
+    finished = {}
+    if not path or not os.path.exists(path):
+        return finished
+    lines = _read_checkpoint(path)
+    if lines and lines[0].get("settings") != settings:
+        raise ValueError(f"Checkpoint {path} was written by a sweep with different settings: {lines[0].get('settings')}")
+    for entry in lines[1:]:
+        finished[cell_key(entry["cell"])] = entry["runs"]
+    return finished
+
+
+def _append(f, entry):
+    f.write(json.dumps(entry) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def run_sweep(grid, replications=10, seed=None, workers=None, checkpoint=None,
+              max_iterations=20, max_time=None, progress=None):
+    """Run every cell of `grid` `replications` times and return one aggregated row per cell
+
+    `workers=None` uses the shared process pool (a worker per core); an
+    explicit count gets a pool of its own. With `checkpoint`, finished cells
+    are read back instead of rerun and new ones are appended as they
+    complete; a checkpoint written with a different seed, replication count
+    or run limits is rejected. `progress(done, total)` is called after each
+    cell.
+    """
+    cells = expand_grid(grid)
+    if seed is None:
+        # A resumed sweep reuses the seed stored in its checkpoint
+        seed = _stored_seed(checkpoint) if checkpoint else None
+        seed = new_seed() if seed is None else seed
+    settings = {"seed": seed, "replications": replications, "max_iterations": max_iterations, "max_time": max_time}
+    finished = _load_checkpoint(checkpoint, settings)
+    pending = [cell for cell in cells if cell_key(cell) not in finished]
+
+    log = None
+    if checkpoint:
+        new_file = not os.path.exists(checkpoint) or os.path.getsize(checkpoint) == 0
+        log = open(checkpoint, "a")
+        if new_file:
+            _append(log, {"settings": settings})
+    try:
+        tasks = [(cell, replication, run_seed(seed, cell, replication), max_iterations, max_time)
+                 for cell in pending for replication in range(replications)]
+        remaining = {cell_key(cell): replications for cell in pending}
+        runs = {cell_key(cell): [] for cell in pending}
+        done = len(cells) - len(pending)
+
+        def collect(task, run):
+            nonlocal done
+            key = cell_key(task[0])
+            runs[key].append(run)
+            remaining[key] -= 1
+            if remaining[key] == 0:
+                runs[key].sort(key=lambda r: r["replication"])
+                finished[key] = runs[key]
+                if log is not None:
+                    _append(log, {"cell": task[0], "runs": runs[key]})
+                done += 1
+                if progress is not None:
+                    progress(done, len(cells))
+
+        count = min(workers or os.cpu_count() or 1, max(1, len(tasks)))
+        if count == 1:
+            for task in tasks:
+                collect(task, run_replication(task))
+        elif workers is None:
+            futures = {submit_task(run_replication, task): task for task in tasks}
+            try:
+                for future in as_completed(futures):
+                    collect(futures[future], future.result())
+            finally:
+                # Leave the shared pool to other runs if this sweep stops early
+                for future in futures:
+                    future.cancel()
+        else:
+            with ProcessPoolExecutor(max_workers=count, mp_context=mp_context()) as pool:
+                futures = {pool.submit(run_replication, task): task for task in tasks}
+                for future in as_completed(futures):
+                    collect(futures[future], future.result())
+    finally:
+        if log is not None:
+            log.close()
+
+    return [summarize_cell(cell, finished[cell_key(cell)]) for cell in cells]
+
+
+def _stored_seed(path):
+    if not os.path.exists(path):
+        return None
+    lines = _read_checkpoint(path)
+    return lines[0].get("settings", {}).get("seed") if lines else None
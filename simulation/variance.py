@@ -0,0 +1,191 @@
+"""Variance-reduced Monte Carlo estimates of rare colored-dice events
+
+The event is "at least `min_matches` of the `num_dice` dice show `target`",
+e.g. every die showing Purple. Each kernel returns mergeable sums so a run
+shards across cores with `run_sharded`:
+
+- naive: plain independent rolls
+- stratified: the first die's color is the stratum; a proportional pilot
+  measures each stratum's spread, then the rest of the budget follows Neyman
+  allocation (rolls per stratum proportional to weight times spread)
+- antithetic: rolls come in pairs driven by uniforms U and 1 - U, with the
+  target color last in the inverse CDF so the event is monotone in U
+- importance: the target color's probability is tilted up and each roll is
+  reweighted by its likelihood ratio p(roll) / q(roll)
+
+The variance reduction factor compares an estimator with naive sampling on
+the same number of rolls, p(1 - p) / rolls, using the mode's own estimate.
+"""
+import math
+
+import numpy as np
+
+from simulation.convergence import z_score
+from simulation.dice import DEFAULT_CHUNK_SIZE, color_probabilities, colors, iter_roll_chunks
+from simulation.parallel import run_sharded
+from simulation.sampling import sampler_for
+
+MODES = ["naive", "stratified", "antithetic", "importance"]
+
+# Share of a stratified run spent on the proportional pilot
+PILOT_FRACTION = 0.1
+# Share of proportional allocation every stratum keeps after the pilot, so a
+# stratum whose pilot saw no events is still sampled
+MIN_STRATUM_SHARE = 0.01
+# Importance sampling never makes the target color certain, so every roll stays possible
+MAX_TILT = 0.9
+
+
+def _moments(values):
+    # Mergeable sums: count, sum, sum of squares
+    return np.array([len(values), values.sum(), np.square(values).sum()], dtype=np.float64)
+
+
+def _sample_variance(n, total, total_sq):
+    if n < 2:
+        return 0.0
+    return max(0.0, (total_sq - total * total / n) / (n - 1))
+
+
+def _row_chunks(num_rows, row_width, chunk_size=DEFAULT_CHUNK_SIZE):
+    rows_per_chunk = max(1, chunk_size // max(1, row_width))
+    for start in range(0, num_rows, rows_per_chunk):
+        yield min(rows_per_chunk, num_rows - start)
+
+
+def naive_event_moments(num_rolls, num_dice, biased, target, min_matches, rng=None):
+    """Moments of the event indicator over `num_rolls` plain rolls"""
+    moments = np.zeros(3)
+    for chunk in iter_roll_chunks(num_rolls, num_dice, biased, rng=rng):
+        moments += _moments(((chunk == target).sum(axis=1) >= min_matches).astype(np.float64))
+    return moments
+
+
+def stratified_event_moments(num_rolls, num_dice, biased, target, min_matches, allocation, rng=None):
+    """Per-stratum moments (rows ordered like `colors`) with the first die fixed to the stratum's color"""
+    rng = np.random.default_rng(rng)
+    sampler = sampler_for(color_probabilities(biased))
+    moments = np.zeros((len(colors), 3))
+    for stratum, size in enumerate(rng.multinomial(num_rolls, allocation)):
+        needed = min_matches - (stratum == target)
+        for rows in _row_chunks(size, num_dice - 1):
+            rest = sampler.draw_array(rows * (num_dice - 1), rng).reshape(rows, num_dice - 1)
+            moments[stratum] += _moments(((rest == target).sum(axis=1) >= needed).astype(np.float64))
+    return moments
+
+
+def antithetic_event_moments(num_pairs, num_dice, biased, target, min_matches, rng=None):
+    """Moments of the pair-averaged indicator over `num_pairs` antithetic pairs of rolls"""
+    rng = np.random.default_rng(rng)
+    # With the target color last in the CDF, a die shows it exactly when u >= 1 - p
+    threshold = 1 - color_probabilities(biased)[target]
+    moments = np.zeros(3)
+    for rows in _row_chunks(num_pairs, 2 * num_dice):
+        uniforms = rng.random((rows, num_dice))
+        hits = (uniforms >= threshold).sum(axis=1) >= min_matches
+        mirrored = (1 - uniforms >= threshold).sum(axis=1) >= min_matches
+        moments += _moments((hits.astype(np.float64) + mirrored) / 2)
+    return moments
+
+
+def tilted_probabilities(biased, target, tilt):
+    """Color probabilities with the target set to `tilt` and the others scaled to fit"""
+    probs = color_probabilities(biased)
+    tilted = probs * (1 - tilt) / (1 - probs[target])
+    tilted[target] = tilt
+    return tilted
+
+
+def default_tilt(biased, target, num_dice, min_matches):
+    """Tilt that makes `min_matches` the expected number of target dice, capped at MAX_TILT"""
+    return min(max(color_probabilities(biased)[target], min_matches / num_dice), MAX_TILT)
+
+
+def importance_event_moments(num_rolls, num_dice, biased, target, min_matches, tilt, rng=None):
+    """Moments of the likelihood-ratio-weighted indicator over `num_rolls` tilted rolls"""
+    rng = np.random.default_rng(rng)
+    p = color_probabilities(biased)[target]
+    sampler = sampler_for(tilted_probabilities(biased, target, tilt))
+    log_hit = math.log(p / tilt)
+    log_miss = math.log((1 - p) / (1 - tilt))
+    moments = np.zeros(3)
+    for rows in _row_chunks(num_rolls, num_dice):
+        matches = (sampler.draw_array(rows * num_dice, rng).reshape(rows, num_dice) == target).sum(axis=1)
+        weights = np.exp(matches * log_hit + (num_dice - matches) * log_miss)
+        moments += _moments(np.where(matches >= min_matches, weights, 0.0))
+    return moments
+
+
+def _stratified_estimate(num_rolls, args, biased, seed, workers):
+    weights = color_probabilities(biased)
+    entropy = np.random.SeedSequence(seed).entropy
+    pilot_rolls = min(num_rolls, max(len(colors), int(num_rolls * PILOT_FRACTION)))
+    strata = run_sharded(stratified_event_moments, pilot_rolls, *args, weights,
+                         seed=[entropy, 0], workers=workers)
+    spreads = np.sqrt([_sample_variance(*stratum) for stratum in strata])
+    allocation = weights * spreads
+    if allocation.sum() > 0:
+        allocation = (1 - MIN_STRATUM_SHARE) * allocation / allocation.sum() + MIN_STRATUM_SHARE * weights
+    else:
+        allocation = weights
+    if num_rolls > pilot_rolls:
+        strata = strata + run_sharded(stratified_event_moments, num_rolls - pilot_rolls, *args,
+                                      allocation / allocation.sum(), seed=[entropy, 1], workers=workers)
+
+    counts, totals = strata[:, 0], strata[:, 1]
+    means = np.divide(totals, counts, out=np.zeros(len(colors)), where=counts > 0)
+    variances = np.array([_sample_variance(*stratum) / stratum[0] if stratum[0] else 0.0 for stratum in strata])
+    return float(weights @ means), float(weights ** 2 @ variances), int(counts.sum())
+
+
+def estimate_rare_event(mode, num_rolls, num_dice, biased, target="Purple", min_matches=None,
+                        confidence=0.95, tilt=None, seed=None, workers=None):
+    """Estimate P(at least `min_matches` of `num_dice` dice show `target`) with one of MODES
+
+    `min_matches` defaults to every die. Returns the estimate, its standard
+    error and normal confidence interval, the rolls used and the variance
+    reduction factor against naive sampling with the same number of rolls.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown sampling mode {mode!r}; expected one of {MODES}")
+    target_index = colors.index(target)
+    min_matches = num_dice if min_matches is None else min_matches
+    args = (num_dice, biased, target_index, min_matches)
+
+    if mode == "stratified":
+        estimate, variance, rolls = _stratified_estimate(num_rolls, args, biased, seed, workers)
+    else:
+        if mode == "naive":
+            moments = run_sharded(naive_event_moments, num_rolls, *args, seed=seed, workers=workers)
+        elif mode == "antithetic":
+            moments = run_sharded(antithetic_event_moments, max(1, num_rolls // 2), *args,
+                                  seed=seed, workers=workers)
+        else:
+            tilt = default_tilt(biased, target_index, num_dice, min_matches) if tilt is None else tilt
+            moments = run_sharded(importance_event_moments, num_rolls, *args, tilt, seed=seed, workers=workers)
+        n, total, total_sq = moments
+        estimate = total / n
+        variance = _sample_variance(n, total, total_sq) / n
+        rolls = int(n) * (2 if mode == "antithetic" else 1)
+
+    naive_variance = estimate * (1 - estimate) / rolls
+    if variance > 0:
+        reduction = naive_variance / variance
+    else:
+        reduction = math.inf if naive_variance > 0 else math.nan
+    std_error = math.sqrt(variance)
+    half_width = z_score(confidence) * std_error
+    return {
+        "mode": mode,
+        "target": target,
+        "min_matches": min_matches,
+        "tilt": tilt if mode == "importance" else None,
+        "rolls": rolls,
+        "estimate": estimate,
+        "std_error": std_error,
+        "ci_low": max(0.0, estimate - half_width),
+        "ci_high": min(1.0, estimate + half_width),
+        "confidence": confidence,
+        "variance_reduction": reduction,
+        "equivalent_naive_rolls": rolls * reduction,
+    }
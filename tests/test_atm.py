@@ -0,0 +1,49 @@
+"""The discrete-event ATM engine driven with plain Customer and ATM objects"""
+from simulation.atm import ATM, Customer, simulate_atm
+from simulation.eventlog import LOG_ARRIVE
+from simulation.ledger import DEPOSITED, DISPENSED, WITHDRAWN
+
+
+def net_change(ledger, entity_id):
+    sign = {DEPOSITED: 1, WITHDRAWN: -1, DISPENSED: -1}
+    return sum(sign.get(ledger.kind[row], 0) * ledger.amount[row] for row in ledger.rows_for(entity_id))
+
+
+def test_objects_with_their_own_ledgers():
+    customers = [Customer("a", 5000), Customer("b", 5000), Customer("c", 100)]
+    atms = [ATM(1, 100_000), ATM(2, 100_000)]
+    customers[0].deposit(300)
+    result = simulate_atm(customers, atms, max_iterations=5, seed=3, outage_prob=0.0)
+
+    assert result["successful_transactions"] + result["failed_transactions"] == 15
+    assert len({id(c.ledger) for c in customers}) == 1
+    assert len({id(atm.ledger) for atm in atms}) == 1
+    # History from before the run moved over with each customer
+    assert customers[0].transactions[0].startswith("+ Deposited $300")
+    # Every balance change, before and during the run, is in the merged ledgers
+    for customer, opening in zip(customers, [5000, 5000, 100]):
+        assert customer.balance == opening + net_change(customer.ledger, customer.entity_id)
+    for atm in atms:
+        assert atm.cash_balance == 100_000 + net_change(atm.ledger, atm.entity_id)
+    assert sum(len(atm.transactions) for atm in atms) == result["total_attempts"]
+
+
+def test_objects_sharing_a_ledger_keep_it():
+    customers = [Customer("a", 5000)]
+    ledger = customers[0].ledger
+    customers.append(Customer("b", 5000, ledger))
+    simulate_atm(customers, [ATM(1, 100_000)], max_iterations=2, seed=1, outage_prob=0.0)
+    assert all(c.ledger is ledger for c in customers)
+    assert customers[1].entity_id == 1
+
+
+def test_taken_down_queue_moves_without_new_arrivals():
+    customers = [Customer(str(c), 10 ** 6) for c in range(50)]
+    atms = [ATM(a, 10 ** 7) for a in range(5)]
+    # Arrivals far outpace service, so ATMs go down with long queues
+    result = simulate_atm(customers, atms, max_iterations=3, seed=2, mean_interarrival=0.01, outage_prob=0.2,
+                          record_events=True)
+    arrivals = [entry[2] for entry in result["events"] if entry[1] == LOG_ARRIVE]
+    assert max(arrivals.count(c) for c in range(50)) <= 3
+    served = result["successful_transactions"] + result["failed_transactions"]
+    assert served <= len(arrivals) and result["num_events"] >= len(arrivals) + served
@@ -0,0 +1,31 @@
+"""Size accounting of cached results"""
+import numpy as np
+
+from simulation.atm import run_atm_simulation
+from simulation.cache import ResultCache, estimate_size
+
+
+def test_buffers_are_exact():
+    assert estimate_size(np.zeros(1000)) == 8000
+    assert estimate_size(bytearray(100)) == 100
+
+
+def test_atm_result_counts_the_shared_ledger_once():
+    customers, atms, result = value = run_atm_simulation(
+        2000, 20, 20, 1, cash_range=(10 ** 8, 10 ** 8), outage_prob=0)
+    ledger = customers.ledger
+    assert atms.ledger is ledger and len(ledger) > 10_000
+    for entity in range(300):
+        ledger.rows_for(entity)
+    estimate = estimate_size(value)
+    assert estimate >= ledger.nbytes + customers.balance.itemsize * len(customers)
+    # Both tables hold the ledger but it is counted once
+    assert estimate < customers.nbytes + atms.nbytes
+
+
+def test_byte_budget_evicts_large_ledgers():
+    cache = ResultCache(max_bytes=estimate_size(run_atm_simulation(2000, 20, 20, 1, outage_prob=0)) * 3 // 2)
+    for seed in range(3):
+        cache.put(seed, run_atm_simulation(2000, 20, 20, seed, outage_prob=0))
+    assert cache.current_bytes <= cache.max_bytes
+    assert cache.evictions >= 1
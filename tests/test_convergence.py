@@ -0,0 +1,50 @@
+"""Wilson intervals and the chi-square survival function against known values"""
+import math
+
+import numpy as np
+import pytest
+
+from simulation.convergence import _regularized_gamma_q, chi_square_test, wilson_intervals, z_score
+
+
+def chi2_sf(x, df):
+    return _regularized_gamma_q(df / 2, x / 2)
+
+
+def test_wilson_interval_known_value():
+    low, high = wilson_intervals([5], 10)
+    assert low[0] == pytest.approx(0.2366, abs=1e-4)
+    assert high[0] == pytest.approx(0.7634, abs=1e-4)
+
+
+@pytest.mark.parametrize("total", [1, 10, 10_000])
+@pytest.mark.parametrize("confidence", [0.9, 0.95, 0.99])
+def test_wilson_bounds_at_zero_and_one(total, confidence):
+    z2 = z_score(confidence) ** 2
+    low, high = wilson_intervals([0, total], total, confidence)
+    # No successes: the interval starts at 0; all successes: it ends at 1
+    assert low[0] == pytest.approx(0.0, abs=1e-12)
+    assert high[0] == pytest.approx(z2 / (total + z2))
+    assert high[1] == pytest.approx(1.0, abs=1e-12)
+    assert low[1] == pytest.approx(total / (total + z2))
+
+
+@pytest.mark.parametrize("df,x", [(1, 3.841458820694124), (2, 5.991464547107979), (5, 11.070497693516351),
+                                  (10, 18.307038053275146), (30, 43.77297182574219)])
+def test_chi_square_critical_values(df, x):
+    assert chi2_sf(x, df) == pytest.approx(0.05, rel=1e-9)
+
+
+@pytest.mark.parametrize("x", [0.01, 0.5, 2.0, 7.5, 40.0])
+def test_chi_square_closed_forms(x):
+    # Both sides of the series / continued fraction switch at x = a + 1
+    assert chi2_sf(x, 1) == pytest.approx(math.erfc(math.sqrt(x / 2)), rel=1e-10)
+    assert chi2_sf(x, 2) == pytest.approx(math.exp(-x / 2), rel=1e-10)
+    assert chi2_sf(x, 4) == pytest.approx(math.exp(-x / 2) * (1 + x / 2), rel=1e-10)
+    assert chi2_sf(0.0, 3) == 1.0
+
+
+def test_chi_square_test_of_exact_counts():
+    statistic, p_value = chi_square_test(np.array([100, 200, 300]), [1 / 6, 1 / 3, 1 / 2])
+    assert statistic == pytest.approx(0.0, abs=1e-12)
+    assert p_value == pytest.approx(1.0)
@@ -0,0 +1,45 @@
+"""Expected longest streaks against a direct Markov-chain computation"""
+import numpy as np
+import pytest
+
+from simulation.exact import MAX_EXACT_RUN_ROLLS, _expected_longest_runs, expected_longest_runs
+
+
+def reference_longest_runs(probs, num_rolls):
+    # E[longest] = sum over L of P(some run reaches L), each read from an absorbing
+    # chain over the current run length raised to the n-th power
+    expected = []
+    for p in probs:
+        total = 0.0
+        for length in range(1, num_rolls + 1):
+            transition = np.zeros((length + 1, length + 1))
+            transition[:length, 0] = 1 - p
+            transition[np.arange(length), np.arange(1, length + 1)] = p
+            transition[length, length] = 1.0
+            reached = np.linalg.matrix_power(transition, num_rolls)[0, length]
+            total += reached
+            if reached < 1e-13:
+                break
+        expected.append(total)
+    return np.array(expected)
+
+
+@pytest.mark.parametrize("weights", [[0.4, 0.2, 0.1, 0.1, 0.1, 0.1], [1.0, 0.1, 0, 0, 0, 0], [1, 1]])
+@pytest.mark.parametrize("num_rolls", [1, 2, 10, 300, MAX_EXACT_RUN_ROLLS + 1])
+def test_matches_markov_chain(weights, num_rolls):
+    probs = np.asarray(weights, dtype=np.float64) / np.sum(weights)
+    np.testing.assert_allclose(expected_longest_runs(weights, num_rolls),
+                               reference_longest_runs(probs, num_rolls), rtol=1e-10, atol=1e-10)
+
+
+def test_certain_and_impossible_faces():
+    np.testing.assert_array_equal(expected_longest_runs([1, 0], 50), [50, 0])
+
+
+@pytest.mark.parametrize("num_rolls", [10 ** 6, 10 ** 9])
+def test_long_sequences_follow_the_asymptote(num_rolls):
+    # Speed is tracked by the expected_longest_runs benchmark
+    _expected_longest_runs.cache_clear()
+    longest = expected_longest_runs([1.0, 0.1, 0, 0, 0, 0], num_rolls)
+    # The longest run grows like log(n q) / log(1 / p)
+    assert longest[0] == pytest.approx(np.log(num_rolls / 11) / np.log(1.1), rel=0.05)
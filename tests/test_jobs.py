@@ -0,0 +1,80 @@
+"""Limits, sharing and cancellation of the process-wide job pool"""
+import os
+import threading
+import time
+
+import pytest
+
+from simulation.jobs import CANCELLED, DONE, JobCancelledError, JobLimitError, JobPool
+
+
+def blocked_pool(**kwargs):
+    # A pool whose first run holds its only worker until `release` is set
+    pool = JobPool(workers=1, **kwargs)
+    release = threading.Event()
+    first = pool.submit("blocker", "blocker", lambda: release.wait(10))
+    while pool.position(first):
+        time.sleep(0.01)
+    return pool, release
+
+
+def test_identical_runs_are_shared():
+    pool, release = blocked_pool()
+    a = pool.submit("a", "key", lambda: 42)
+    b = pool.submit("b", "key", lambda: 43)
+    assert a is b
+    release.set()
+    assert a.result() == 42
+    assert pool.stats()["shared"] == 1
+
+
+def test_per_session_and_queue_limits():
+    pool, release = blocked_pool(per_session=1, max_queued=2)
+    pool.submit("a", "a1", lambda: 1)
+    with pytest.raises(JobLimitError):
+        pool.submit("a", "a2", lambda: 2)
+    pool.submit("b", "b1", lambda: 1)
+    with pytest.raises(JobLimitError):
+        pool.submit("c", "c1", lambda: 1)
+    release.set()
+
+
+def test_cancelled_queued_run_is_dropped():
+    pool, release = blocked_pool()
+    job = pool.submit("a", "key", lambda: 1)
+    assert pool.position(job) == 1
+    pool.cancel(job, "a")
+    assert job.state == CANCELLED
+    with pytest.raises(JobCancelledError):
+        job.result()
+    release.set()
+
+
+def test_failures_reach_the_waiting_session():
+    pool = JobPool(workers=1)
+    job = pool.submit("a", "key", lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        job.result()
+    ok = pool.submit("a", "other", lambda: 2)
+    assert ok.result() == 2 and ok.state == DONE
+
+
+def test_process_runs_leave_this_process():
+    pool = JobPool(workers=1)
+    job = pool.submit("a", "pid", os.getpid, process=True, on_result=lambda pid: (pid, os.getpid()))
+    worker, here = job.result()
+    assert worker != here and job.state == DONE
+
+
+def test_cancelled_running_run_counts_until_it_finishes():
+    pool = JobPool(workers=1, per_session=1)
+    release = threading.Event()
+    job = pool.submit("a", "slow", lambda: release.wait(10))
+    while pool.position(job):
+        time.sleep(0.01)
+    pool.cancel(job, "a")
+    with pytest.raises(JobLimitError):
+        pool.submit("a", "next", lambda: 1)
+    release.set()
+    job.wait(10)
+    assert pool.submit("a", "next", lambda: 1).result() == 1
@@ -0,0 +1,44 @@
+"""Sharded runs give the same result in-process, on a private pool and on the shared pool"""
+import numpy as np
+
+from simulation import parallel
+from simulation.dice import count_colored_rolls, sample_biased_faces
+
+SHARD = 1000
+
+
+def run(workers):
+    return parallel.run_sharded(count_colored_rolls, 10 * SHARD, 3, True, seed=7, workers=workers, shard_size=SHARD)
+
+
+def test_shard_sizes():
+    assert parallel.shard_sizes(2500, SHARD) == [SHARD, SHARD, 500]
+    assert parallel.shard_sizes(0, SHARD) == []
+
+
+def test_worker_count_does_not_change_the_result():
+    expected = run(1)
+    assert expected.sum() == 10 * SHARD * 3
+    np.testing.assert_array_equal(run(2), expected)
+
+
+def test_samples_concatenate_in_shard_order():
+    weights = [0.4, 0.2, 0.1, 0.1, 0.1, 0.1]
+    one = parallel.run_sharded(sample_biased_faces, 2500, weights, seed=3, workers=1,
+                               shard_size=SHARD, merge=parallel.concat_samples)
+    two = parallel.run_sharded(sample_biased_faces, 2500, weights, seed=3, workers=2,
+                               shard_size=SHARD, merge=parallel.concat_samples)
+    assert len(one) == 2500
+    np.testing.assert_array_equal(one, two)
+
+
+def test_shared_pool_matches_in_process(monkeypatch):
+    expected = run(1)
+    # Pretend to have two cores so workers=None reaches the shared pool
+    monkeypatch.setattr(parallel.os, "cpu_count", lambda: 2)
+    np.testing.assert_array_equal(run(None), expected)
+    assert parallel.shared_executor() is parallel.shared_executor()
+
+
+def test_workers_start_without_fork():
+    assert parallel.mp_context().get_start_method() in ("forkserver", "spawn")
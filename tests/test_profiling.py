@@ -0,0 +1,27 @@
+"""cProfile capture of work run on other threads"""
+import threading
+
+from simulation.profiling import Profiler
+
+
+def busy_worker_function():
+    return sum(i * i for i in range(10_000))
+
+
+def profiled_functions(stats):
+    return {name for _, _, name in stats.stats}
+
+
+def test_call_on_another_thread_is_captured():
+    profiler = Profiler(cprofile=True)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(profiler.call(busy_worker_function)))
+    thread.start()
+    thread.join()
+    assert results == [busy_worker_function()]
+    assert "busy_worker_function" in profiled_functions(profiler.stop())
+
+
+def test_call_without_cprofile_just_runs():
+    assert Profiler().call(lambda: 42) == 42
+    assert Profiler(enabled=False).call(lambda: 42) == 42
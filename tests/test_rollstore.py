@@ -0,0 +1,107 @@
+"""Writing, reopening, analyzing and pruning memory-mapped roll stores"""
+import os
+
+import numpy as np
+
+from simulation import rollstore
+from simulation.dice import sample_biased_faces
+from simulation.parallel import DEFAULT_SHARD_SIZE, concat_samples, run_sharded
+from simulation.rollstore import (HEADER_ALIGN, RollStore, RollWriter, list_stores, open_or_write_rolls,
+                                  prune_stores)
+from simulation.stats import run_length_encode, streak_summary
+
+WEIGHTS = [1, 1, 1, 1, 1, 1]
+
+
+def test_reopen_same_run_without_resampling(tmp_path, monkeypatch):
+    path = str(tmp_path / "run.rolls")
+    first = open_or_write_rolls(path, 5000, WEIGHTS, num_dice=2, seed=4)
+    codes = np.array(first.codes)
+    first.close()
+    monkeypatch.setattr(rollstore, "write_rolls", None)
+    again = open_or_write_rolls(path, 5000, WEIGHTS, num_dice=2, seed=4)
+    np.testing.assert_array_equal(again.codes, codes)
+    assert again.codes.shape == (5000, 2)
+    again.close()
+
+
+def test_incomplete_store_is_resampled(tmp_path):
+    path = str(tmp_path / "run.rolls")
+    with RollWriter(path, 100, 1, WEIGHTS, 4) as writer:
+        writer.write(np.zeros(10, dtype=np.uint8))
+    assert not RollStore(path).complete
+    store = open_or_write_rolls(path, 100, WEIGHTS, seed=4)
+    assert store.complete and len(store.flat) == 100
+    store.close()
+
+
+def test_chunked_analysis_matches_one_pass(tmp_path):
+    store = open_or_write_rolls(str(tmp_path / "run.rolls"), 20_000, [5, 1, 1, 1, 1, 1], seed=9)
+    codes = np.array(store.flat)
+    expected = streak_summary(codes, 6)
+    for workers in (1, 2):
+        accumulator = store.accumulate(chunk_size=777, workers=workers)
+        np.testing.assert_array_equal(accumulator.histogram.counts, np.bincount(codes, minlength=6))
+        streaks = accumulator.streaks.summary()
+        assert streaks["num_runs"] == expected["num_runs"]
+        np.testing.assert_array_equal(streaks["longest"], expected["longest"])
+
+    values, lengths, starts = run_length_encode(codes)
+    runs = store.runs(100, 50, chunk_size=333)
+    for column, full in zip(runs, (values, lengths, starts)):
+        np.testing.assert_array_equal(column, full[100:150])
+    store.close()
+
+
+def write_store(path, num_rolls, mtime):
+    store = open_or_write_rolls(str(path), num_rolls, WEIGHTS, seed=0)
+    store.close()
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_prune_deletes_least_recently_used(tmp_path):
+    oldest = write_store(tmp_path / "a.rolls", 1000, 1_000)
+    middle = write_store(tmp_path / "b.rolls", 1000, 2_000)
+    newest = write_store(tmp_path / "c.rolls", 1000, 3_000)
+    deleted = prune_stores(str(tmp_path), 2 * (HEADER_ALIGN + 1000))
+    assert deleted == [oldest]
+    assert os.path.exists(middle) and os.path.exists(newest)
+
+
+def test_prune_keeps_requested_and_streaming_stores(tmp_path):
+    kept = write_store(tmp_path / "a.rolls", 1000, 1_000)
+    # A store still being written is incomplete and fresh
+    writer = RollWriter(str(tmp_path / "b.rolls"), 1000, 1, WEIGHTS, None)
+    assert prune_stores(str(tmp_path), 0, keep=[kept]) == []
+    writer.close()
+
+
+def test_budget_applies_before_writing(tmp_path):
+    old = write_store(tmp_path / "a.rolls", 1000, 1_000)
+    open_or_write_rolls(str(tmp_path / "b.rolls"), 1000, WEIGHTS, seed=1,
+                        max_bytes=HEADER_ALIGN + 1500).close()
+    assert not os.path.exists(old)
+    # Reopening the same run touches it instead of resampling
+    reopened = open_or_write_rolls(str(tmp_path / "b.rolls"), 1000, WEIGHTS, seed=1, max_bytes=0)
+    assert reopened.complete
+    reopened.close()
+
+
+def test_list_stores_newest_first_and_complete_only(tmp_path):
+    older = write_store(tmp_path / "a.rolls", 10, 1_000)
+    newer = write_store(tmp_path / "b.rolls", 20, 2_000)
+    RollWriter(str(tmp_path / "c.rolls"), 10, 1, WEIGHTS, None).close()
+    listed = list_stores(str(tmp_path))
+    assert [path for path, _ in listed] == [newer, older]
+    assert listed[0][1]["shape"] == [20, 1]
+
+
+def test_store_holds_the_same_rolls_as_memory(tmp_path):
+    for weights in (WEIGHTS, [5, 1, 1, 1, 1, 1]):
+        # Crosses a shard boundary, where each shard starts its own seed stream
+        num_rolls = DEFAULT_SHARD_SIZE + 1000
+        store = open_or_write_rolls(str(tmp_path / "run.rolls"), num_rolls, weights, seed=11)
+        in_memory = run_sharded(sample_biased_faces, num_rolls, weights, seed=11, workers=1, merge=concat_samples)
+        np.testing.assert_array_equal(store.flat, in_memory)
+        store.close()
@@ -0,0 +1,118 @@
+"""Distribution-equivalence checks for the alias-table sampler
+
+Each path is sampled with a fixed seed and compared against its weights with
+a chi-square goodness-of-fit test at a 1e-6 false-alarm rate, so a failure
+means the path draws from the wrong distribution, not bad luck.
+"""
+import math
+import random
+
+import numpy as np
+import pytest
+
+from simulation.sampling import SMALL_TABLE, AliasSampler, _cached_sampler, sampler_for
+
+DRAWS = 200_000
+# Standard normal quantile for a one-sided 1e-6 tail
+Z_TAIL = 4.753
+
+
+def chi_square_limit(dof):
+    # Wilson-Hilferty approximation of the chi-square quantile
+    scale = 2 / (9 * dof)
+    return dof * (1 - scale + Z_TAIL * math.sqrt(scale)) ** 3
+
+
+def assert_matches(codes, weights):
+    probs = np.asarray(weights, dtype=np.float64) / np.sum(weights)
+    counts = np.bincount(np.asarray(codes, dtype=np.intp), minlength=len(probs))
+    assert len(counts) == len(probs), "drew an outcome index outside 0..k-1"
+    # Zero-weight outcomes must never be drawn; they carry no degree of freedom
+    assert not counts[probs == 0].any(), f"zero-weight outcomes drawn: {counts[probs == 0]}"
+    live = probs > 0
+    expected = len(codes) * probs[live]
+    statistic = float(((counts[live] - expected) ** 2 / expected).sum())
+    dof = int(live.sum()) - 1
+    if dof:
+        assert statistic < chi_square_limit(dof), f"chi-square {statistic:.1f} with {dof} dof"
+
+
+SMALL_WEIGHTS = [
+    [0.4, 0.2, 0.1, 0.1, 0.1, 0.1],
+    [1.0, 0.1, 0.0, 0.0, 0.0, 0.0],
+    [0.0, 0.3, 0.0, 0.5, 0.0, 0.2],
+    [5.0, 1.0],
+    [1.0],
+]
+LARGE_WEIGHTS = [
+    list(np.linspace(0.1, 5.0, SMALL_TABLE + 1)),
+    [0.0 if i % 3 == 0 else 1.0 / (i + 1) for i in range(40)],
+    list(np.random.default_rng(7).exponential(size=300)),
+]
+
+
+@pytest.mark.parametrize("weights", SMALL_WEIGHTS + LARGE_WEIGHTS)
+def test_scalar_draws_match_weights(weights):
+    sampler = AliasSampler(weights)
+    rng = random.Random(1)
+    assert_matches([sampler.draw(rng) for _ in range(DRAWS)], weights)
+
+
+@pytest.mark.parametrize("weights", SMALL_WEIGHTS)
+def test_cdf_path_matches_weights(weights):
+    assert len(weights) <= SMALL_TABLE
+    assert_matches(AliasSampler(weights).draw_array(DRAWS, rng=2), weights)
+
+
+@pytest.mark.parametrize("weights", LARGE_WEIGHTS)
+def test_alias_path_matches_weights(weights):
+    assert len(weights) > SMALL_TABLE
+    assert_matches(AliasSampler(weights).draw_array(DRAWS, rng=3), weights)
+
+
+@pytest.mark.parametrize("k", [6, SMALL_TABLE + 4])
+def test_uniform_weights(k):
+    sampler = AliasSampler([2.5] * k)
+    assert sampler.uniform
+    assert_matches(sampler.draw_array(DRAWS, rng=4), [1] * k)
+    rng = random.Random(5)
+    assert_matches([sampler.draw(rng) for _ in range(DRAWS)], [1] * k)
+
+
+@pytest.mark.parametrize("weights", SMALL_WEIGHTS + LARGE_WEIGHTS)
+def test_alias_tables_reproduce_weights(weights):
+    sampler = AliasSampler(weights)
+    # Column i keeps prob[i] of its 1/k share and gives the rest to alias[i]
+    rebuilt = sampler.prob / sampler.k
+    np.add.at(rebuilt, sampler.alias, (1 - sampler.prob) / sampler.k)
+    np.testing.assert_allclose(rebuilt, sampler.probs, atol=1e-12)
+
+
+def test_draw_array_dtype_and_range():
+    assert AliasSampler([1, 2, 3]).draw_array(10, rng=0).dtype == np.uint8
+    codes = AliasSampler(np.ones(300) + np.arange(300)).draw_array(10_000, rng=0)
+    assert codes.dtype == np.intp
+    assert codes.min() >= 0 and codes.max() < 300
+
+
+def test_seeded_batches_repeat():
+    sampler = AliasSampler(SMALL_WEIGHTS[0])
+    np.testing.assert_array_equal(sampler.draw_array(1000, rng=9), sampler.draw_array(1000, rng=9))
+
+
+def test_sampler_for_shares_one_sampler_per_weight_vector():
+    _cached_sampler.cache_clear()
+    first = sampler_for([0.4, 0.2, 0.1, 0.1, 0.1, 0.1])
+    # Equal weights given as other sequence types or numeric types hit the same entry
+    assert sampler_for((0.4, 0.2, 0.1, 0.1, 0.1, 0.1)) is first
+    assert sampler_for(np.array([0.4, 0.2, 0.1, 0.1, 0.1, 0.1])) is first
+    assert sampler_for([1, 1, 1]) is sampler_for([1.0, 1.0, 1.0])
+    assert sampler_for([0.4, 0.2, 0.1, 0.1, 0.1, 0.2]) is not first
+    assert _cached_sampler.cache_info().hits == 3
+    assert_matches(first.draw_array(DRAWS, rng=6), [0.4, 0.2, 0.1, 0.1, 0.1, 0.1])
+
+
+@pytest.mark.parametrize("weights", [[], [0, 0, 0], [1, -1, 1], [[1, 2], [3, 4]]])
+def test_invalid_weights(weights):
+    with pytest.raises(ValueError):
+        AliasSampler(weights)
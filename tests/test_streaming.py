@@ -0,0 +1,91 @@
+"""Chunked and merged accumulators against one pass over the full array"""
+import numpy as np
+import pytest
+
+from simulation.stats import streak_summary
+from simulation.streaming import (HistogramAccumulator, MomentAccumulator, QuantileSketch, StreakAccumulator,
+                                  merge_all)
+
+
+def split(values, seed, sizes=(1, 2, 3, 50, 997)):
+    # Consecutive chunks of uneven sizes, including single values
+    rng = np.random.default_rng(seed)
+    chunks, start = [], 0
+    while start < len(values):
+        stop = start + int(rng.choice(sizes))
+        chunks.append(values[start:stop])
+        start = stop
+    return chunks
+
+
+def trimmed(counts):
+    return np.trim_zeros(np.asarray(counts), "b")
+
+
+def test_histogram_merges_to_bincount():
+    codes = np.random.default_rng(0).integers(0, 6, 20_000)
+    parts = [HistogramAccumulator(6).update(chunk) for chunk in split(codes, 1)]
+    merged = merge_all(parts)
+    np.testing.assert_array_equal(merged.counts, np.bincount(codes, minlength=6))
+    assert merged.mean() == pytest.approx(np.mean(codes + 1))
+    assert merged.median() == np.median(codes + 1)
+
+
+def test_moments_match_one_pass():
+    # A large offset is where naive sum-of-squares updates lose precision
+    values = 1e9 + np.random.default_rng(2).normal(0, 3, 10_000)
+    chunks = split(values, 3)
+    updated = MomentAccumulator()
+    for chunk in chunks:
+        updated.update(chunk)
+    merged = merge_all([MomentAccumulator().update(chunk) for chunk in chunks])
+    added = MomentAccumulator()
+    for x in values[:2000]:
+        added.add(x)
+    for accumulator, sample in ((updated, values), (merged, values), (added, values[:2000])):
+        assert accumulator.count == len(sample)
+        assert accumulator.mean == pytest.approx(np.mean(sample), rel=1e-14)
+        assert accumulator.variance == pytest.approx(np.var(sample, ddof=1), rel=1e-7)
+
+
+def test_quantile_sketch_merges_within_its_error_bound():
+    values = np.random.default_rng(4).lognormal(0, 2, 50_000)
+    values[:100] = 0.0
+    one_pass = QuantileSketch(0.01).update(values)
+    merged = merge_all([QuantileSketch(0.01).update(chunk) for chunk in split(values, 5)])
+    assert merged.buckets == one_pass.buckets and merged.zero_count == one_pass.zero_count
+
+    ordered = np.sort(values)
+    for q in (0.0, 0.001, 0.1, 0.5, 0.9, 0.99, 0.999, 1.0):
+        exact = ordered[int(q * (len(values) - 1))]
+        assert merged.quantile(q) == one_pass.quantile(q)
+        assert abs(merged.quantile(q) - exact) <= 0.01 * exact + 1e-12
+
+
+def test_quantile_sketches_of_different_accuracy_do_not_merge():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_streaks_join_across_chunk_boundaries(seed):
+    # Two heavily biased faces make runs that cross most chunk boundaries
+    codes = (np.random.default_rng(seed).random(5000) < 0.9).astype(np.uint8)
+    expected = streak_summary(codes, 2)
+    chunks = split(codes, seed + 10)
+    updated = StreakAccumulator(2)
+    for chunk in chunks:
+        updated.update(chunk)
+    merged = merge_all([StreakAccumulator(2).update(chunk) for chunk in chunks])
+    for accumulator in (updated, merged):
+        summary = accumulator.summary()
+        assert summary["num_runs"] == expected["num_runs"]
+        np.testing.assert_array_equal(summary["longest"], expected["longest"])
+        np.testing.assert_array_equal(trimmed(summary["length_distribution"]),
+                                      trimmed(expected["length_distribution"]))
+
+
+def test_single_run_split_into_chunks():
+    codes = np.full(100, 3, dtype=np.uint8)
+    summary = merge_all([StreakAccumulator(6).update(chunk) for chunk in split(codes, 0)]).summary()
+    assert summary["num_runs"] == 1 and summary["longest"][3] == 100
@@ -0,0 +1,61 @@
+"""Reproducible, resumable ATM parameter sweeps"""
+import json
+import os
+
+from simulation.sweep import expand_grid, run_sweep
+
+GRID = {"num_customers": [20, 40], "outage_prob": [0.0, 0.1]}
+
+
+def rows_without_timing(rows):
+    return [{key: value for key, value in row.items() if key != "wall_seconds"} for row in rows]
+
+
+def test_grid_expands_to_every_combination():
+    assert len(expand_grid(GRID)) == 4
+
+
+def test_results_do_not_depend_on_worker_count(monkeypatch):
+    one = run_sweep(GRID, replications=2, seed=5, workers=1)
+    two = run_sweep(GRID, replications=2, seed=5, workers=2)
+    assert rows_without_timing(one) == rows_without_timing(two)
+    # Even on one core, the default goes through the shared pool
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+    shared = run_sweep(GRID, replications=2, seed=5)
+    assert rows_without_timing(one) == rows_without_timing(shared)
+
+
+def test_resume_runs_only_missing_cells(tmp_path):
+    checkpoint = tmp_path / "sweep.jsonl"
+    full = run_sweep(GRID, replications=2, seed=5, workers=1)
+    run_sweep({"num_customers": [20], "outage_prob": [0.0]}, replications=2, seed=5, workers=1,
+              checkpoint=str(checkpoint))
+    resumed = run_sweep(GRID, replications=2, seed=5, workers=1, checkpoint=str(checkpoint))
+    assert rows_without_timing(resumed) == rows_without_timing(full)
+    lines = [json.loads(line) for line in checkpoint.read_text().splitlines()]
+    assert "settings" in lines[0]
+    assert len(lines) == 1 + len(full)
+
+
+def test_resume_after_torn_append(tmp_path):
+    checkpoint = tmp_path / "sweep.jsonl"
+    full = run_sweep(GRID, replications=2, seed=5, workers=1)
+    run_sweep({"num_customers": [20], "outage_prob": [0.0]}, replications=2, seed=5, workers=1,
+              checkpoint=str(checkpoint))
+    # A sweep killed while appending a cell leaves half a line behind
+    with open(checkpoint, "a") as f:
+        f.write('{"cell": {"num_customers": 40, "outage')
+
+    resumed = run_sweep(GRID, replications=2, seed=5, workers=1, checkpoint=str(checkpoint))
+    assert rows_without_timing(resumed) == rows_without_timing(full)
+    lines = [json.loads(line) for line in checkpoint.read_text().splitlines()]
+    assert "settings" in lines[0]
+    assert len(lines) == 1 + len(full)
+
+
+def test_resume_after_torn_header(tmp_path):
+    checkpoint = tmp_path / "sweep.jsonl"
+    checkpoint.write_text('{"settings": {"se')
+    rows = run_sweep(GRID, replications=2, seed=5, workers=1, checkpoint=str(checkpoint))
+    assert rows_without_timing(rows) == rows_without_timing(run_sweep(GRID, replications=2, seed=5, workers=1))
+    assert json.loads(checkpoint.read_text().splitlines()[0])["settings"]["seed"] == 5
@@ -0,0 +1,29 @@
+"""Variance-reduced rare-event estimates against the exact binomial probability"""
+import pytest
+
+from simulation.dice import color_probabilities, colors
+from simulation.exact import at_least_probability
+from simulation.variance import MODES, estimate_rare_event
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("biased,num_dice,min_matches", [(False, 3, 3), (True, 4, 2)])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_interval_covers_exact_probability(mode, biased, num_dice, min_matches, seed):
+    exact = at_least_probability(color_probabilities(biased), num_dice, colors.index("Purple"), min_matches)
+    result = estimate_rare_event(mode, 40_000, num_dice, biased, "Purple", min_matches, confidence=0.99,
+                                 seed=seed, workers=1)
+    assert result["ci_low"] <= exact <= result["ci_high"]
+    assert result["std_error"] > 0
+
+
+@pytest.mark.parametrize("biased", [False, True])
+def test_importance_sampling_beats_naive_on_all_purple(biased):
+    result = estimate_rare_event("importance", 20_000, 4, biased, "Purple", seed=7, workers=1)
+    assert result["variance_reduction"] > 1
+    assert result["equivalent_naive_rolls"] > result["rolls"]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        estimate_rare_event("quasi", 100, 2, False)
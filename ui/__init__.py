@@ -0,0 +1 @@
+"""Streamlit helpers shared by the pages; the simulation package stays UI-free."""
@@ -0,0 +1,85 @@
+"""Cached, non-blocking bar charts for the dice pages
+
+Charts are drawn on a bare matplotlib Figure with the Agg canvas, so nothing
+goes through pyplot's figure registry or a GUI event loop, and the figure is
+released as soon as it is encoded. The PNG is cached under a hash of
+everything drawn (values and style), so rerunning the same run reuses the
+image instead of drawing it again.
+"""
+import io
+
+import streamlit as st
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from simulation.cache import ResultCache
+
+CHART_CACHE_BYTES = 32 * 1024 * 1024
+# Same resolution st.pyplot uses, unless that makes the image wider than
+# MAX_CHART_WIDTH pixels: st.image shrinks and re-encodes wider images on every call
+CHART_DPI = 200
+MAX_CHART_WIDTH = 1400
+
+_charts = ResultCache(max_bytes=CHART_CACHE_BYTES)
+
+
+def bar_chart_spec(labels, values, colors="skyblue", title="", xlabel="", ylabel="", alpha=1.0,
+                   line=None, line_label=None, ylim=None, grid=False, figsize=(6.4, 4.8)):
+    """Everything a bar chart draws, as plain JSON-able values; also its cache key"""
+    return {
+        "labels": [str(label) for label in labels],
+        "values": [float(value) for value in values],
+        "colors": colors if isinstance(colors, str) else list(colors),
+        "title": title,
+        "xlabel": xlabel,
+        "ylabel": ylabel,
+        "alpha": alpha,
+        "line": None if line is None else [float(value) for value in line],
+        "line_label": line_label,
+        "ylim": None if ylim is None else [float(limit) for limit in ylim],
+        "grid": grid,
+        "figsize": list(figsize),
+    }
+
+
+def render_bar_chart(spec):
+    """Draw a spec to PNG bytes; the figure is never registered with pyplot"""
+    fig = Figure(figsize=spec["figsize"])
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    positions = range(len(spec["labels"]))
+    ax.bar(positions, spec["values"], color=spec["colors"], alpha=spec["alpha"])
+    if spec["line"] is not None:
+        ax.plot(positions, spec["line"], 'k--', label=spec["line_label"])
+        ax.legend()
+    if spec["ylim"] is not None:
+        ax.set_ylim(*spec["ylim"])
+    ax.set_xticks(positions)
+    ax.set_xticklabels(spec["labels"])
+    ax.set_title(spec["title"])
+    ax.set_xlabel(spec["xlabel"])
+    ax.set_ylabel(spec["ylabel"])
+    if spec["grid"]:
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+    buffer = io.BytesIO()
+    dpi = min(CHART_DPI, MAX_CHART_WIDTH / spec["figsize"][0])
+    fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+def cached_chart(spec):
+    """PNG bytes for a spec, drawn only the first time it is seen"""
+    key = ResultCache.make_key("chart", spec, None)
+    png = _charts.get(key)
+    if png is None:
+        png = render_bar_chart(spec)
+        _charts.put(key, png)
+    return png
+
+
+def show_bar_chart(spec):
+    st.image(cached_chart(spec), width="stretch")
+
+
+def chart_cache_stats():
+    return _charts.stats()
@@ -0,0 +1,63 @@
+"""Event log panel: one virtualized dataframe redrawn at a capped rate
+
+However many events a run logs, the browser receives a single dataframe
+element, replaced at most once per `min_interval` seconds while entries are
+fed in and once more when the feed finishes.
+"""
+import time
+
+import pandas as pd
+import streamlit as st
+
+from simulation.eventlog import LEVELS, EventLog
+
+# Rows drawn into the table; older matching entries stay in the ring only
+MAX_TABLE_ROWS = 5000
+
+
+class LogSink:
+    """Buffers log entries in a bounded ring and redraws one table at a capped rate"""
+
+    def __init__(self, log=None, capacity=MAX_TABLE_ROWS, levels=None, customer_name=None,
+                 min_interval=0.25, container=None):
+        self.log = log if log is not None else EventLog(capacity)
+        self.levels = levels
+        self.customer_name = customer_name
+        self.min_interval = min_interval
+        self.flushes = 0
+        self._last_flush = float("-inf")
+        self._placeholder = (container or st).empty()
+
+    def append(self, entry):
+        self.log.append(entry)
+        self.flush()
+
+    def extend(self, entries):
+        for entry in entries:
+            self.log.append(entry)
+        self.flush()
+
+    def flush(self, force=False):
+        """Redraw the table unless it was drawn less than `min_interval` seconds ago"""
+        now = time.perf_counter()
+        if not force and now - self._last_flush < self.min_interval:
+            return False
+        self._last_flush = now
+        self.flushes += 1
+        rows = self.log.rows(self.levels, self.customer_name, limit=MAX_TABLE_ROWS)
+        with self._placeholder.container():
+            st.dataframe(pd.DataFrame(rows), hide_index=True)
+            shown = len(rows["Event"])
+            counts = ", ".join(f"{self.log.level_counts[level]:,} {level}" for level in LEVELS)
+            dropped = f"; the oldest {self.log.dropped:,} are no longer kept" if self.log.dropped else ""
+            st.caption(f"Showing {shown:,} of {self.log.total:,} events ({counts}){dropped}")
+        return True
+
+    def close(self):
+        self.flush(force=True)
+
+
+def level_filter(container=None):
+    """Sidebar multiselect of the levels to show; returns the chosen levels"""
+    return (container or st.sidebar).multiselect("Event Levels", LEVELS, default=LEVELS,
+                                                 format_func=str.title, key="event_levels")
@@ -0,0 +1,89 @@
+"""Run page simulations on the shared job pool while the session waits
+
+A page script thread only waits for its run. The wait redraws a status line
+every POLL_INTERVAL seconds; each redraw is a point where Streamlit can stop
+the script, so a rerun or a closed browser tab cancels the session's run
+instead of leaving the script thread stuck inside the simulation.
+"""
+from functools import partial
+
+import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from simulation.cache import ResultCache, default_cache
+from simulation.jobs import JobLimitError, default_pool
+from simulation.profiling import profile_call
+from ui.profiling import active_profiler
+
+POLL_INTERVAL = 0.5
+
+
+def _session_alive(session_id):
+    # Without a server runtime (bare mode, AppTest) every session counts as live
+    return not Runtime.exists() or Runtime.instance().is_active_session(session_id)
+
+
+def shared_pool():
+    pool = default_pool()
+    if pool.session_alive is None:
+        pool.session_alive = _session_alive
+    return pool
+
+
+def run_job(page, params, seed, compute, cached=True, profiler=None, process=False):
+    """Return the result of `compute()` for this run, from the result cache or the job pool
+
+    With `cached=False` the run still goes through the pool (and is shared
+    with identical runs in flight) but its result is not stored. With
+    `process=True` it runs on the shared process pool, so `compute` must be
+    a partial of a module-level function; use it for pure-Python kernels,
+    not for runs that already shard across that pool. Shows an error and
+    stops the script if the session already has too many runs. `compute()`
+    is profiled into `profiler` (default: the script run's, if profiling is
+    on) on whichever thread or process runs it.
+    """
+    cache = default_cache()
+    key = ResultCache.make_key(page, params, seed)
+    missing = object()
+    if cached:
+        value = cache.get(key, missing)
+        if value is not missing:
+            return value
+
+    if profiler is None:
+        profiler = active_profiler()
+
+    def store(value):
+        if cached:
+            cache.put(key, value)
+        return value
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return store(profiler.call(compute))
+    if not process:
+        task, on_result = lambda: store(profiler.call(compute)), None
+    elif profiler.capturing:
+        task, on_result = partial(profile_call, compute), lambda captured: store(profiler.merge(captured))
+    else:
+        task, on_result = compute, store
+    pool = shared_pool()
+    try:
+        job = pool.submit(ctx.session_id, key, task, process, on_result)
+    except JobLimitError as exc:
+        st.error(f"{exc}. Please wait for it to finish and try again.")
+        st.stop()
+
+    status = st.empty()
+    try:
+        while not job.wait(POLL_INTERVAL):
+            position = pool.position(job)
+            status.caption(f"Waiting in the simulation queue (position {position})..." if position
+                           else f"Simulating... {job.elapsed:.1f}s")
+    except BaseException:
+        # Streamlit stops the script for a rerun or disconnect at the status redraw
+        pool.cancel(job, ctx.session_id)
+        raise
+    status.empty()
+    return job.result()
@@ -0,0 +1,94 @@
+"""Optional sidebar panel showing where a page run spends its time"""
+import os
+import tempfile
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from simulation.cache import default_cache
+from simulation.jobs import default_pool
+from simulation.profiling import Profiler
+
+_disabled = Profiler(enabled=False)
+
+
+def profiling_controls():
+    """Render the sidebar toggles and return this run's Profiler
+
+    When enabled, every message the script sends to the browser is counted
+    and attributed to the stage that produced it, and runs this script waits
+    for on the job pool are included in the cProfile dump.
+    """
+    st.sidebar.header("Diagnostics")
+    if not st.sidebar.checkbox("Show profiling panel", key="profiling_enabled"):
+        return _disabled
+    cprofile = st.sidebar.checkbox("Record cProfile dump", key="profiling_cprofile")
+    profiler = Profiler(cprofile=cprofile)
+
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        # Unwrap a hook left behind by a run that stopped before the panel rendered
+        enqueue = getattr(ctx.enqueue, "original", ctx.enqueue)
+
+        def counting_enqueue(msg):
+            profiler.add_output(msg.ByteSize())
+            enqueue(msg)
+
+        counting_enqueue.original = enqueue
+        counting_enqueue.profiler = profiler
+        ctx.enqueue = counting_enqueue
+    return profiler
+
+
+def active_profiler():
+    """The Profiler of the current script run, or a disabled one"""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return getattr(ctx.enqueue, "profiler", _disabled) if ctx is not None else _disabled
+
+
+def show_shared_state(panel):
+    """Counters of the process-wide result cache, chart cache and job pool"""
+    # Imported here so pages without charts don't load matplotlib for the panel
+    from ui.charts import chart_cache_stats
+
+    caches = {"results": default_cache().stats(), "charts": chart_cache_stats()}
+    panel.dataframe(pd.DataFrame([
+        {"cache": name, "entries": stats["entries"], "MiB": stats["bytes"] / 2 ** 20,
+         "hit rate": stats["hit_rate"], "misses": stats["misses"], "evictions": stats["evictions"]}
+        for name, stats in caches.items()
+    ]).set_index("cache").round(2))
+    jobs = default_pool().stats()
+    panel.caption(f"Job pool: {jobs['running']} of {jobs['workers']} running, {jobs['queued']} queued; "
+                  f"{jobs['completed']} done, {jobs['failed']} failed, {jobs['cancelled']} cancelled, "
+                  f"{jobs['rejected']} rejected, {jobs['shared']} shared; "
+                  f"mean wait {jobs['mean_wait_seconds']:.2f}s")
+
+
+def show_profiling_panel(profiler):
+    """Render the collected timings at the end of the script run"""
+    if not profiler.enabled:
+        return
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        ctx.enqueue = getattr(ctx.enqueue, "original", ctx.enqueue)
+    stats = profiler.stop()
+
+    panel = st.sidebar.expander("Profiling", expanded=True)
+    panel.caption(f"Script run: {profiler.elapsed * 1e3:.1f} ms, "
+                  f"{profiler.messages} messages, {profiler.total_bytes / 1024:.1f} KiB sent")
+    rows = profiler.report()
+    if rows:
+        panel.dataframe(pd.DataFrame(rows).set_index("stage").round(2))
+    show_shared_state(panel)
+    if stats is not None:
+        fd, path = tempfile.mkstemp(suffix=".prof")
+        os.close(fd)
+        try:
+            stats.dump_stats(path)
+            with open(path, "rb") as f:
+                data = f.read()
+        finally:
+            os.remove(path)
+        panel.download_button("Download cProfile dump", data, file_name="page_run.prof",
+                              mime="application/octet-stream")